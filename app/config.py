@@ -10,6 +10,12 @@ from dotenv import find_dotenv, load_dotenv
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.services.vector_store.factory import get_vector_store
+from app.services.embedding_dispatch import (
+    AdaptiveConcurrencyLimiter,
+    DispatchingEmbeddings,
+    TokenCounter,
+)
+from app.services.embedding_router import EmbeddingRouter
 
 load_dotenv(find_dotenv())
 
@@ -18,6 +24,7 @@ class VectorDBType(Enum):
     PGVECTOR = "pgvector"
     ATLAS_MONGO = "atlas-mongo"
     QDRANT = "qdrant"
+    LOCAL = "local"
 
 
 class EmbeddingsProvider(Enum):
@@ -74,12 +81,78 @@ MONGO_VECTOR_COLLECTION = get_env_variable(
 QDRANT_URL = get_env_variable("QDRANT_URL", "http://localhost:6333")
 QDRANT_API_KEY = get_env_variable("QDRANT_API_KEY", None)
 QDRANT_COLLECTION_NAME = get_env_variable("QDRANT_COLLECTION_NAME", COLLECTION_NAME)
+QDRANT_PREFER_GRPC = get_env_variable("QDRANT_PREFER_GRPC", "False").lower() == "true"
+QDRANT_UPSERT_BATCH_SIZE = int(get_env_variable("QDRANT_UPSERT_BATCH_SIZE", "256"))
+QDRANT_UPSERT_PARALLELISM = int(get_env_variable("QDRANT_UPSERT_PARALLELISM", "4"))
+QDRANT_SCROLL_PAGE_SIZE = int(get_env_variable("QDRANT_SCROLL_PAGE_SIZE", "10000"))
+QDRANT_SCAN_SHARDS = int(get_env_variable("QDRANT_SCAN_SHARDS", "8"))
+QDRANT_HNSW_EF = int(get_env_variable("QDRANT_HNSW_EF", "0"))
+QDRANT_QUANTIZATION_RESCORE = (
+    get_env_variable("QDRANT_QUANTIZATION_RESCORE", "True").lower() == "true"
+)
+QDRANT_QUANTIZATION_OVERSAMPLING = float(
+    get_env_variable("QDRANT_QUANTIZATION_OVERSAMPLING", "0")
+)
+LOCAL_VECTOR_STORE_PATH = get_env_variable(
+    "LOCAL_VECTOR_STORE_PATH", "./local_vector_store"
+)
+LOCAL_VECTOR_IVF_MIN_ROWS = int(get_env_variable("LOCAL_VECTOR_IVF_MIN_ROWS", "0"))
+LOCAL_VECTOR_IVF_NPROBE = int(get_env_variable("LOCAL_VECTOR_IVF_NPROBE", "8"))
 CHUNK_SIZE = int(get_env_variable("CHUNK_SIZE", "1500"))
 CHUNK_OVERLAP = int(get_env_variable("CHUNK_OVERLAP", "100"))
 
 env_value = get_env_variable("PDF_EXTRACT_IMAGES", "False").lower()
 PDF_EXTRACT_IMAGES = True if env_value == "true" else False
 
+# Largest number of queries accepted by one /query_batch request
+QUERY_BATCH_MAX_QUERIES = int(get_env_variable("QUERY_BATCH_MAX_QUERIES", "100"))
+# Largest number of texts accepted by one /embeddings request
+EMBEDDINGS_MAX_TEXTS = int(get_env_variable("EMBEDDINGS_MAX_TEXTS", "2048"))
+
+# Query result cache
+QUERY_CACHE_ENABLED = get_env_variable("QUERY_CACHE_ENABLED", "False").lower() == "true"
+QUERY_CACHE_MAX_BYTES = int(
+    get_env_variable("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+CACHE_INVALIDATION_CHANNEL = get_env_variable(
+    "CACHE_INVALIDATION_CHANNEL", "rag_api_cache_invalidation"
+)
+
+# Semantic (near-duplicate) query cache
+SEMANTIC_CACHE_ENABLED = (
+    get_env_variable("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+)
+SEMANTIC_CACHE_THRESHOLD = float(get_env_variable("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(get_env_variable("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+SEMANTIC_CACHE_MAX_FILTERS = int(get_env_variable("SEMANTIC_CACHE_MAX_FILTERS", "1024"))
+
+# Hot-file in-process vector cache
+HOT_FILE_CACHE_ENABLED = (
+    get_env_variable("HOT_FILE_CACHE_ENABLED", "False").lower() == "true"
+)
+HOT_FILE_CACHE_MAX_BYTES = int(
+    get_env_variable("HOT_FILE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+HOT_FILE_CACHE_MAX_FILE_BYTES = int(
+    get_env_variable("HOT_FILE_CACHE_MAX_FILE_BYTES", str(HOT_FILE_CACHE_MAX_BYTES // 8))
+)
+HOT_FILE_CACHE_ON_INGEST = (
+    get_env_variable("HOT_FILE_CACHE_ON_INGEST", "False").lower() == "true"
+)
+
+# Serialize query/document responses with orjson, skipping per-document encoding
+FAST_JSON_RESPONSES = (
+    get_env_variable("FAST_JSON_RESPONSES", "False").lower() == "true"
+)
+
+# zstd/gzip compression of responses, negotiated through Accept-Encoding
+RESPONSE_COMPRESSION_ENABLED = (
+    get_env_variable("RESPONSE_COMPRESSION_ENABLED", "False").lower() == "true"
+)
+RESPONSE_COMPRESSION_MIN_SIZE = int(
+    get_env_variable("RESPONSE_COMPRESSION_MIN_SIZE", "1024")
+)
+
 if POSTGRES_USE_UNIX_SOCKET:
     connection_suffix = f"{urllib.parse.quote_plus(POSTGRES_USER)}:{urllib.parse.quote_plus(POSTGRES_PASSWORD)}@/{urllib.parse.quote_plus(POSTGRES_DB)}?host={urllib.parse.quote_plus(DB_HOST)}"
 else:
@@ -207,6 +280,18 @@ RAG_CHECK_EMBEDDING_CTX_LENGTH = True if env_value == "true" else False
 ## Embeddings
 
 
+def split_endpoints(value: str) -> list:
+    """URLs of a comma-separated list of embedding server replicas."""
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+def route_embeddings(endpoints: list):
+    """The single endpoint's embeddings, or a router over several replicas."""
+    if len(endpoints) == 1:
+        return endpoints[0][1]
+    return EmbeddingRouter(endpoints)
+
+
 def init_embeddings(provider, model):
     if provider == EmbeddingsProvider.OPENAI:
         from langchain_openai import OpenAIEmbeddings
@@ -218,6 +303,9 @@ def init_embeddings(provider, model):
             openai_proxy=RAG_OPENAI_PROXY,
             chunk_size=EMBEDDINGS_CHUNK_SIZE,
             check_embedding_ctx_length=RAG_CHECK_EMBEDDING_CTX_LENGTH,
+            # Rate limits are retried by the embedding dispatcher when it is enabled
+            max_retries=0 if EMBEDDINGS_MAX_CONCURRENCY > 1 else 2,
+            dimensions=EMBEDDINGS_DIMENSIONS or None,
         )
     elif provider == EmbeddingsProvider.AZURE:
         from langchain_openai import AzureOpenAIEmbeddings
@@ -229,23 +317,63 @@ def init_embeddings(provider, model):
             api_version=RAG_AZURE_OPENAI_API_VERSION,
             chunk_size=EMBEDDINGS_CHUNK_SIZE,
             check_embedding_ctx_length=RAG_CHECK_EMBEDDING_CTX_LENGTH,
+            # Rate limits are retried by the embedding dispatcher when it is enabled
+            max_retries=0 if EMBEDDINGS_MAX_CONCURRENCY > 1 else 2,
+            dimensions=EMBEDDINGS_DIMENSIONS or None,
         )
     elif provider == EmbeddingsProvider.HUGGINGFACE:
-        from langchain_huggingface import HuggingFaceEmbeddings
-
-        return HuggingFaceEmbeddings(
-            model_name=model,
-            encode_kwargs={"normalize_embeddings": True},
-            model_kwargs={"trust_remote_code": True},
-        )
+        if HF_EMBEDDINGS_BACKEND == "torch":
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            if HF_EMBEDDINGS_THREADS:
+                import torch
+
+                torch.set_num_threads(HF_EMBEDDINGS_THREADS)
+            embeddings = HuggingFaceEmbeddings(
+                model_name=model,
+                encode_kwargs={
+                    "normalize_embeddings": True,
+                    "batch_size": HF_EMBEDDINGS_BATCH_SIZE,
+                },
+                model_kwargs={"trust_remote_code": True},
+            )
+        else:
+            from app.services.onnx_embeddings import (
+                OnnxEmbeddings,
+                export_dir,
+                export_model,
+            )
+
+            embeddings = OnnxEmbeddings.load(
+                export_model(
+                    model,
+                    export_dir(HF_ONNX_DIR, model),
+                    int8=HF_EMBEDDINGS_BACKEND == "onnx-int8",
+                ),
+                batch_size=HF_EMBEDDINGS_BATCH_SIZE,
+                intra_op_threads=HF_EMBEDDINGS_THREADS,
+            )
+        # The first inference initializes kernels and buffers; pay it at startup
+        embeddings.embed_query("warm up")
+        return embeddings
     elif provider == EmbeddingsProvider.HUGGINGFACETEI:
         from langchain_huggingface import HuggingFaceEndpointEmbeddings
 
-        return HuggingFaceEndpointEmbeddings(model=model)
+        return route_embeddings(
+            [
+                (url, HuggingFaceEndpointEmbeddings(model=url))
+                for url in split_endpoints(model)
+            ]
+        )
     elif provider == EmbeddingsProvider.OLLAMA:
         from langchain_ollama import OllamaEmbeddings
 
-        return OllamaEmbeddings(model=model, base_url=OLLAMA_BASE_URL)
+        return route_embeddings(
+            [
+                (url, OllamaEmbeddings(model=model, base_url=url))
+                for url in split_endpoints(OLLAMA_BASE_URL)
+            ]
+        )
     elif provider == EmbeddingsProvider.GOOGLE_GENAI:
         from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
@@ -258,7 +386,8 @@ def init_embeddings(provider, model):
 
         return VertexAIEmbeddings(model=model)
     elif provider == EmbeddingsProvider.BEDROCK:
-        from langchain_aws import BedrockEmbeddings
+        from botocore.config import Config as BotoConfig
+        from app.services.bedrock_embeddings import BedrockParallelEmbeddings
 
         session_kwargs = {
             "aws_access_key_id": AWS_ACCESS_KEY_ID,
@@ -270,16 +399,31 @@ def init_embeddings(provider, model):
             session_kwargs["aws_session_token"] = AWS_SESSION_TOKEN
 
         session = boto3.Session(**session_kwargs)
-        return BedrockEmbeddings(
-            client=session.client("bedrock-runtime"),
-            model_id=model,
-            region_name=AWS_DEFAULT_REGION,
+        client = session.client(
+            "bedrock-runtime",
+            config=BotoConfig(
+                max_pool_connections=BEDROCK_EMBEDDINGS_CONCURRENCY,
+                retries={
+                    "mode": "adaptive",
+                    "total_max_attempts": BEDROCK_MAX_ATTEMPTS,
+                },
+            ),
+        )
+        return BedrockParallelEmbeddings(
+            client, model_id=model, max_workers=BEDROCK_EMBEDDINGS_CONCURRENCY
         )
     elif provider == EmbeddingsProvider.CUSTOM_HUGGINGFACE:
         from app.services.custom_hf_embeddings import CustomHuggingFaceEmbeddings
-        return CustomHuggingFaceEmbeddings(
-            endpoint_url=CUSTOM_HF_ENDPOINT,
-            api_token=CUSTOM_HF_API_TOKEN
+        return route_embeddings(
+            [
+                (
+                    url,
+                    CustomHuggingFaceEmbeddings(
+                        endpoint_url=url, api_token=CUSTOM_HF_API_TOKEN
+                    ),
+                )
+                for url in split_endpoints(CUSTOM_HF_ENDPOINT)
+            ]
         )
     else:
         raise ValueError(f"Unsupported embeddings provider: {provider}")
@@ -301,6 +445,14 @@ elif EMBEDDINGS_PROVIDER == EmbeddingsProvider.HUGGINGFACE:
     EMBEDDINGS_MODEL = get_env_variable(
         "EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
     )
+    # torch (sentence-transformers), onnx, or onnx-int8 (int8 quantized weights)
+    HF_EMBEDDINGS_BACKEND = get_env_variable("HF_EMBEDDINGS_BACKEND", "torch").lower()
+    if HF_EMBEDDINGS_BACKEND not in ("torch", "onnx", "onnx-int8"):
+        raise ValueError(f"Unsupported HF_EMBEDDINGS_BACKEND: {HF_EMBEDDINGS_BACKEND}")
+    HF_EMBEDDINGS_BATCH_SIZE = int(get_env_variable("HF_EMBEDDINGS_BATCH_SIZE", "32"))
+    # Inference threads, apart from the request thread pool; 0 lets the backend pick
+    HF_EMBEDDINGS_THREADS = int(get_env_variable("HF_EMBEDDINGS_THREADS", "0"))
+    HF_ONNX_DIR = get_env_variable("HF_ONNX_DIR", "./onnx_models")
 elif EMBEDDINGS_PROVIDER == EmbeddingsProvider.HUGGINGFACETEI:
     EMBEDDINGS_MODEL = get_env_variable(
         "EMBEDDINGS_MODEL", "http://huggingfacetei:3000"
@@ -316,12 +468,102 @@ elif EMBEDDINGS_PROVIDER == EmbeddingsProvider.BEDROCK:
         "EMBEDDINGS_MODEL", "amazon.titan-embed-text-v1"
     )
     AWS_DEFAULT_REGION = get_env_variable("AWS_DEFAULT_REGION", "us-east-1")
+    # Concurrent invoke_model calls (and pooled connections) for Titan models,
+    # which embed one text per call
+    BEDROCK_EMBEDDINGS_CONCURRENCY = int(
+        get_env_variable("BEDROCK_EMBEDDINGS_CONCURRENCY", "16")
+    )
+    BEDROCK_MAX_ATTEMPTS = int(get_env_variable("BEDROCK_MAX_ATTEMPTS", "8"))
 elif EMBEDDINGS_PROVIDER == EmbeddingsProvider.CUSTOM_HUGGINGFACE:
     EMBEDDINGS_MODEL = get_env_variable("EMBEDDINGS_MODEL", "custom")
 else:
     raise ValueError(f"Unsupported embeddings provider: {EMBEDDINGS_PROVIDER}")
 
+# Replicas of a self-hosted embedding server, as comma-separated URLs
+EMBEDDINGS_ENDPOINTS = split_endpoints(
+    {
+        EmbeddingsProvider.HUGGINGFACETEI: EMBEDDINGS_MODEL,
+        EmbeddingsProvider.OLLAMA: OLLAMA_BASE_URL,
+        EmbeddingsProvider.CUSTOM_HUGGINGFACE: CUSTOM_HF_ENDPOINT,
+    }.get(EMBEDDINGS_PROVIDER)
+)
+# Concurrent embeddings provider requests; above 1, the batches of a text list
+# are dispatched concurrently under a limit adapted to rate limits and latency.
+# Defaults to one request per replica.
+EMBEDDINGS_MAX_CONCURRENCY = int(
+    get_env_variable("EMBEDDINGS_MAX_CONCURRENCY", max(1, len(EMBEDDINGS_ENDPOINTS)))
+)
+EMBEDDINGS_MAX_RETRIES = int(get_env_variable("EMBEDDINGS_MAX_RETRIES", "6"))
+# Stored and searched embedding size (0: the model's own); models that cannot
+# return it natively have their embeddings truncated and renormalized
+EMBEDDINGS_DIMENSIONS = int(get_env_variable("EMBEDDINGS_DIMENSIONS", "0"))
+
 embeddings = init_embeddings(EMBEDDINGS_PROVIDER, EMBEDDINGS_MODEL)
+embedding_router = embeddings if isinstance(embeddings, EmbeddingRouter) else None
+
+# Providers embedding a query exactly like a single document, so that several
+# queries can be embedded with one embed_documents call
+QUERY_EMBEDDINGS_BATCHABLE = EMBEDDINGS_PROVIDER in (
+    EmbeddingsProvider.OPENAI,
+    EmbeddingsProvider.AZURE,
+    EmbeddingsProvider.OLLAMA,
+)
+# Texts sent per embeddings provider request
+EMBEDDINGS_BATCH_SIZE = int(get_env_variable("EMBEDDINGS_CHUNK_SIZE", 200))
+# Query and /embeddings vectors kept in memory (float32, ~6 KiB at 1536 dimensions)
+EMBEDDING_CACHE_MAX_ENTRIES = int(get_env_variable("EMBEDDING_CACHE_MAX_ENTRIES", "1024"))
+# Send a second query embedding request when the first is slower than usual
+QUERY_EMBEDDING_HEDGING_ENABLED = (
+    get_env_variable("QUERY_EMBEDDING_HEDGING_ENABLED", "False").lower() == "true"
+)
+QUERY_EMBEDDING_HEDGE_PERCENTILE = float(
+    get_env_variable("QUERY_EMBEDDING_HEDGE_PERCENTILE", "95")
+)
+QUERY_EMBEDDING_HEDGE_DELAY_MS = float(
+    get_env_variable("QUERY_EMBEDDING_HEDGE_DELAY_MS", "200")
+)
+QUERY_EMBEDDING_HEDGE_BUDGET = float(
+    get_env_variable("QUERY_EMBEDDING_HEDGE_BUDGET", "0.05")
+)
+
+# Tokens per embeddings request accepted by each provider; 0 packs batches by
+# EMBEDDINGS_CHUNK_SIZE alone
+DEFAULT_EMBEDDINGS_MAX_TOKENS = {
+    EmbeddingsProvider.OPENAI: 300000,
+    EmbeddingsProvider.AZURE: 300000,
+    EmbeddingsProvider.GOOGLE_VERTEXAI: 20000,
+    EmbeddingsProvider.GOOGLE_GENAI: 20000,
+}
+EMBEDDINGS_MAX_TOKENS_PER_REQUEST = int(
+    get_env_variable(
+        "EMBEDDINGS_MAX_TOKENS_PER_REQUEST",
+        DEFAULT_EMBEDDINGS_MAX_TOKENS.get(EMBEDDINGS_PROVIDER, 0),
+    )
+)
+EMBEDDINGS_CHARS_PER_TOKEN = float(get_env_variable("EMBEDDINGS_CHARS_PER_TOKEN", "4"))
+# Models padding every text of a batch to its longest one
+EMBEDDINGS_SORT_BY_LENGTH = EMBEDDINGS_PROVIDER in (
+    EmbeddingsProvider.HUGGINGFACE,
+    EmbeddingsProvider.HUGGINGFACETEI,
+    EmbeddingsProvider.CUSTOM_HUGGINGFACE,
+)
+
+embeddings = embedding_dispatcher = DispatchingEmbeddings(
+    embeddings,
+    AdaptiveConcurrencyLimiter(
+        EMBEDDINGS_MAX_CONCURRENCY, max_retries=EMBEDDINGS_MAX_RETRIES
+    ),
+    batch_size=EMBEDDINGS_BATCH_SIZE,
+    max_tokens=EMBEDDINGS_MAX_TOKENS_PER_REQUEST,
+    token_counter=TokenCounter(
+        EMBEDDINGS_CHARS_PER_TOKEN,
+        tiktoken_model=EMBEDDINGS_MODEL
+        if EMBEDDINGS_PROVIDER in (EmbeddingsProvider.OPENAI, EmbeddingsProvider.AZURE)
+        else None,
+    ),
+    sort_by_length=EMBEDDINGS_SORT_BY_LENGTH,
+    dimensions=EMBEDDINGS_DIMENSIONS,
+)
 
 logger.info(f"Initialized embeddings of type: {type(embeddings)}")
 
@@ -360,6 +602,13 @@ elif VECTOR_DB_TYPE == VectorDBType.QDRANT:
         collection_name=QDRANT_COLLECTION_NAME,
         mode="qdrant",
     )
+elif VECTOR_DB_TYPE == VectorDBType.LOCAL:
+    vector_store = get_vector_store(
+        connection_string=LOCAL_VECTOR_STORE_PATH,
+        embeddings=embeddings,
+        collection_name=COLLECTION_NAME,
+        mode="local",
+    )
 else:
     raise ValueError(f"Unsupported vector store type: {VECTOR_DB_TYPE}")
 
@@ -1,10 +1,14 @@
 # app/middleware.py
 import os
 import jwt
+import zstandard
 from jwt import PyJWTError
 from fastapi import Request
 from datetime import datetime, timezone
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.config import logger
 
 
@@ -54,4 +58,90 @@ async def security_middleware(request: Request, call_next):
             status_code=401, content={"detail": f"Invalid token: {str(e)}"}
         )
 
-    return await next_middleware_call()
\ No newline at end of file
+    return await next_middleware_call()
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int = 3) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.compress(body) + self.compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+        return self.compressor.compress(body) + self.compressor.flush()
+
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    """Content codings of an Accept-Encoding header mapped to their q-values."""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least `minimum_size` bytes with zstd or gzip,
+    whichever the client accepts with the higher preference (zstd on ties).
+
+    Responses vary on Accept-Encoding, and their ETags are made weak for
+    clients accepting a compressed coding: the entity tag then stands for every
+    coding of the same content, which If-None-Match compares weakly anyway.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        compresslevel: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        super().__init__(app, minimum_size, compresslevel)
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(
+            Headers(scope=scope).get("Accept-Encoding", "")
+        )
+        zstd = encodings.get("zstd", 0.0)
+        gzip = encodings.get("gzip", 0.0)
+        responder: ASGIApp
+        if zstd > 0 and zstd >= gzip:
+            responder = ZstdResponder(self.app, self.minimum_size, self.zstd_level)
+        elif gzip > 0:
+            responder = GZipResponder(self.app, self.minimum_size, self.compresslevel)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        compressing = isinstance(responder, (GZipResponder, ZstdResponder))
+
+        async def send_negotiated(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if compressing and etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+
+        await responder(scope, receive, send_negotiated)
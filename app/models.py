@@ -1,8 +1,9 @@
 # app/models.py
 import hashlib
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
+from app.config import EMBEDDINGS_MAX_TEXTS, QUERY_BATCH_MAX_QUERIES
 
 
 class DocumentResponse(BaseModel):
@@ -10,6 +11,15 @@ class DocumentResponse(BaseModel):
     metadata: dict
 
 
+class DocumentPage(BaseModel):
+    documents: List[DocumentResponse]
+    # Pass as `cursor` to get the next page; None once the range is exhausted
+    next_cursor: Optional[int] = None
+    # Set instead of next_cursor when the page ends on chunks stored without an
+    # ordinal; pass back as `offset`
+    next_offset: Optional[int] = None
+
+
 class DocumentModel(BaseModel):
     page_content: str
     metadata: Optional[dict] = {}
@@ -26,11 +36,26 @@ class StoreDocument(BaseModel):
     file_id: str
 
 
+class SearchOptions(BaseModel):
+    """Per-query ANN settings, supported by the Qdrant vector store."""
+
+    hnsw_ef: Optional[int] = Field(None, ge=1)
+    exact: bool = False
+    # Rescore quantized candidates with the original vectors
+    rescore: Optional[bool] = None
+    # Candidates fetched from quantized vectors per requested result
+    oversampling: Optional[float] = Field(None, ge=1.0)
+
+    def params(self) -> dict:
+        return self.model_dump(exclude_defaults=True)
+
+
 class QueryRequestBody(BaseModel):
     query: str
     file_id: str
     k: int = 4
     entity_id: Optional[str] = None
+    search: Optional[SearchOptions] = None
 
 
 class CleanupMethod(str, Enum):
@@ -42,3 +67,35 @@ class QueryMultipleBody(BaseModel):
     query: str
     file_ids: List[str]
     k: int = 4
+    search: Optional[SearchOptions] = None
+
+
+class QueryBatchItem(BaseModel):
+    query: str
+    file_ids: List[str] = Field(min_length=1)
+    k: int = 4
+    search: Optional[SearchOptions] = None
+
+
+class QueryBatchBody(BaseModel):
+    queries: List[QueryBatchItem] = Field(
+        min_length=1, max_length=QUERY_BATCH_MAX_QUERIES
+    )
+    entity_id: Optional[str] = None
+
+
+class EmbeddingInputType(str, Enum):
+    query = "query"
+    document = "document"
+
+
+class EmbeddingEncoding(str, Enum):
+    float = "float"
+    base64 = "base64"
+    binary = "binary"
+
+
+class EmbeddingsBody(BaseModel):
+    texts: List[str] = Field(min_length=1, max_length=EMBEDDINGS_MAX_TEXTS)
+    input_type: EmbeddingInputType = EmbeddingInputType.document
+    encoding: EmbeddingEncoding = EmbeddingEncoding.float
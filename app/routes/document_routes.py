@@ -1,11 +1,14 @@
 # app/routes/document_routes.py
 import os
+import base64
+import asyncio
 import hashlib
 import traceback
 import aiofiles
 import aiofiles.os
 from shutil import copyfileobj
-from typing import List, Iterable
+from typing import List, Iterable, Optional, Tuple
+from fastapi.responses import ORJSONResponse
 from fastapi import (
     APIRouter,
     Request,
@@ -15,29 +18,59 @@ from fastapi import (
     Form,
     Body,
     Query,
+    Response,
     status,
 )
 from langchain_core.documents import Document
 from langchain_core.runnables import run_in_executor
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from functools import lru_cache
-
-from app.config import logger, vector_store, RAG_UPLOAD_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+import numpy as np
+
+from app.config import (
+    logger,
+    vector_store,
+    RAG_UPLOAD_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    HOT_FILE_CACHE_ON_INGEST,
+    FAST_JSON_RESPONSES,
+    QUERY_EMBEDDINGS_BATCHABLE,
+    EMBEDDINGS_MODEL,
+    embedding_dispatcher,
+    embedding_router,
+)
 from app.constants import ERROR_MESSAGES
 from app.models import (
     StoreDocument,
     QueryRequestBody,
+    DocumentPage,
     DocumentResponse,
     QueryMultipleBody,
+    QueryBatchBody,
+    EmbeddingsBody,
+    EmbeddingEncoding,
 )
-from app.services.vector_store.async_pg_vector import AsyncPgVector
+from app.services.embedding_cache import DOCUMENT, QUERY, embedding_cache
+from app.services.query_hedging import query_hedger
+from app.services.hot_file_cache import hot_file_cache
+from app.services.invalidation import invalidation_bus
+from app.services.query_batch import QueryEmbeddingBatch
+from app.services.query_cache import query_cache, filter_file_ids
+from app.services.semantic_cache import semantic_cache
+from app.services.vector_store.factory import ASYNC_VECTOR_STORES
+from app.services.vector_store.qdrant_vector import QdrantVector
+from app.services.vector_store.file_catalog import CHUNK_INDEX_KEY
 from app.utils.document_loader import (
     get_loader,
     clean_text,
     process_documents,
     cleanup_temp_encoding_file,
 )
+from app.utils.etag import catalog_etag, etag_matches
+from app.utils.fast_json import document_response_rows, scored_rows
 from app.utils.health import is_health_ok
+from app.utils.precomputed import load_precomputed_chunks
 
 router = APIRouter()
 
@@ -131,14 +164,26 @@ async def cleanup_temp_file_async(file_path: str) -> None:
 
 
 @router.get("/ids")
-async def get_all_ids(request: Request):
+async def get_all_ids(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+):
+    """List file_ids from the file catalog; pass `limit` and the last id as `after` to page."""
     try:
-        if isinstance(vector_store, AsyncPgVector):
-            ids = await vector_store.get_all_ids(executor=request.app.state.thread_pool)
+        page = {
+            key: value
+            for key, value in (("limit", limit), ("after", after))
+            if value is not None
+        }
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
+            ids = await vector_store.get_all_ids(
+                executor=request.app.state.thread_pool, **page
+            )
         else:
-            ids = vector_store.get_all_ids()
+            ids = vector_store.get_all_ids(**page)
 
-        return list(set(ids))
+        return list(dict.fromkeys(ids))
     except HTTPException as http_exc:
         logger.error(
             "HTTP Exception in get_all_ids | Status: %d | Detail: %s",
@@ -172,22 +217,56 @@ async def health_check():
         return {"status": "DOWN", "error": str(e)}, 503
 
 
+async def fetch_documents(request: Request, ids: List[str]):
+    """Chunks of the given file ids and the ids without any, in one round trip."""
+    if isinstance(vector_store, ASYNC_VECTOR_STORES):
+        return await vector_store.fetch_documents_by_ids(
+            ids, executor=request.app.state.thread_pool
+        )
+    return vector_store.fetch_documents_by_ids(ids)
+
+
+async def files_etag(request: Request, ids: List[str], variant: str) -> Optional[str]:
+    """ETag of a response built from the given files, None if one is not cataloged."""
+    if isinstance(vector_store, ASYNC_VECTOR_STORES):
+        entries = await vector_store.get_file_catalog(
+            ids, executor=request.app.state.thread_pool
+        )
+    else:
+        entries = vector_store.get_file_catalog(ids)
+    if {entry["file_id"] for entry in entries} != set(ids):
+        return None
+    return catalog_etag(entries, variant)
+
+
+def cache_headers(etag: Optional[str]) -> dict:
+    # Clients may keep the response but must revalidate it with If-None-Match
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    if etag is not None and etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag)
+        )
+    return None
+
+
 @router.get("/documents", response_model=list[DocumentResponse])
-async def get_documents_by_ids(request: Request, ids: list[str] = Query(...)):
+async def get_documents_by_ids(
+    request: Request, response: Response, ids: list[str] = Query(...)
+):
     try:
-        if isinstance(vector_store, AsyncPgVector):
-            existing_ids = await vector_store.get_filtered_ids(
-                ids, executor=request.app.state.thread_pool
-            )
-            documents = await vector_store.get_documents_by_ids(
-                ids, executor=request.app.state.thread_pool
-            )
-        else:
-            existing_ids = vector_store.get_filtered_ids(ids)
-            documents = vector_store.get_documents_by_ids(ids)
+        etag = await files_etag(request, ids, "documents")
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
+
+        documents, missing_ids = await fetch_documents(request, ids)
 
         # Ensure all requested ids exist
-        if not all(id in existing_ids for id in ids):
+        if missing_ids:
             raise HTTPException(status_code=404, detail="One or more IDs not found")
 
         # Ensure documents list is not empty
@@ -196,6 +275,11 @@ async def get_documents_by_ids(request: Request, ids: list[str] = Query(...)):
                 status_code=404, detail="No documents found for the given IDs"
             )
 
+        response.headers.update(cache_headers(etag))
+        if FAST_JSON_RESPONSES:
+            return ORJSONResponse(
+                document_response_rows(documents), headers=cache_headers(etag)
+            )
         return documents
     except HTTPException as http_exc:
         logger.error(
@@ -217,7 +301,7 @@ async def get_documents_by_ids(request: Request, ids: list[str] = Query(...)):
 @router.delete("/documents")
 async def delete_documents(request: Request, document_ids: List[str] = Body(...)):
     try:
-        if isinstance(vector_store, AsyncPgVector):
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
             existing_ids = await vector_store.get_filtered_ids(
                 document_ids, executor=request.app.state.thread_pool
             )
@@ -228,6 +312,8 @@ async def delete_documents(request: Request, document_ids: List[str] = Body(...)
             existing_ids = vector_store.get_filtered_ids(document_ids)
             vector_store.delete(ids=document_ids)
 
+        await invalidation_bus.publish(document_ids)
+
         if not all(id in existing_ids for id in document_ids):
             raise HTTPException(status_code=404, detail="One or more IDs not found")
 
@@ -252,70 +338,186 @@ async def delete_documents(request: Request, document_ids: List[str] = Body(...)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Cache the embedding function with LRU cache
-@lru_cache(maxsize=128)
-def get_cached_query_embedding(query: str):
-    return vector_store.embedding_function.embed_query(query)
+def embed_texts(
+    texts: List[str], input_type: str = DOCUMENT
+) -> Tuple[List[np.ndarray], int]:
+    """
+    Float32 embeddings of `texts` and how many distinct texts were cached.
+    Duplicates are embedded once; the embedding dispatcher packs the misses
+    into provider requests. Query requests are hedged when enabled.
+    """
+    unique = list(dict.fromkeys(texts))
+    found = embedding_cache.get_many(input_type, unique)
+    cached = len(found)
+    misses = [text for text in unique if text not in found]
+    if misses:
+        embedding_function = vector_store.embedding_function
+
+        def embed():
+            if input_type == DOCUMENT or QUERY_EMBEDDINGS_BATCHABLE:
+                return embedding_function.embed_documents(misses)
+            return [embedding_function.embed_query(text) for text in misses]
+
+        if input_type == QUERY and query_hedger is not None:
+            embeddings = query_hedger.call(embed)
+        else:
+            embeddings = embed()
+        if len(embeddings) != len(misses):
+            raise ValueError(
+                f"Expected {len(misses)} embeddings, got {len(embeddings)}"
+            )
+        computed = dict(zip(misses, embeddings))
+        embedding_cache.put_many(input_type, computed)
+        for text, embedding in computed.items():
+            found[text] = np.asarray(embedding, dtype=np.float32)
+    return [found[text] for text in texts], cached
 
 
-@router.post("/query")
-async def query_embeddings_by_file_id(
-    body: QueryRequestBody,
-    request: Request,
-):
-    if not hasattr(request.state, "user"):
-        user_authorized = body.entity_id if body.entity_id else "public"
-    else:
-        user_authorized = (
-            body.entity_id if body.entity_id else request.state.user.get("id")
-        )
+def get_cached_query_embedding(query: str):
+    return embed_texts([query], QUERY)[0][0].tolist()
 
-    authorized_documents = []
 
-    try:
-        embedding = get_cached_query_embedding(body.query)
+async def similarity_search(
+    query: str,
+    k: int,
+    filter: dict,
+    executor=None,
+    embedding_batch: Optional[QueryEmbeddingBatch] = None,
+    search_params: Optional[dict] = None,
+) -> list:
+    """
+    Run a scored similarity search, served from the query caches when enabled.
+    With `embedding_batch`, the query is embedded together with the other
+    searches of the batch. `search_params` tune the Qdrant search.
+    """
+    search_params = search_params or {}
+    if search_params and not isinstance(vector_store, QdrantVector):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Search options are only supported with the Qdrant vector store",
+        )
+    search_kwargs = {"search_params": search_params} if search_params else {}
+    file_ids = filter_file_ids(filter)
+    cache_key = None
+    if query_cache is not None:
+        cache_key = query_cache.make_key(query, filter, k, **search_params)
+        documents = query_cache.get(cache_key)
+        if documents is not None:
+            return documents
+        generation = query_cache.generation()
+    if semantic_cache is not None:
+        semantic_key = semantic_cache.make_key(filter, k, **search_params)
+        semantic_generation = semantic_cache.generation()
+
+    if embedding_batch is not None:
+        embedding = await embedding_batch.embed(query)
+    else:
+        # Provider calls and hedge waits block, so keep them off the event loop
+        embedding = await run_in_executor(executor, get_cached_query_embedding, query)
+
+    documents = None
+    if semantic_cache is not None:
+        documents = semantic_cache.get(semantic_key, embedding)
+        semantic_hit = documents is not None
+
+    if documents is None and hot_file_cache is not None:
+        documents = hot_file_cache.search(filter, embedding, k)
+        if documents is None:
+            hot_file_cache.schedule_load(
+                hot_file_cache.cacheable_file_ids(filter), executor
+            )
 
-        if isinstance(vector_store, AsyncPgVector):
+    if documents is None:
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
             documents = await vector_store.asimilarity_search_with_score_by_vector(
                 embedding,
-                k=body.k,
-                filter={"file_id": body.file_id},
-                executor=request.app.state.thread_pool,
+                k=k,
+                filter=filter,
+                executor=executor,
+                **search_kwargs,
             )
         else:
             documents = vector_store.similarity_search_with_score_by_vector(
-                embedding, k=body.k, filter={"file_id": body.file_id}
+                embedding, k=k, filter=filter, **search_kwargs
             )
 
-        if not documents:
-            return authorized_documents
+    if semantic_cache is not None and not semantic_hit:
+        semantic_cache.put(
+            semantic_key, file_ids, embedding, documents, semantic_generation
+        )
+
+    if cache_key is not None:
+        query_cache.put(cache_key, file_ids, documents, generation)
+    return documents
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "query_cache": query_cache.stats() if query_cache is not None else None,
+        "semantic_cache": (
+            semantic_cache.stats() if semantic_cache is not None else None
+        ),
+        "hot_file_cache": (
+            hot_file_cache.stats() if hot_file_cache is not None else None
+        ),
+    }
 
-        document, score = documents[0]
-        doc_metadata = document.metadata
-        doc_user_id = doc_metadata.get("user_id")
 
-        if doc_user_id is None or doc_user_id == user_authorized:
-            authorized_documents = documents
+def authorize_documents(
+    request: Request, documents: list, entity_id: Optional[str] = None
+) -> list:
+    """
+    Search results the caller may read: chunks without a user_id, or owned by
+    `entity_id` (defaulting to the authenticated user, else "public"). When an
+    entity_id is denied, the authenticated user's own id is tried instead.
+    Results are checked per file, as all chunks of a file share its user_id.
+    """
+    user = getattr(request.state, "user", None)
+    user_authorized = entity_id if entity_id else (user.get("id") if user else "public")
+    allowed = {user_authorized}
+    if entity_id and user is not None:
+        allowed.add(user.get("id"))
+
+    authorized_documents = []
+    denied = set()
+    for document, score in documents:
+        doc_user_id = document.metadata.get("user_id")
+        if doc_user_id is None or doc_user_id in allowed:
+            authorized_documents.append((document, score))
         else:
-            # If using entity_id and access denied, try again with user's actual ID
-            if body.entity_id and hasattr(request.state, "user"):
-                user_authorized = request.state.user.get("id")
-                if doc_user_id == user_authorized:
-                    authorized_documents = documents
-                else:
-                    if body.entity_id == doc_user_id:
-                        logger.warning(
-                            f"Entity ID {body.entity_id} matches document user_id but user {user_authorized} is not authorized"
-                        )
-                    else:
-                        logger.warning(
-                            f"Access denied for both entity ID {body.entity_id} and user {user_authorized} to document with user_id {doc_user_id}"
-                        )
-            else:
-                logger.warning(
-                    f"Unauthorized access attempt by user {user_authorized} to a document with user_id {doc_user_id}"
-                )
+            denied.add(doc_user_id)
+    for doc_user_id in denied:
+        if entity_id and user is not None:
+            logger.warning(
+                f"Access denied for both entity ID {entity_id} and user {user.get('id')} to document with user_id {doc_user_id}"
+            )
+        else:
+            logger.warning(
+                f"Unauthorized access attempt by user {user_authorized} to a document with user_id {doc_user_id}"
+            )
+    return authorized_documents
+
 
+@router.post("/query")
+async def query_embeddings_by_file_id(
+    body: QueryRequestBody,
+    request: Request,
+):
+    try:
+        documents = await similarity_search(
+            body.query,
+            k=body.k,
+            filter={"file_id": body.file_id},
+            executor=request.app.state.thread_pool,
+            search_params=body.search and body.search.params(),
+        )
+
+        authorized_documents = authorize_documents(request, documents, body.entity_id)
+
+        if FAST_JSON_RESPONSES:
+            return ORJSONResponse(scored_rows(authorized_documents))
         return authorized_documents
 
     except HTTPException as http_exc:
@@ -354,7 +556,7 @@ async def store_data_in_vector_db(
     executor=None,
 ) -> bool:
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
     )
     documents = text_splitter.split_documents(data)
 
@@ -372,19 +574,25 @@ async def store_data_in_vector_db(
                 "user_id": user_id,
                 "digest": generate_digest(doc.page_content),
                 **(doc.metadata or {}),
+                # Ordinal within the file, for range and cursor reads
+                CHUNK_INDEX_KEY: index,
             },
         )
-        for doc in documents
+        for index, doc in enumerate(documents)
     ]
 
     try:
-        if isinstance(vector_store, AsyncPgVector):
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
             ids = await vector_store.aadd_documents(
                 docs, ids=[file_id] * len(documents), executor=executor
             )
         else:
             ids = vector_store.add_documents(docs, ids=[file_id] * len(documents))
 
+        await invalidation_bus.publish([file_id])
+        if hot_file_cache is not None and HOT_FILE_CACHE_ON_INGEST:
+            hot_file_cache.schedule_load([file_id], executor)
+
         return {"message": "Documents added successfully", "ids": ids}
 
     except Exception as e:
@@ -549,22 +757,17 @@ async def embed_file(
 
 
 @router.get("/documents/{id}/context")
-async def load_document_context(request: Request, id: str):
+async def load_document_context(request: Request, response: Response, id: str):
     ids = [id]
     try:
-        if isinstance(vector_store, AsyncPgVector):
-            existing_ids = await vector_store.get_filtered_ids(
-                ids, executor=request.app.state.thread_pool
-            )
-            documents = await vector_store.get_documents_by_ids(
-                ids, executor=request.app.state.thread_pool
-            )
-        else:
-            existing_ids = vector_store.get_filtered_ids(ids)
-            documents = vector_store.get_documents_by_ids(ids)
+        etag = await files_etag(request, ids, "context")
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
+
+        documents, missing_ids = await fetch_documents(request, ids)
 
         # Ensure the requested id exists
-        if not all(id in existing_ids for id in ids):
+        if missing_ids:
             raise HTTPException(
                 status_code=404, detail="The specified file_id was not found"
             )
@@ -575,6 +778,7 @@ async def load_document_context(request: Request, id: str):
                 status_code=404, detail="No document found for the given ID"
             )
 
+        response.headers.update(cache_headers(etag))
         return process_documents(documents)
     except HTTPException as http_exc:
         logger.error(
@@ -596,6 +800,99 @@ async def load_document_context(request: Request, id: str):
         )
 
 
+@router.get("/documents/{id}/chunks", response_model=DocumentPage)
+async def get_document_chunks(
+    request: Request,
+    response: Response,
+    id: str,
+    cursor: Optional[int] = Query(None, ge=0),
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    page_start: Optional[int] = Query(None, ge=0),
+    page_end: Optional[int] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: Optional[int] = Query(None, ge=0),
+):
+    """
+    Chunks of one file in ingest order, `limit` at a time. `start`/`end` select
+    a range of chunk ordinals (end exclusive), `page_start`/`page_end` a range
+    of source pages (inclusive), and `cursor` continues from a previous page.
+    Chunks stored without an ordinal can only be paged through by `offset`.
+    """
+    if cursor is not None:
+        start = cursor if start is None else max(start, cursor)
+    page = dict(
+        start=start,
+        end=end,
+        page_start=page_start,
+        page_end=page_end,
+        limit=limit,
+        offset=offset,
+    )
+    try:
+        etag = await files_etag(request, [id], "chunks")
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
+
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
+            documents = await vector_store.get_file_chunks(
+                id, executor=request.app.state.thread_pool, **page
+            )
+            existing_ids = (
+                [id]
+                if documents
+                else await vector_store.get_filtered_ids(
+                    [id], executor=request.app.state.thread_pool
+                )
+            )
+        else:
+            documents = vector_store.get_file_chunks(id, **page)
+            existing_ids = [id] if documents else vector_store.get_filtered_ids([id])
+
+        if id not in existing_ids:
+            raise HTTPException(
+                status_code=404, detail="The specified file_id was not found"
+            )
+
+        next_cursor = next_offset = None
+        if len(documents) == limit:
+            last = documents[-1].metadata.get(CHUNK_INDEX_KEY)
+            if offset is None and last is not None:
+                next_cursor = int(last) + 1
+            else:
+                next_offset = (offset or 0) + limit
+        response.headers.update(cache_headers(etag))
+        if FAST_JSON_RESPONSES:
+            return ORJSONResponse(
+                {
+                    "documents": document_response_rows(documents),
+                    "next_cursor": next_cursor,
+                    "next_offset": next_offset,
+                },
+                headers=cache_headers(etag),
+            )
+        return {
+            "documents": documents,
+            "next_cursor": next_cursor,
+            "next_offset": next_offset,
+        }
+    except HTTPException as http_exc:
+        logger.error(
+            "HTTP Exception in get_document_chunks | Status: %d | Detail: %s",
+            http_exc.status_code,
+            http_exc.detail,
+        )
+        raise http_exc
+    except Exception as e:
+        logger.error(
+            "Error getting document chunks | Document ID: %s | Error: %s | Traceback: %s",
+            id,
+            str(e),
+            traceback.format_exc(),
+        )
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/embed-upload")
 async def embed_file_upload(
     request: Request,
@@ -659,24 +956,168 @@ async def embed_file_upload(
     }
 
 
-@router.post("/query_multiple")
-async def query_embeddings_by_file_ids(request: Request, body: QueryMultipleBody):
+@lru_cache(maxsize=1)
+def get_embedding_dimensions() -> int:
+    # One provider call per process to learn the configured model's dimensions
+    return len(vector_store.embedding_function.embed_query("dimensions"))
+
+
+@router.post("/embed-precomputed")
+async def embed_precomputed(
+    request: Request,
+    file_id: str = Form(...),
+    model: str = Form(...),
+    chunks: UploadFile = File(...),
+    vectors: UploadFile = File(...),
+    entity_id: str = Form(None),
+):
+    """
+    Store chunks embedded upstream with the configured model, skipping loading,
+    splitting and embedding. `chunks` is JSONL with one
+    `{"page_content": ..., "metadata": {...}}` object per line and `vectors` a
+    `.npy` float array with one row per chunk, in the same order.
+    """
+    user_id = get_user_id(request, entity_id)
+    if model != EMBEDDINGS_MODEL:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Vectors were computed with {model!r}, the configured model is {EMBEDDINGS_MODEL!r}",
+        )
+    executor = request.app.state.thread_pool
     try:
-        # Get the embedding of the query text
-        embedding = get_cached_query_embedding(body.query)
+        texts, metadatas, array = load_precomputed_chunks(
+            await chunks.read(),
+            await vectors.read(),
+            await run_in_executor(executor, get_embedding_dimensions),
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+    if not texts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No chunks were provided"
+        )
 
-        # Perform similarity search with the query embedding and filter by the file_ids in metadata
-        if isinstance(vector_store, AsyncPgVector):
-            documents = await vector_store.asimilarity_search_with_score_by_vector(
-                embedding,
-                k=body.k,
-                filter={"file_id": {"$in": body.file_ids}},
-                executor=request.app.state.thread_pool,
+    # Server-set keys come last so client metadata cannot retag ownership
+    metadatas = [
+        {
+            "digest": generate_digest(text),
+            **metadata,
+            "file_id": file_id,
+            "user_id": user_id,
+            CHUNK_INDEX_KEY: index,
+        }
+        for index, (text, metadata) in enumerate(zip(texts, metadatas))
+    ]
+    ids = [file_id] * len(texts)
+    try:
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
+            await vector_store.aadd_embeddings(
+                texts, array.tolist(), metadatas, ids, executor=executor
             )
         else:
-            documents = vector_store.similarity_search_with_score_by_vector(
-                embedding, k=body.k, filter={"file_id": {"$in": body.file_ids}}
-            )
+            vector_store.add_embeddings(texts, array.tolist(), metadatas, ids)
+
+        await invalidation_bus.publish([file_id])
+        if hot_file_cache is not None and HOT_FILE_CACHE_ON_INGEST:
+            hot_file_cache.schedule_load([file_id], executor)
+    except Exception as e:
+        logger.error(
+            "Failed to store precomputed embeddings | File ID: %s | Error: %s | Traceback: %s",
+            file_id,
+            str(e),
+            traceback.format_exc(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store the precomputed embeddings. Error: {str(e)}",
+        )
+
+    return {
+        "status": True,
+        "message": "Embeddings stored successfully.",
+        "file_id": file_id,
+        "chunks": len(texts),
+    }
+
+
+@router.get("/embeddings/stats")
+async def get_embeddings_stats():
+    """
+    Batching, adaptive concurrency, throughput and throttling of provider
+    requests, the health of each replica when several are configured, and
+    query embedding hedging.
+    """
+    return {
+        **embedding_dispatcher.stats(),
+        "endpoints": embedding_router.stats() if embedding_router is not None else None,
+        "query_hedging": query_hedger.stats() if query_hedger is not None else None,
+    }
+
+
+@router.post("/embeddings")
+async def create_embeddings(request: Request, body: EmbeddingsBody):
+    """
+    Embed texts with the configured model, sharing this server's embedding
+    cache. `base64` returns each vector as base64 of little-endian float32
+    values; `binary` returns one `application/octet-stream` body of all
+    vectors back to back, described by the X-Embedding-* headers.
+    """
+    try:
+        embeddings, cached = await run_in_executor(
+            request.app.state.thread_pool,
+            embed_texts,
+            body.texts,
+            body.input_type.value,
+        )
+    except Exception as e:
+        logger.error(
+            "Error creating embeddings | Texts: %d | Error: %s | Traceback: %s",
+            len(body.texts),
+            str(e),
+            traceback.format_exc(),
+        )
+        raise HTTPException(status_code=500, detail=str(e))
+
+    matrix = np.stack(embeddings).astype("<f4", copy=False)
+    if body.encoding == EmbeddingEncoding.binary:
+        return Response(
+            content=matrix.tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "X-Embedding-Model": EMBEDDINGS_MODEL,
+                "X-Embedding-Count": str(matrix.shape[0]),
+                "X-Embedding-Dimensions": str(matrix.shape[1]),
+                "X-Embedding-Cached": str(cached),
+            },
+        )
+    if body.encoding == EmbeddingEncoding.base64:
+        vectors = [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+    else:
+        vectors = matrix.tolist()
+    return ORJSONResponse(
+        {
+            "model": EMBEDDINGS_MODEL,
+            "dimensions": matrix.shape[1],
+            "encoding": body.encoding.value,
+            "cached": cached,
+            "embeddings": vectors,
+        }
+    )
+
+
+@router.post("/query_multiple")
+async def query_embeddings_by_file_ids(request: Request, body: QueryMultipleBody):
+    try:
+        # Perform similarity search with the query embedding and filter by the file_ids in metadata
+        documents = await similarity_search(
+            body.query,
+            k=body.k,
+            filter={"file_id": {"$in": body.file_ids}},
+            executor=request.app.state.thread_pool,
+            search_params=body.search and body.search.params(),
+        )
 
         # Ensure documents list is not empty
         if not documents:
@@ -684,6 +1125,8 @@ async def query_embeddings_by_file_ids(request: Request, body: QueryMultipleBody
                 status_code=404, detail="No documents found for the given query"
             )
 
+        if FAST_JSON_RESPONSES:
+            return ORJSONResponse(scored_rows(documents))
         return documents
     except HTTPException as http_exc:
         logger.error(
@@ -703,6 +1146,65 @@ async def query_embeddings_by_file_ids(request: Request, body: QueryMultipleBody
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query_batch")
+async def query_embeddings_batch(request: Request, body: QueryBatchBody):
+    """
+    Run several queries in one request. Queries missing from the result cache
+    are embedded together and all searches run concurrently; results are
+    returned in request order, each filtered by the same rules as `/query`.
+    """
+    executor = request.app.state.thread_pool
+    embedding_batch = QueryEmbeddingBatch(
+        get_cached_query_embedding,
+        (
+            (lambda queries: [e.tolist() for e in embed_texts(queries, QUERY)[0]])
+            if QUERY_EMBEDDINGS_BATCHABLE
+            else None
+        ),
+        executor,
+    )
+    try:
+        results = await asyncio.gather(
+            *(
+                similarity_search(
+                    item.query,
+                    k=item.k,
+                    filter=(
+                        {"file_id": item.file_ids[0]}
+                        if len(item.file_ids) == 1
+                        else {"file_id": {"$in": item.file_ids}}
+                    ),
+                    executor=executor,
+                    embedding_batch=embedding_batch,
+                    search_params=item.search and item.search.params(),
+                )
+                for item in body.queries
+            )
+        )
+        results = [
+            authorize_documents(request, documents, body.entity_id)
+            for documents in results
+        ]
+        if FAST_JSON_RESPONSES:
+            return ORJSONResponse([scored_rows(documents) for documents in results])
+        return results
+    except HTTPException as http_exc:
+        logger.error(
+            "HTTP Exception in query_embeddings_batch | Status: %d | Detail: %s",
+            http_exc.status_code,
+            http_exc.detail,
+        )
+        raise http_exc
+    except Exception as e:
+        logger.error(
+            "Error in batch query embeddings | Queries: %d | Error: %s | Traceback: %s",
+            len(body.queries),
+            str(e),
+            traceback.format_exc(),
+        )
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/text")
 async def extract_text_from_file(
     request: Request,
@@ -0,0 +1,67 @@
+# app/services/bedrock_embeddings.py
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+# Texts per invoke_model call accepted by Cohere embedding models
+COHERE_MAX_TEXTS = 96
+
+
+class BedrockParallelEmbeddings(Embeddings):
+    """
+    Bedrock embeddings invoking the model for many texts at once.
+
+    Titan models embed one text per `invoke_model` call, so the texts of a
+    batch are sent on up to `max_workers` concurrent calls; the client's
+    connection pool should be at least that large. Cohere models accept up to
+    96 texts per call and are called with those native batches instead.
+    Request bodies match langchain's BedrockEmbeddings, so vectors stay
+    comparable with ones it stored.
+    """
+
+    def __init__(self, client, model_id: str, max_workers: int = 16):
+        self.client = client
+        self.model_id = model_id
+        self.max_workers = max_workers
+        self.is_cohere = "cohere." in model_id
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bedrock"
+        )
+
+    def _invoke(self, body: dict) -> dict:
+        response = self.client.invoke_model(
+            body=json.dumps(body),
+            modelId=self.model_id,
+            accept="application/json",
+            contentType="application/json",
+        )
+        return json.loads(response["body"].read())
+
+    def _embed_text(self, text: str) -> List[float]:
+        # Newlines affect Titan embeddings; langchain replaces them likewise
+        return self._invoke({"inputText": text.replace(os.linesep, " ")})["embedding"]
+
+    def _embed_cohere(self, texts: List[str], input_type: str) -> List[List[float]]:
+        return self._invoke({"texts": texts, "input_type": input_type})["embeddings"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.is_cohere:
+            batches = [
+                texts[start : start + COHERE_MAX_TEXTS]
+                for start in range(0, len(texts), COHERE_MAX_TEXTS)
+            ]
+            results = self._executor.map(
+                lambda batch: self._embed_cohere(batch, "search_document"), batches
+            )
+            return [embedding for batch in results for embedding in batch]
+        if len(texts) == 1:
+            return [self._embed_text(texts[0])]
+        return list(self._executor.map(self._embed_text, texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.is_cohere:
+            return self._embed_cohere([text], "search_query")[0]
+        return self._embed_text(text)
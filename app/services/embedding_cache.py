@@ -0,0 +1,78 @@
+# app/services/embedding_cache.py
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_MAX_ENTRIES, QUERY_EMBEDDINGS_BATCHABLE
+
+QUERY = "query"
+DOCUMENT = "document"
+
+
+class EmbeddingCache:
+    """
+    LRU cache of text embeddings, stored as float32 vectors.
+
+    Query and document embeddings are kept apart, unless the provider embeds a
+    query exactly like a single document (`shared`), in which case either kind
+    of request can be served from the other's entries.
+    """
+
+    def __init__(self, max_entries: int, shared: bool = False):
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, input_type: str, text: str) -> Tuple[str, str]:
+        return (DOCUMENT if self.shared else input_type, text)
+
+    def get_many(self, input_type: str, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Cached embeddings of the given texts, by text."""
+        found = {}
+        with self._lock:
+            for text in texts:
+                key = self._key(input_type, text)
+                embedding = self._entries.get(key)
+                if embedding is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[text] = embedding
+        return found
+
+    def get(self, input_type: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(input_type, [text]).get(text)
+
+    def put_many(self, input_type: str, embeddings: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for text, embedding in embeddings.items():
+                key = self._key(input_type, text)
+                self._entries[key] = np.asarray(embedding, dtype=np.float32)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, input_type: str, text: str, embedding: List[float]) -> None:
+        self.put_many(input_type, {text: embedding})
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_MAX_ENTRIES, shared=QUERY_EMBEDDINGS_BATCHABLE
+)
@@ -0,0 +1,404 @@
+# app/services/embedding_dispatch.py
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Exception class names providers use for rate limit responses
+RATE_LIMIT_ERRORS = {
+    "RateLimitError",
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ThrottlingException",
+}
+MAX_BACKOFF_SECONDS = 60.0
+BASELINE_MIN_SAMPLES = 3
+BASELINE_WEIGHT = 0.1
+
+
+class TokenCounter:
+    """
+    Token counts of texts, from the model's tiktoken encoding when one is given
+    and can be loaded, or from a characters-per-token ratio otherwise.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, tiktoken_model: str = None):
+        self.chars_per_token = chars_per_token
+        self.tiktoken_model = tiktoken_model
+        self._encoding = None
+        self._loaded = tiktoken_model is None
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        if self._loaded:
+            return self._encoding
+        with self._lock:
+            if not self._loaded:
+                try:
+                    import tiktoken
+
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(
+                            self.tiktoken_model
+                        )
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(
+                        "No tiktoken encoding for %s, "
+                        "estimating %.1f characters per token: %s",
+                        self.tiktoken_model,
+                        self.chars_per_token,
+                        e,
+                    )
+                self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode_ordinary(text))
+        return int(len(text) / self.chars_per_token) + 1
+
+
+def plan_batches(
+    tokens: Sequence[int],
+    max_items: int,
+    max_tokens: int = 0,
+    sort_by_length: bool = False,
+) -> List[List[int]]:
+    """
+    Group text positions into provider requests of at most `max_items` texts
+    and, when `max_tokens` is set, at most `max_tokens` tokens; a longer text is
+    sent on its own. Sorting by length first keeps texts of similar lengths
+    together, so local models pad each batch less.
+    """
+    order = range(len(tokens))
+    if sort_by_length:
+        order = sorted(order, key=tokens.__getitem__)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    batch_tokens = 0
+    for index in order:
+        if batch and (
+            len(batch) >= max_items
+            or (max_tokens and batch_tokens + tokens[index] > max_tokens)
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens[index]
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def truncate_embeddings(
+    embeddings: List[List[float]], dimensions: int
+) -> List[List[float]]:
+    """
+    Matryoshka truncation: the first `dimensions` values of each embedding,
+    renormalized to unit length. Embeddings already that size are unchanged.
+    """
+    if not dimensions or not embeddings:
+        return embeddings
+    size = len(embeddings[0])
+    if size < dimensions:
+        raise ValueError(
+            f"The model returns {size}-dimensional embeddings, "
+            f"fewer than the {dimensions} dimensions configured"
+        )
+    if size == dimensions:
+        return embeddings
+    array = np.asarray(embeddings, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    return (array / np.clip(norms, 1e-12, None)).tolist()
+
+
+def _response_headers(error: Exception) -> dict:
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        return response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+    return getattr(response, "headers", None) or {}
+
+
+def is_rate_limited(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if response.get("Error", {}).get("Code") in RATE_LIMIT_ERRORS:
+            return True
+    else:
+        status = getattr(error, "status_code", None) or getattr(
+            response, "status_code", None
+        )
+    return status == 429 or type(error).__name__ in RATE_LIMIT_ERRORS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from the Retry-After(-ms) header of a rate limit error."""
+    headers = _response_headers(error)
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent embeddings provider requests, shared by every
+    ingestion in the process.
+
+    The limit grows by one request per limit's worth of successes and is halved
+    on a rate limit response, which also pauses every caller until the
+    response's Retry-After (or an exponential backoff) has passed. A success
+    taking more than `latency_tolerance` times the usual latency of batches of
+    a similar token count (a moving average per power-of-two bucket) shrinks
+    the limit by a quarter, before the provider starts refusing. Queries are
+    not counted against the limit and do not move it.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        max_retries: int = 6,
+        latency_tolerance: float = 3.0,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.max_retries = max_retries
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min_limit)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queries_in_flight = 0
+        self._paused_until = 0.0
+        # Token count bucket -> (samples, moving average latency)
+        self._baselines: Dict[int, Tuple[int, float]] = {}
+        self._busy_since: Optional[float] = None
+        self._busy_seconds = 0.0
+        self.requests = 0
+        self.tokens = 0
+        self.throttles = 0
+        self.slowdowns = 0
+        self.last_throttle: Optional[float] = None
+
+    def _acquire(self, queue: bool) -> None:
+        with self._cond:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and (not queue or self._in_flight < int(self.limit)):
+                    break
+                self._cond.wait(pause if pause > 0 else None)
+            if not queue:
+                self._queries_in_flight += 1
+                return
+            if self._busy_since is None:
+                self._busy_since = time.monotonic()
+            self._in_flight += 1
+
+    def _release(self, queue: bool) -> None:
+        if not queue:
+            self._queries_in_flight -= 1
+            return
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._busy_seconds += time.monotonic() - self._busy_since
+            self._busy_since = None
+        self._cond.notify_all()
+
+    def _slow(self, tokens: int, latency: float) -> bool:
+        """Record the latency, and whether it was slow for its batch size."""
+        bucket = max(tokens, 1).bit_length()
+        samples, average = self._baselines.get(bucket, (0, latency))
+        slow = (
+            samples >= BASELINE_MIN_SAMPLES
+            and latency > self.latency_tolerance * average
+        )
+        average += BASELINE_WEIGHT * (latency - average)
+        self._baselines[bucket] = (samples + 1, average)
+        return slow
+
+    def _succeeded(self, tokens: int, latency: float, queue: bool) -> None:
+        with self._cond:
+            self._release(queue)
+            if not queue:
+                return
+            self.requests += 1
+            self.tokens += tokens
+            if self._slow(tokens, latency):
+                self.slowdowns += 1
+                self.limit = max(self.min_limit, self.limit * 0.75)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / int(self.limit))
+
+    def _throttled(self, pause: float, queue: bool) -> None:
+        with self._cond:
+            self.throttles += 1
+            self.last_throttle = time.time()
+            if queue:
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._release(queue)
+
+    def _failed(self, queue: bool) -> None:
+        with self._cond:
+            self._release(queue)
+
+    def call(self, function: Callable[[], T], tokens: int, queue: bool = True) -> T:
+        """
+        Run one provider request within the limit, retrying it on rate limits.
+        With `queue=False` (queries) the request still waits out pauses, but is
+        not held back by the ingestion requests in flight, and its latency and
+        tokens are left out of the limit and throughput.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(queue)
+            start = time.monotonic()
+            try:
+                result = function()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    self._failed(queue)
+                    raise
+                pause = retry_after(e)
+                if pause is None:
+                    pause = min(MAX_BACKOFF_SECONDS, 2**attempt) * random.uniform(
+                        1, 1.5
+                    )
+                logger.warning(
+                    "Embeddings provider rate limited, retrying in %.1fs (limit %d)",
+                    pause,
+                    int(self.limit),
+                )
+                self._throttled(max(pause, 0.0), queue)
+                continue
+            self._succeeded(tokens, time.monotonic() - start, queue)
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            busy = self._busy_seconds
+            if self._busy_since is not None:
+                busy += time.monotonic() - self._busy_since
+            return {
+                "limit": int(self.limit),
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "queries_in_flight": self._queries_in_flight,
+                "requests": self.requests,
+                "estimated_tokens": self.tokens,
+                "estimated_tokens_per_second": self.tokens / busy if busy else 0.0,
+                "throttles": self.throttles,
+                "slowdowns": self.slowdowns,
+                "last_throttle": self.last_throttle,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+class DispatchingEmbeddings(Embeddings):
+    """
+    Embeddings sending a text list's batches concurrently through a shared
+    AdaptiveConcurrencyLimiter, instead of one after the other. Batches are
+    packed by token count (see `plan_batches`). With `dimensions`, longer
+    embeddings are truncated to that size.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        limiter: AdaptiveConcurrencyLimiter,
+        batch_size: int,
+        max_tokens: int = 0,
+        token_counter: Optional[TokenCounter] = None,
+        sort_by_length: bool = False,
+        dimensions: int = 0,
+    ):
+        self.embeddings = embeddings
+        self.limiter = limiter
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or TokenCounter()
+        self.sort_by_length = sort_by_length
+        self.dimensions = dimensions
+        self._executor = ThreadPoolExecutor(
+            max_workers=limiter.max_limit, thread_name_prefix="embeddings"
+        )
+
+    def __getattr__(self, name):
+        # Provider settings such as `model` stay readable through the wrapper
+        return getattr(self.__dict__["embeddings"], name)
+
+    def _embed_batch(self, batch: List[str], tokens: int) -> List[List[float]]:
+        embeddings = self.limiter.call(
+            lambda: self.embeddings.embed_documents(batch), tokens
+        )
+        if len(embeddings) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        tokens = [self.token_counter.count(text) for text in texts]
+        batches = plan_batches(
+            tokens, self.batch_size, self.max_tokens, self.sort_by_length
+        )
+        requests = [
+            ([texts[i] for i in batch], sum(tokens[i] for i in batch))
+            for batch in batches
+        ]
+        if len(requests) == 1:
+            results = [self._embed_batch(*requests[0])]
+        else:
+            futures = [
+                self._executor.submit(self._embed_batch, *request)
+                for request in requests
+            ]
+            results = [future.result() for future in futures]
+        embeddings: List[List[float]] = [None] * len(texts)
+        for batch, batch_embeddings in zip(batches, results):
+            for index, embedding in zip(batch, batch_embeddings):
+                embeddings[index] = embedding
+        return truncate_embeddings(embeddings, self.dimensions)
+
+    def embed_query(self, text: str) -> List[float]:
+        embedding = self.limiter.call(
+            lambda: self.embeddings.embed_query(text),
+            self.token_counter.count(text),
+            queue=False,
+        )
+        return truncate_embeddings([embedding], self.dimensions)[0]
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "max_tokens_per_request": self.max_tokens,
+            "dimensions": self.dimensions or None,
+            "tokenizer": (
+                "tiktoken"
+                if self.token_counter._encoding is not None
+                else f"{self.token_counter.chars_per_token} chars/token"
+            ),
+            **self.limiter.stats(),
+        }
@@ -0,0 +1,136 @@
+# app/services/embedding_router.py
+import time
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_request_error(error: Exception) -> bool:
+    """A 4xx other than 429: the texts, not the replica, are at fault."""
+    status = _status_code(error)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+class Endpoint:
+    def __init__(self, name: str, embeddings: Embeddings):
+        self.name = name
+        self.embeddings = embeddings
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+
+class EmbeddingRouter(Embeddings):
+    """
+    Embeddings spread over several replicas of an embedding server.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight. An endpoint whose request fails is ejected for `eject_seconds`,
+    doubled on each consecutive failure up to `max_eject_seconds`, and the
+    request is retried on another endpoint. Request errors (4xx other than
+    429) are raised at once, as no replica would accept the request either.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Tuple[str, Embeddings]],
+        eject_seconds: float = 5.0,
+        max_eject_seconds: float = 60.0,
+    ):
+        if not endpoints:
+            raise ValueError("EmbeddingRouter needs at least one endpoint")
+        self.endpoints = [Endpoint(name, embeddings) for name, embeddings in endpoints]
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def _acquire(self, tried: List[Endpoint]) -> Endpoint:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in tried] or self.endpoints
+            healthy = [e for e in candidates if e.ejected_until <= now]
+            if healthy:
+                # Rotate the starting point so ties don't always go to the first
+                start = self._next % len(healthy)
+                self._next += 1
+                rotated = healthy[start:] + healthy[:start]
+                endpoint = min(rotated, key=lambda e: e.in_flight)
+            else:
+                endpoint = min(candidates, key=lambda e: e.ejected_until)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, error: Optional[Exception]) -> None:
+        with self._lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            eject = min(
+                self.max_eject_seconds,
+                self.eject_seconds * 2 ** (endpoint.consecutive_failures - 1),
+            )
+            endpoint.ejected_until = time.monotonic() + eject
+        logger.warning(
+            "Embedding endpoint %s failed, ejected for %.0fs: %s",
+            endpoint.name,
+            eject,
+            error,
+        )
+
+    def _route(self, function: Callable[[Embeddings], T]) -> T:
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                result = function(endpoint.embeddings)
+            except Exception as e:
+                if is_request_error(e):
+                    self._release(endpoint, None)
+                    raise
+                self._release(endpoint, e)
+                tried.append(endpoint)
+                if len(tried) >= len(self.endpoints):
+                    raise
+                continue
+            self._release(endpoint, None)
+            return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._route(lambda embeddings: embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._route(lambda embeddings: embeddings.embed_query(text))
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "endpoint": endpoint.name,
+                    "in_flight": endpoint.in_flight,
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "ejected_for": max(0.0, endpoint.ejected_until - now),
+                }
+                for endpoint in self.endpoints
+            ]
@@ -0,0 +1,292 @@
+# app/services/hot_file_cache.py
+import asyncio
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.config import (
+    HOT_FILE_CACHE_ENABLED,
+    HOT_FILE_CACHE_MAX_BYTES,
+    HOT_FILE_CACHE_MAX_FILE_BYTES,
+    VECTOR_DB_TYPE,
+    VectorDBType,
+    logger,
+    vector_store,
+)
+from app.services.invalidation import FileGenerations, invalidation_bus
+from app.services.query_cache import filter_file_ids
+from app.services.vector_store.factory import ASYNC_VECTOR_STORES
+
+# Convert a cosine similarity into the score each backend reports, so cached
+# results are indistinguishable from the backend's own.
+SCORE_FROM_COSINE: Dict[VectorDBType, Callable[[np.ndarray], np.ndarray]] = {
+    # PGVector reports cosine distance, whatever distance a collection is searched by
+    VectorDBType.PGVECTOR: lambda similarity: 1.0 - similarity,
+    # Atlas Vector Search normalizes cosine scores to [0, 1]
+    VectorDBType.ATLAS_MONGO: lambda similarity: (1.0 + similarity) / 2.0,
+    VectorDBType.QDRANT: lambda similarity: similarity,
+    VectorDBType.LOCAL: lambda similarity: 1.0 - similarity,
+}
+
+
+class FileVectors:
+    """Contiguous, unit-normalized chunk vectors of one file plus their documents."""
+
+    __slots__ = ("matrix", "text", "offsets", "metadatas", "nbytes")
+
+    def __init__(self, embeddings: list, documents: List[Document]):
+        matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        self.matrix = matrix / norms
+        # One string with offsets is far cheaper than a str object per chunk
+        self.text = "".join(document.page_content for document in documents)
+        self.offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum(
+            [len(document.page_content) for document in documents],
+            out=self.offsets[1:],
+        )
+        self.metadatas = [document.metadata or {} for document in documents]
+        self.nbytes = (
+            self.matrix.nbytes
+            + self.offsets.nbytes
+            + len(self.text.encode("utf-8"))
+            + 256 * len(documents)
+        )
+
+    @staticmethod
+    def min_nbytes(catalog_entry: dict) -> int:
+        """Lower bound of `nbytes` from a file catalog entry, before any vector."""
+        return catalog_entry["byte_size"] + 256 * catalog_entry["chunk_count"]
+
+    def __len__(self) -> int:
+        return len(self.metadatas)
+
+    def document(self, index: int) -> Document:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return Document(
+            page_content=self.text[start:end], metadata=dict(self.metadatas[index])
+        )
+
+
+class HotFileCache:
+    """
+    Byte-bounded LRU of per-file_id embedding matrices, serving exact top-k
+    for file_id-only filters with one matrix-vector product per file.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_file_bytes: int,
+        score_from_cosine: Callable[[np.ndarray], np.ndarray],
+    ):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.score_from_cosine = score_from_cosine
+        self._files: "OrderedDict[str, FileVectors]" = OrderedDict()
+        self._generations = FileGenerations()
+        self._suspended = False
+        self._loading = set()
+        # Files over max_file_bytes, not loaded again until they change
+        self._rejected = set()
+        self._tasks = set()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def generation(self) -> int:
+        return self._generations.current()
+
+    @staticmethod
+    def cacheable_file_ids(filter: Optional[dict]) -> List[str]:
+        """file_ids of a filter the cache can answer, i.e. one on file_id alone."""
+        if not filter or set(filter) != {"file_id"}:
+            return []
+        return filter_file_ids(filter)
+
+    def search(
+        self, filter: Optional[dict], embedding, k: int
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """Exact top-k when every filtered file is hot, otherwise None."""
+        file_ids = self.cacheable_file_ids(filter)
+        if not file_ids:
+            return None
+        with self._lock:
+            if self._suspended:
+                self.misses += 1
+                return None
+            files = [self._files.get(file_id) for file_id in file_ids]
+            if any(entry is None for entry in files):
+                self.misses += 1
+                return None
+            for file_id in file_ids:
+                self._files.move_to_end(file_id)
+            self.hits += 1
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm > 0.0:
+            query = query / norm
+        candidates = []
+        for entry in files:
+            if len(entry) == 0 or entry.matrix.shape[1] != len(query):
+                continue
+            similarities = entry.matrix @ query
+            if len(similarities) > k:
+                top = np.argpartition(-similarities, k - 1)[:k]
+            else:
+                top = np.arange(len(similarities))
+            candidates.extend((float(similarities[i]), entry, int(i)) for i in top)
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [
+            (entry.document(index), float(self.score_from_cosine(similarity)))
+            for similarity, entry, index in candidates[:k]
+        ]
+
+    def put(
+        self,
+        file_id: str,
+        embeddings: list,
+        documents: List[Document],
+        generation: Optional[int] = None,
+    ) -> bool:
+        if not documents:
+            return False
+        entry = FileVectors(embeddings, documents)
+        with self._lock:
+            if self._suspended:
+                return False
+            # A file changed since loading may fit now, so it is not rejected
+            if generation is not None and self._generations.is_stale(
+                [file_id], generation
+            ):
+                return False
+            if entry.nbytes > self.max_file_bytes:
+                self._reject(file_id)
+                return False
+            self._remove(file_id)
+            self._files[file_id] = entry
+            self._size += entry.nbytes
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._files)))
+                self.evictions += 1
+        return True
+
+    def schedule_load(self, file_ids: Iterable[str], executor=None) -> None:
+        """Load cold files in the background so the caller is never delayed."""
+        for file_id in file_ids:
+            with self._lock:
+                if (
+                    self._suspended
+                    or file_id in self._files
+                    or file_id in self._loading
+                    or file_id in self._rejected
+                ):
+                    continue
+                self._loading.add(file_id)
+            task = asyncio.get_running_loop().create_task(self._load(file_id, executor))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _call(method: str, argument, executor=None):
+        if isinstance(vector_store, ASYNC_VECTOR_STORES):
+            return await getattr(vector_store, method)(argument, executor=executor)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, getattr(vector_store, method), argument
+        )
+
+    async def _too_large(self, file_id: str, executor=None) -> bool:
+        # The catalog rules out files that cannot fit before their vectors are fetched
+        try:
+            entries = await self._call("get_file_catalog", [file_id], executor)
+            return any(
+                FileVectors.min_nbytes(entry) > self.max_file_bytes for entry in entries
+            )
+        except Exception as e:
+            logger.debug(f"No catalog entry to size file {file_id}: {e}")
+            return False
+
+    async def _load(self, file_id: str, executor=None) -> None:
+        generation = self.generation()
+        try:
+            if await self._too_large(file_id, executor):
+                with self._lock:
+                    if not self._suspended and not self._generations.is_stale(
+                        [file_id], generation
+                    ):
+                        self._reject(file_id)
+                return
+            embeddings, documents = await self._call(
+                "get_file_embeddings", file_id, executor
+            )
+            self.put(file_id, embeddings, documents, generation)
+        except Exception as e:
+            logger.warning(f"Failed to load file {file_id} into hot file cache: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(file_id)
+
+    def invalidate_files(self, file_ids: Iterable[str]) -> None:
+        with self._lock:
+            file_ids = list(file_ids)
+            self._generations.invalidate(file_ids)
+            for file_id in file_ids:
+                self._remove(file_id)
+                self._rejected.discard(file_id)
+
+    def suspend(self, suspended: bool) -> None:
+        with self._lock:
+            self._suspended = suspended
+            self._generations.reset()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations.reset()
+            self._files.clear()
+            self._rejected.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "loading": len(self._loading),
+            }
+
+    def _reject(self, file_id: str) -> None:
+        self._rejected.add(file_id)
+        self.rejected += 1
+
+    def _remove(self, file_id: str) -> None:
+        entry = self._files.pop(file_id, None)
+        if entry is not None:
+            self._size -= entry.nbytes
+
+
+hot_file_cache = (
+    HotFileCache(
+        HOT_FILE_CACHE_MAX_BYTES,
+        HOT_FILE_CACHE_MAX_FILE_BYTES,
+        SCORE_FROM_COSINE[VECTOR_DB_TYPE],
+    )
+    if HOT_FILE_CACHE_ENABLED
+    else None
+)
+if hot_file_cache is not None:
+    invalidation_bus.subscribe(hot_file_cache)
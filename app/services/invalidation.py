@@ -0,0 +1,222 @@
+# app/services/invalidation.py
+import json
+import uuid
+import random
+import asyncio
+import asyncpg
+from typing import Dict, Iterable, List
+
+from app.config import (
+    DSN,
+    VECTOR_DB_TYPE,
+    VectorDBType,
+    CACHE_INVALIDATION_CHANNEL,
+    logger,
+)
+from app.services.database import PSQLDatabase
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_PAYLOAD = 7000
+# Invalidation timestamps kept before falling back to a global floor
+MAX_TRACKED_INVALIDATIONS = 10000
+# Longest wait between attempts to bring a lost listener back
+MAX_RECONNECT_DELAY = 30.0
+
+
+class FileGenerations:
+    """
+    Remembers when each file_id was last invalidated, so a cache can refuse
+    values computed before an invalidation that landed while they were in flight.
+
+    Not thread-safe; callers guard it with their own lock.
+    """
+
+    def __init__(self):
+        self._invalidated_at: Dict[str, int] = {}
+        self._clock = 0
+        self._floor = 0
+
+    def current(self) -> int:
+        """Token to take before computing a value and hand back to `is_stale`."""
+        return self._clock
+
+    def invalidate(self, file_ids: Iterable[str]) -> None:
+        self._clock += 1
+        if len(self._invalidated_at) >= MAX_TRACKED_INVALIDATIONS:
+            self._invalidated_at.clear()
+            self._floor = self._clock
+        for file_id in file_ids:
+            self._invalidated_at[file_id] = self._clock
+
+    def reset(self) -> None:
+        self._clock += 1
+        self._floor = self._clock
+        self._invalidated_at.clear()
+
+    def is_stale(self, file_ids: Iterable[str], generation: int) -> bool:
+        if generation < self._floor:
+            return True
+        return any(
+            self._invalidated_at.get(file_id, -1) > generation for file_id in file_ids
+        )
+
+
+class FileInvalidationBus:
+    """
+    Fans out per-file_id invalidations to the in-process caches.
+
+    Subscribers implement ``invalidate_files(file_ids)``, ``clear()`` and
+    ``suspend(suspended)``; a suspended subscriber neither serves nor stores
+    values. This base class only reaches subscribers in the current process.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, subscriber) -> None:
+        self._subscribers.append(subscriber)
+
+    def invalidate_local(self, file_ids: List[str]) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber.invalidate_files(file_ids)
+            except Exception as e:
+                logger.error(f"Cache invalidation failed for {subscriber}: {e}")
+
+    def clear_local(self) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber.clear()
+            except Exception as e:
+                logger.error(f"Cache clear failed for {subscriber}: {e}")
+
+    def suspend_local(self, suspended: bool) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber.suspend(suspended)
+            except Exception as e:
+                logger.error(f"Cache suspend failed for {subscriber}: {e}")
+
+    async def publish(self, file_ids: Iterable[str]) -> None:
+        """Invalidate `file_ids` in this process and in every peer worker."""
+        file_ids = [file_id for file_id in dict.fromkeys(file_ids) if file_id]
+        if not file_ids:
+            return
+        self.invalidate_local(file_ids)
+        await self._notify_peers(file_ids)
+
+    async def _notify_peers(self, file_ids: List[str]) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class PgNotifyInvalidationBus(FileInvalidationBus):
+    """Shares invalidations between workers through PostgreSQL LISTEN/NOTIFY."""
+
+    def __init__(self, channel: str):
+        super().__init__()
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._conn = None
+        self._reconnecting = None
+
+    async def start(self) -> None:
+        # Nothing to keep consistent when no cache is enabled
+        if not self._subscribers or self._conn is not None:
+            return
+        self._conn = await asyncpg.connect(dsn=DSN)
+        self._conn.add_termination_listener(self._on_termination)
+        await self._conn.add_listener(self.channel, self._on_notify)
+        logger.info(f"Listening for cache invalidations on '{self.channel}'")
+
+    async def stop(self) -> None:
+        reconnecting, self._reconnecting = self._reconnecting, None
+        if reconnecting is not None:
+            reconnecting.cancel()
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            await conn.remove_listener(self.channel, self._on_notify)
+            await conn.close()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache invalidation: {payload!r}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.invalidate_local(message.get("file_ids", []))
+
+    def _on_termination(self, connection) -> None:
+        if self._conn is not connection:
+            return
+        # Notifications sent while disconnected are lost, so nothing cached can
+        # be trusted until the listener is back
+        logger.warning("Cache invalidation listener disconnected; bypassing caches")
+        self._conn = None
+        self.suspend_local(True)
+        if self._reconnecting is None:
+            self._reconnecting = asyncio.get_running_loop().create_task(
+                self._reconnect()
+            )
+
+    async def _reconnect(self) -> None:
+        attempt = 0
+        try:
+            while self._conn is None:
+                delay = min(MAX_RECONNECT_DELAY, 2**attempt) * random.uniform(0.5, 1)
+                await asyncio.sleep(delay)
+                attempt += 1
+                try:
+                    await self.start()
+                except Exception as e:
+                    logger.error(
+                        f"Failed to reconnect cache invalidation listener "
+                        f"(attempt {attempt}): {e}"
+                    )
+            logger.info("Cache invalidation listener reconnected; resuming caches")
+            self.suspend_local(False)
+        finally:
+            if self._reconnecting is asyncio.current_task():
+                self._reconnecting = None
+
+    def _payload(self, file_ids: List[str]) -> str:
+        return json.dumps({"origin": self.origin, "file_ids": file_ids})
+
+    def _payloads(self, file_ids: List[str]) -> List[str]:
+        payloads, batch, size = [], [], 0
+        for file_id in file_ids:
+            item_size = len(json.dumps(file_id)) + 2
+            if batch and size + item_size > MAX_NOTIFY_PAYLOAD:
+                payloads.append(self._payload(batch))
+                batch, size = [], 0
+            batch.append(file_id)
+            size += item_size
+        if batch:
+            payloads.append(self._payload(batch))
+        return payloads
+
+    async def _notify_peers(self, file_ids: List[str]) -> None:
+        # Publish through the shared pool, whether or not this worker is
+        # listening: peers keep their caches on their own connections
+        try:
+            pool = await PSQLDatabase.get_pool()
+            async with pool.acquire() as conn:
+                for payload in self._payloads(file_ids):
+                    await conn.execute(
+                        "SELECT pg_notify($1, $2)", self.channel, payload
+                    )
+        except Exception as e:
+            logger.error(f"Failed to publish cache invalidation for {file_ids}: {e}")
+
+
+if VECTOR_DB_TYPE == VectorDBType.PGVECTOR:
+    invalidation_bus = PgNotifyInvalidationBus(CACHE_INVALIDATION_CHANNEL)
+else:
+    invalidation_bus = FileInvalidationBus()
@@ -0,0 +1,340 @@
+"""
+ONNX Runtime inference for local sentence-transformers models.
+
+The `huggingface` provider runs sentence-transformers on PyTorch by default.
+With `HF_EMBEDDINGS_BACKEND=onnx` (or `onnx-int8`) the model is exported once
+to ONNX, optionally with int8 dynamically quantized weights, and run with
+onnxruntime on CPU. Export ahead of time (e.g. while building an image) with:
+
+    python -m app.services.onnx_embeddings export \
+        --model sentence-transformers/all-MiniLM-L6-v2 --int8
+
+Compare chunks/sec of both backends on a small randomly initialized model
+generated locally, without any download, with:
+
+    python -m app.services.onnx_embeddings benchmark --chunks 2000
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from typing import List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def export_dir(root: str, model_name: str) -> str:
+    return os.path.join(root, model_name.strip("/").replace("/", "--"))
+
+
+def export_model(model_name: str, output_dir: str, int8: bool = False) -> str:
+    """
+    Export a sentence-transformers model's transformer to ONNX in `output_dir`,
+    with its tokenizer and pooling settings, unless already done. Returns the
+    path of the (int8 quantized, with `int8`) model file.
+    """
+    path = os.path.join(output_dir, INT8_MODEL_FILE if int8 else MODEL_FILE)
+    if os.path.exists(path):
+        return path
+    fp32_path = os.path.join(output_dir, MODEL_FILE)
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device="cpu", trust_remote_code=True)
+        pooling = next((m for m in model if type(m).__name__ == "Pooling"), None)
+        tokenizer = model.tokenizer
+        sample = tokenizer(["warm up"], return_tensors="pt")
+        input_names = [
+            name
+            for name in ("input_ids", "attention_mask", "token_type_ids")
+            if name in sample
+        ]
+
+        class LastHiddenState(torch.nn.Module):
+            def __init__(self, transformer):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, *inputs):
+                return self.transformer(
+                    **dict(zip(input_names, inputs))
+                ).last_hidden_state
+
+        os.makedirs(output_dir, exist_ok=True)
+        axes = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                LastHiddenState(model[0].auto_model.eval()),
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    name: axes for name in input_names + ["last_hidden_state"]
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+        tokenizer.save_pretrained(output_dir)
+        with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+            json.dump(
+                {
+                    "pooling": pooling.get_pooling_mode_str() if pooling else "mean",
+                    "max_length": model.max_seq_length,
+                },
+                f,
+            )
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+    return path
+
+
+def pool(hidden: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """Sentence vectors from token states, as sentence-transformers' Pooling."""
+    if mode == "cls":
+        return hidden[:, 0]
+    if mode == "lasttoken":
+        return hidden[np.arange(len(hidden)), attention_mask.sum(axis=1) - 1]
+    mask = attention_mask[..., None].astype(hidden.dtype)
+    if mode == "max":
+        return np.where(mask > 0, hidden, -np.inf).max(axis=1)
+    if mode == "mean":
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    raise ValueError(f"Unsupported pooling mode: {mode}")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    A sentence-transformers model exported to ONNX, run with onnxruntime.
+
+    Texts are tokenized without padding, sorted by token count and cut into
+    batches of `batch_size`, so each batch is padded only to its own longest
+    text. Runs are serialized: each already uses the session's intra-op
+    threads, whatever the number of API requests embedding at once.
+    """
+
+    def __init__(
+        self,
+        session,
+        tokenizer,
+        pooling: str = "mean",
+        max_length: int = 512,
+        batch_size: int = 32,
+        normalize: bool = True,
+    ):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.pooling = pooling
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.input_names = [i.name for i in session.get_inputs()]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls, model_path: str, batch_size: int = 32, intra_op_threads: int = 0
+    ) -> "OnnxEmbeddings":
+        """Load an exported model; 0 threads is one per physical core."""
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        directory = os.path.dirname(model_path)
+        with open(os.path.join(directory, CONFIG_FILE)) as f:
+            config = json.load(f)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        return cls(
+            session,
+            AutoTokenizer.from_pretrained(directory),
+            pooling=config["pooling"],
+            max_length=config["max_length"],
+            batch_size=batch_size,
+        )
+
+    def _embed_batch(self, token_ids: List[List[int]]) -> np.ndarray:
+        length = max(len(ids) for ids in token_ids)
+        input_ids = np.full(
+            (len(token_ids), length), self.tokenizer.pad_token_id or 0, dtype=np.int64
+        )
+        attention_mask = np.zeros_like(input_ids)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, : len(ids)] = ids
+            attention_mask[row, : len(ids)] = 1
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        }
+        with self._lock:
+            hidden = self.session.run(
+                None, {name: feeds[name] for name in self.input_names}
+            )[0]
+        vectors = pool(hidden, attention_mask, self.pooling)
+        if self.normalize:
+            vectors = vectors / np.clip(
+                np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None
+            )
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        token_ids = self.tokenizer(
+            list(texts), truncation=True, max_length=self.max_length
+        )["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(token_ids[i]))
+        embeddings: List[List[float]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            vectors = self._embed_batch([token_ids[i] for i in batch])
+            for index, vector in zip(batch, vectors):
+                embeddings[index] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_test_model(directory: str, hidden_size: int = 256, layers: int = 4) -> str:
+    """A small randomly initialized BERT sentence-transformers model."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+    from sentence_transformers import SentenceTransformer, models as st_models
+
+    special = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab = {
+        token: i for i, token in enumerate(special + [f"w{i}" for i in range(5000)])
+    }
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+    )
+    transformer_dir = os.path.join(directory, "transformer")
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+        model_max_length=512,
+    ).save_pretrained(transformer_dir)
+    BertModel(
+        BertConfig(
+            vocab_size=len(vocab),
+            hidden_size=hidden_size,
+            num_hidden_layers=layers,
+            num_attention_heads=hidden_size // 64,
+            intermediate_size=hidden_size * 4,
+        )
+    ).save_pretrained(transformer_dir)
+    transformer = st_models.Transformer(transformer_dir, max_seq_length=512)
+    SentenceTransformer(
+        modules=[
+            transformer,
+            st_models.Pooling(transformer.get_word_embedding_dimension(), "mean"),
+            st_models.Normalize(),
+        ]
+    ).save(directory)
+    return directory
+
+
+def benchmark(
+    chunks: int, batch_size: int = 32, threads: int = 0, seed: int = 0
+) -> dict:
+    """
+    Chunks/sec of the current provider (sentence-transformers defaults) and of
+    the ONNX backends on a generated model, and the lowest cosine similarity
+    of their vectors to the current provider's.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    rng = random.Random(seed)
+    texts = [
+        " ".join(f"w{rng.randrange(5000)}" for _ in range(rng.randint(10, 350)))
+        for _ in range(chunks)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        model_dir = make_test_model(os.path.join(directory, "model"))
+        backends = {
+            "torch": lambda: HuggingFaceEmbeddings(
+                model_name=model_dir, encode_kwargs={"normalize_embeddings": True}
+            ),
+        }
+        for backend in BACKENDS[1:]:
+            backends[backend] = lambda backend=backend: OnnxEmbeddings.load(
+                export_model(
+                    model_dir,
+                    os.path.join(directory, "onnx"),
+                    int8=backend == "onnx-int8",
+                ),
+                batch_size=batch_size,
+                intra_op_threads=threads,
+            )
+
+        report, reference = {}, None
+        for backend, build in backends.items():
+            embeddings = build()
+            embeddings.embed_query("w1 w2 w3")
+            start = time.perf_counter()
+            vectors = np.asarray(embeddings.embed_documents(texts))
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = vectors
+            report[backend] = {
+                "chunks_per_second": chunks / elapsed,
+                "min_cosine": float((vectors * reference).sum(axis=1).min()),
+            }
+        return report
+
+
+def main(argv: Sequence[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export a model to ONNX")
+    export_parser.add_argument("--model", required=True)
+    export_parser.add_argument("--output", default="./onnx_models")
+    export_parser.add_argument("--int8", action="store_true")
+    benchmark_parser = commands.add_parser("benchmark", help="compare chunks/sec")
+    benchmark_parser.add_argument("--chunks", type=int, default=2000)
+    benchmark_parser.add_argument("--batch-size", type=int, default=32)
+    benchmark_parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(export_model(args.model, export_dir(args.output, args.model), args.int8))
+        return
+    report = benchmark(args.chunks, args.batch_size, args.threads)
+    baseline = report["torch"]["chunks_per_second"]
+    print(f"{'backend':<10}{'chunks/s':>10}{'speedup':>9}{'min cosine':>12}")
+    for backend, row in report.items():
+        print(
+            f"{backend:<10}{row['chunks_per_second']:>10.1f}"
+            f"{row['chunks_per_second'] / baseline:>8.2f}x{row['min_cosine']:>12.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# app/services/query_batch.py
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.runnables.config import run_in_executor
+
+
+class QueryEmbeddingBatch:
+    """
+    Embeds the queries of concurrently started searches together.
+
+    Searches started by one `asyncio.gather` each run up to their first await
+    in the same event loop iteration, so every one of them that needs an
+    embedding has asked for it before the flush scheduled by the first request
+    runs. Those queries are then embedded with a single `embed_many` call, or
+    with concurrent `embed_one` calls when `embed_many` is None.
+    """
+
+    def __init__(
+        self,
+        embed_one: Callable[[str], List[float]],
+        embed_many: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        executor=None,
+    ):
+        self.embed_one = embed_one
+        self.embed_many = embed_many
+        self.executor = executor
+        self.provider_calls = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def embed(self, query: str) -> "asyncio.Future[List[float]]":
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._flush)
+        future = self._pending.get(query)
+        if future is None:
+            future = self._pending[query] = loop.create_future()
+        return future
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        asyncio.ensure_future(self._embed(pending))
+
+    async def _embed(self, pending: Dict[str, asyncio.Future]) -> None:
+        queries = list(pending)
+        try:
+            if self.embed_many is not None and len(queries) > 1:
+                self.provider_calls += 1
+                embeddings = await run_in_executor(
+                    self.executor, self.embed_many, queries
+                )
+                if len(embeddings) != len(queries):
+                    raise ValueError(
+                        f"Expected {len(queries)} embeddings, got {len(embeddings)}"
+                    )
+            else:
+                self.provider_calls += len(queries)
+                embeddings = await asyncio.gather(
+                    *(
+                        run_in_executor(self.executor, self.embed_one, query)
+                        for query in queries
+                    )
+                )
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, embedding in zip(pending.values(), embeddings):
+            if not future.done():
+                future.set_result(embedding)
@@ -0,0 +1,170 @@
+# app/services/query_cache.py
+import sys
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.config import QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_BYTES
+from app.services.invalidation import FileGenerations, invalidation_bus
+
+# Rough per-entry bookkeeping cost (key, tuple, list and dict slots)
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def filter_file_ids(filter: Optional[dict]) -> List[str]:
+    """Return the file_ids a metadata filter is restricted to."""
+    if not filter:
+        return []
+    value = filter.get("file_id")
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        if "$eq" in value:
+            return [value["$eq"]]
+        return list(value.get("$in", []))
+    return []
+
+
+def estimate_result_size(documents: List[Any]) -> int:
+    """Approximate the memory held by a list of ``(Document, score)`` results."""
+    size = ENTRY_OVERHEAD_BYTES
+    for item in documents:
+        document = item[0] if isinstance(item, tuple) else item
+        size += sys.getsizeof(document.page_content) + ENTRY_OVERHEAD_BYTES
+        for key, value in (document.metadata or {}).items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class QueryResultCache:
+    """
+    Memory-bounded LRU cache of similarity search results.
+
+    Entries are indexed by the file_ids their filter covers so that a change to
+    one file only evicts the results that could have included it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_file: Dict[str, Set[str]] = {}
+        self._generations = FileGenerations()
+        self._suspended = False
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(
+        embedding_key: str, filter: Optional[dict], k: int, **search_params
+    ) -> str:
+        return json.dumps(
+            [embedding_key, filter, k, search_params], sort_keys=True, default=str
+        )
+
+    def generation(self) -> int:
+        """Token to take before searching and hand back to :meth:`put`."""
+        return self._generations.current()
+
+    def get(self, key: str) -> Optional[list]:
+        with self._lock:
+            entry = None if self._suspended else self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(
+        self,
+        key: str,
+        file_ids: Iterable[str],
+        value: list,
+        generation: Optional[int] = None,
+    ) -> bool:
+        """
+        Cache `value` unless one of `file_ids` was invalidated after `generation`.
+
+        Unfiltered results are never cached as they cannot be invalidated precisely.
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        if not file_ids:
+            return False
+        size = estimate_result_size(value)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if self._suspended:
+                return False
+            if generation is not None and self._generations.is_stale(
+                file_ids, generation
+            ):
+                return False
+            self._remove(key)
+            self._entries[key] = (value, file_ids, size)
+            self._size += size
+            for file_id in file_ids:
+                self._by_file.setdefault(file_id, set()).add(key)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate_files(self, file_ids: Iterable[str]) -> None:
+        with self._lock:
+            file_ids = list(file_ids)
+            self._generations.invalidate(file_ids)
+            for file_id in file_ids:
+                for key in list(self._by_file.get(file_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def suspend(self, suspended: bool) -> None:
+        """Bypass the cache, e.g. while invalidations from peers may be lost."""
+        with self._lock:
+            self._suspended = suspended
+            self._generations.reset()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations.reset()
+            self._entries.clear()
+            self._by_file.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, file_ids, size = entry
+        self._size -= size
+        for file_id in file_ids:
+            keys = self._by_file.get(file_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_file[file_id]
+
+
+query_cache = QueryResultCache(QUERY_CACHE_MAX_BYTES) if QUERY_CACHE_ENABLED else None
+if query_cache is not None:
+    invalidation_bus.subscribe(query_cache)
@@ -0,0 +1,134 @@
+# app/services/query_hedging.py
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+import numpy as np
+
+from app.config import (
+    QUERY_EMBEDDING_HEDGING_ENABLED,
+    QUERY_EMBEDDING_HEDGE_PERCENTILE,
+    QUERY_EMBEDDING_HEDGE_DELAY_MS,
+    QUERY_EMBEDDING_HEDGE_BUDGET,
+)
+
+T = TypeVar("T")
+
+
+class QueryHedger:
+    """
+    Hedged provider requests for query embeddings.
+
+    When a request has not returned after the `percentile` of recent request
+    latencies (`initial_delay` until `min_samples` are known), an identical
+    second request is sent and whichever succeeds first is used. Through an
+    EmbeddingRouter the second request goes to another replica, as the first
+    one is still in flight there.
+
+    Hedges are paid from a credit balance that grows by `budget` per request,
+    capping them at that fraction of requests. A hedge that has not started
+    yet is cancelled once the other request succeeds; one already waiting on
+    the provider cannot be interrupted, so its result is dropped.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        initial_delay: float = 0.2,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        window: int = 512,
+        max_workers: int = 16,
+    ):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._credits = 1.0
+        self._max_credits = max(1.0, budget * window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+
+    def delay(self) -> float:
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            return float(np.percentile(self._latencies, self.percentile))
+
+    def _timed(self, function: Callable[[], T]) -> T:
+        start = time.monotonic()
+        result = function()
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _spend_credit(self) -> bool:
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                self.hedges += 1
+                return True
+            self.over_budget += 1
+            return False
+
+    def call(self, function: Callable[[], T]) -> T:
+        with self._lock:
+            self.requests += 1
+            self._credits = min(self._max_credits, self._credits + self.budget)
+        primary = self._executor.submit(self._timed, function)
+        done, _ = wait([primary], timeout=self.delay())
+        if done or not self._spend_credit():
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, function)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+        raise error
+
+    def stats(self) -> dict:
+        delay = self.delay()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "over_budget": self.over_budget,
+                "hedge_ratio": self.hedges / self.requests if self.requests else 0.0,
+                "delay_ms": delay * 1000,
+                "percentile": self.percentile,
+                "budget": self.budget,
+            }
+
+
+query_hedger = (
+    QueryHedger(
+        percentile=QUERY_EMBEDDING_HEDGE_PERCENTILE,
+        initial_delay=QUERY_EMBEDDING_HEDGE_DELAY_MS / 1000,
+        budget=QUERY_EMBEDDING_HEDGE_BUDGET,
+    )
+    if QUERY_EMBEDDING_HEDGING_ENABLED
+    else None
+)
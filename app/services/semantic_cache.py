@@ -0,0 +1,223 @@
+# app/services/semantic_cache.py
+import json
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_FILTERS,
+)
+from app.services.invalidation import FileGenerations, invalidation_bus
+
+# Lower edge of the best-similarity histogram used for threshold tuning
+HISTOGRAM_FLOOR = 0.80
+HISTOGRAM_BINS = 20
+
+
+class _FilterBucket:
+    """Unit-normalized query embeddings and their results for one filter."""
+
+    INITIAL_CAPACITY = 8
+
+    def __init__(self, dim: int, max_entries: int, file_ids: List[str]):
+        capacity = min(self.INITIAL_CAPACITY, max_entries)
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.results: List[Optional[list]] = [None] * capacity
+        self.max_entries = max_entries
+        self.count = 0
+        self.file_ids = file_ids
+
+    def best_match(self, query: np.ndarray):
+        if self.count == 0:
+            return -1, -1.0
+        similarities = self.matrix[: self.count] @ query
+        index = int(np.argmax(similarities))
+        return index, float(similarities[index])
+
+    def insert(self, query: np.ndarray, results: list, tick: int) -> None:
+        capacity = len(self.results)
+        if self.count == capacity and capacity < self.max_entries:
+            # Grow geometrically so rarely used filters stay small
+            capacity = min(capacity * 2, self.max_entries)
+            matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            matrix[: self.count] = self.matrix
+            last_used = np.zeros(capacity, dtype=np.int64)
+            last_used[: self.count] = self.last_used
+            self.matrix, self.last_used = matrix, last_used
+            self.results.extend([None] * (capacity - self.count))
+        if self.count < capacity:
+            index = self.count
+            self.count += 1
+        else:
+            index = int(np.argmin(self.last_used))
+        self.matrix[index] = query
+        self.results[index] = results
+        self.last_used[index] = tick
+
+
+class SemanticQueryCache:
+    """
+    Reuses search results of previously answered queries with a near-identical
+    embedding (cosine similarity at or above `threshold`) for the same filter.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, max_filters: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_filters = max_filters
+        self._buckets: "OrderedDict[str, _FilterBucket]" = OrderedDict()
+        self._by_file: Dict[str, Set[str]] = {}
+        self._generations = FileGenerations()
+        self._suspended = False
+        self._tick = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+
+    @staticmethod
+    def make_key(filter: Optional[dict], k: int, **search_params) -> str:
+        return json.dumps([filter, k, search_params], sort_keys=True, default=str)
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def generation(self) -> int:
+        return self._generations.current()
+
+    def get(self, key: str, embedding) -> Optional[list]:
+        query = self._normalize(embedding)
+        with self._lock:
+            bucket = None if self._suspended else self._buckets.get(key)
+            if query is None or bucket is None or bucket.matrix.shape[1] != len(query):
+                self.misses += 1
+                return None
+            index, similarity = bucket.best_match(query)
+            self._record_similarity(similarity)
+            if index < 0 or similarity < self.threshold:
+                self.misses += 1
+                return None
+            self._tick += 1
+            bucket.last_used[index] = self._tick
+            self._buckets.move_to_end(key)
+            self.hits += 1
+            return bucket.results[index]
+
+    def put(
+        self,
+        key: str,
+        file_ids: Iterable[str],
+        embedding,
+        results: list,
+        generation: Optional[int] = None,
+    ) -> bool:
+        file_ids = list(dict.fromkeys(file_ids))
+        query = self._normalize(embedding)
+        if not file_ids or query is None:
+            return False
+        with self._lock:
+            if self._suspended:
+                return False
+            if generation is not None and self._generations.is_stale(
+                file_ids, generation
+            ):
+                return False
+            bucket = self._buckets.get(key)
+            if bucket is None or bucket.matrix.shape[1] != len(query):
+                self._remove(key)
+                bucket = _FilterBucket(len(query), self.max_entries, file_ids)
+                self._buckets[key] = bucket
+                for file_id in file_ids:
+                    self._by_file.setdefault(file_id, set()).add(key)
+                while len(self._buckets) > self.max_filters:
+                    self._remove(next(iter(self._buckets)))
+            self._buckets.move_to_end(key)
+            self._tick += 1
+            bucket.insert(query, results, self._tick)
+        return True
+
+    def invalidate_files(self, file_ids: Iterable[str]) -> None:
+        with self._lock:
+            file_ids = list(file_ids)
+            self._generations.invalidate(file_ids)
+            for file_id in file_ids:
+                for key in list(self._by_file.get(file_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def suspend(self, suspended: bool) -> None:
+        with self._lock:
+            self._suspended = suspended
+            self._generations.reset()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations.reset()
+            self._buckets.clear()
+            self._by_file.clear()
+
+    def stats(self) -> dict:
+        """Hit ratio plus, for threshold tuning, how many lookups fell in each
+        best-similarity band and how many hits each candidate threshold yields."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            edges = np.linspace(HISTOGRAM_FLOOR, 1.0, HISTOGRAM_BINS + 1)
+            at_or_above = np.cumsum(self._histogram[::-1])[::-1]
+            return {
+                "filters": len(self._buckets),
+                "entries": sum(bucket.count for bucket in self._buckets.values()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "similarity_histogram": {
+                    f"{edges[i]:.2f}": int(self._histogram[i])
+                    for i in range(HISTOGRAM_BINS)
+                },
+                "hits_at_threshold": {
+                    f"{edges[i]:.2f}": int(at_or_above[i])
+                    for i in range(HISTOGRAM_BINS)
+                },
+            }
+
+    def _record_similarity(self, similarity: float) -> None:
+        if similarity < HISTOGRAM_FLOOR:
+            return
+        width = (1.0 - HISTOGRAM_FLOOR) / HISTOGRAM_BINS
+        index = min(int((similarity - HISTOGRAM_FLOOR) / width), HISTOGRAM_BINS - 1)
+        self._histogram[index] += 1
+
+    def _remove(self, key: str) -> None:
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            return
+        for file_id in bucket.file_ids:
+            keys = self._by_file.get(file_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_file[file_id]
+
+
+semantic_cache = (
+    SemanticQueryCache(
+        SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_MAX_FILTERS
+    )
+    if SEMANTIC_CACHE_ENABLED
+    else None
+)
+if semantic_cache is not None:
+    invalidation_bus.subscribe(semantic_cache)
@@ -22,18 +22,60 @@ class AsyncPgVector(ExtendedPgVector):
                 pass
         return self._thread_pool
     
-    async def get_all_ids(self, executor=None) -> list[str]:
+    async def get_all_ids(
+        self, limit: Optional[int] = None, after: Optional[str] = None, executor=None
+    ) -> list[str]:
         executor = executor or self._get_thread_pool()
-        return await run_in_executor(executor, super().get_all_ids)
+        return await run_in_executor(executor, super().get_all_ids, limit, after)
+
+    async def get_file_catalog(self, ids: list[str], executor=None) -> list[dict]:
+        executor = executor or self._get_thread_pool()
+        return await run_in_executor(executor, super().get_file_catalog, ids)
     
     async def get_filtered_ids(self, ids: list[str], executor=None) -> list[str]:
         executor = executor or self._get_thread_pool()
         return await run_in_executor(executor, super().get_filtered_ids, ids)
 
+    async def fetch_documents_by_ids(
+        self, ids: list[str], executor=None
+    ) -> Tuple[List[Document], List[str]]:
+        executor = executor or self._get_thread_pool()
+        return await run_in_executor(executor, super().fetch_documents_by_ids, ids)
+
     async def get_documents_by_ids(self, ids: list[str], executor=None) -> list[Document]:
         executor = executor or self._get_thread_pool()
         return await run_in_executor(executor, super().get_documents_by_ids, ids)
 
+    async def get_file_chunks(
+        self,
+        file_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        executor=None,
+    ) -> List[Document]:
+        executor = executor or self._get_thread_pool()
+        return await run_in_executor(
+            executor,
+            super().get_file_chunks,
+            file_id,
+            start,
+            end,
+            page_start,
+            page_end,
+            limit,
+            offset,
+        )
+
+    async def get_file_embeddings(
+        self, file_id: str, executor=None
+    ) -> Tuple[list, List[Document]]:
+        executor = executor or self._get_thread_pool()
+        return await run_in_executor(executor, super().get_file_embeddings, file_id)
+
     async def delete(
         self, ids: Optional[list[str]] = None, collection_only: bool = False, executor=None
     ) -> None:
@@ -72,4 +114,18 @@ class AsyncPgVector(ExtendedPgVector):
             documents, 
             ids=ids,
             **kwargs
-        )
\ No newline at end of file
+        )
+
+    async def aadd_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        executor=None,
+    ) -> List[str]:
+        """Async version of add_embeddings"""
+        executor = executor or self._get_thread_pool()
+        return await run_in_executor(
+            executor, super().add_embeddings, texts, embeddings, metadatas, ids
+        )
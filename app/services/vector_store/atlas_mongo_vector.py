@@ -3,18 +3,109 @@ from typing import Any, List, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_mongodb import MongoDBAtlasVectorSearch
+from pymongo.errors import DuplicateKeyError
+
+from .file_catalog import (
+    CATALOG_COMPLETE_KEY,
+    CHUNK_INDEX_KEY,
+    merge_entry,
+    page_ids,
+    summarize_chunks,
+)
+
+# Catalog document recording whether the catalog covers every stored file
+CATALOG_STATE_ID = "__file_catalog_state__"
 
 class AtlasMongoVector(MongoDBAtlasVectorSearch):
+    _catalog_complete = False
+
     @property
     def embedding_function(self) -> Embeddings:
         return self.embeddings
 
+    @property
+    def file_catalog(self):
+        # One document per file_id, next to the chunk collection
+        return self._collection.database[f"{self._collection.name}_files"]
+
+    def catalog_complete(self) -> bool:
+        # Once complete, a catalog stays complete
+        if not self._catalog_complete:
+            state = self.file_catalog.find_one({"_id": CATALOG_STATE_ID}) or {}
+            self._catalog_complete = bool(state.get(CATALOG_COMPLETE_KEY))
+        return self._catalog_complete
+
+    def _record_catalog_state(self) -> None:
+        # On the first ingest, the catalog is complete if no chunk predates it
+        if self.file_catalog.find_one({"_id": CATALOG_STATE_ID}) is not None:
+            return
+        empty = self._collection.find_one({}, {"_id": 1}) is None
+        try:
+            self.file_catalog.insert_one(
+                {"_id": CATALOG_STATE_ID, CATALOG_COMPLETE_KEY: empty}
+            )
+        except DuplicateKeyError:
+            pass
+
     def add_documents(self, docs: list[Document], ids: list[str]):
+        self._record_catalog_state()
         # {file_id}_{idx}
         new_ids = [id for id in range(len(ids))]
         file_id = docs[0].metadata['file_id']
         f_ids = [f'{file_id}_{id}' for id in new_ids]
-        return super().add_documents(docs, f_ids)
+        result = super().add_documents(docs, f_ids)
+        for delta in summarize_chunks(
+            [doc.page_content for doc in docs],
+            [doc.metadata for doc in docs],
+            [doc.metadata['file_id'] for doc in docs],
+        ).values():
+            self._add_to_catalog(delta)
+        return result
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: List[str],
+    ) -> List[str]:
+        self._record_catalog_state()
+        # Insert chunks with precomputed vectors, keyed like add_documents
+        chunk_ids = [f"{file_id}_{idx}" for idx, file_id in enumerate(ids)]
+        self._collection.insert_many(
+            [
+                {
+                    "_id": chunk_id,
+                    self._text_key: text,
+                    self._embedding_key: embedding,
+                    **metadata,
+                }
+                for chunk_id, text, embedding, metadata in zip(
+                    chunk_ids, texts, embeddings, metadatas
+                )
+            ]
+        )
+        for delta in summarize_chunks(texts, metadatas, ids).values():
+            self._add_to_catalog(delta)
+        return chunk_ids
+
+    def _add_to_catalog(self, delta: dict) -> None:
+        # Compare-and-set on the content hash so concurrent ingests both count
+        while True:
+            current = self.file_catalog.find_one({"_id": delta["file_id"]})
+            entry = merge_entry(current, delta)
+            if current is None:
+                try:
+                    self.file_catalog.insert_one({**entry, "_id": delta["file_id"]})
+                    return
+                except DuplicateKeyError:
+                    continue
+            result = self.file_catalog.replace_one(
+                {"_id": delta["file_id"], "content_hash": current["content_hash"]},
+                entry,
+            )
+            if result.modified_count:
+                return
 
     def similarity_search_with_score_by_vector(
         self,
@@ -41,31 +132,133 @@ class AtlasMongoVector(MongoDBAtlasVectorSearch):
             processed_documents.append((new_document, score))
         return processed_documents
 
-    def get_all_ids(self) -> list[str]:
-        # Return unique file_id fields in self._collection
-        return self._collection.distinct("file_id")
-    
+    def get_all_ids(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[str]:
+        # Return file_ids in order, `limit` at a time after `after`
+        if not self.catalog_complete():
+            # Files stored before the catalog are only found among the chunks
+            return page_ids(
+                self._collection.distinct(
+                    "file_id", {"file_id": {"$gt": after}} if after is not None else {}
+                ),
+                limit,
+            )
+        query = {"$ne": CATALOG_STATE_ID}
+        if after is not None:
+            query["$gt"] = after
+        cursor = self.file_catalog.find({"_id": query}, {"_id": 1}).sort("_id", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return [doc["_id"] for doc in cursor]
+
     def get_filtered_ids(self, ids: list[str]) -> list[str]:
-        # Return unique file_id fields filtered by the provided ids
-        return self._collection.distinct("file_id", {"file_id": {"$in": ids}})
+        # Return the provided ids present in the catalog, or among the chunks
+        # when the catalog may lack files stored before it
+        found = {
+            doc["_id"]
+            for doc in self.file_catalog.find({"_id": {"$in": ids}}, {"_id": 1})
+        }
+        missing = [file_id for file_id in dict.fromkeys(ids) if file_id not in found]
+        if missing and not self.catalog_complete():
+            found.update(
+                self._collection.distinct("file_id", {"file_id": {"$in": missing}})
+            )
+        return [file_id for file_id in dict.fromkeys(ids) if file_id in found]
 
-    def get_documents_by_ids(self, ids: list[str]) -> list[Document]:
-        # Return documents filtered by file_id
+    def get_file_catalog(self, ids: list[str]) -> list[dict]:
         return [
-            Document(
-                page_content=doc["text"],
-                metadata={
-                    "file_id": doc["file_id"],
-                    "user_id": doc["user_id"],
-                    "digest": doc["digest"],
-                    "source": doc["source"],
-                    "page": int(doc.get("page", 0)),
-                },
-            )
-            for doc in self._collection.find({"file_id": {"$in": ids}})
+            {"file_id": doc.pop("_id"), **doc}
+            for doc in self.file_catalog.find({"_id": {"$in": ids}})
         ]
 
+    # Stored fields returned as chunk metadata, never the embedding
+    DOCUMENT_PROJECTION = {
+        "_id": 0,
+        "text": 1,
+        "file_id": 1,
+        "user_id": 1,
+        "digest": 1,
+        "source": 1,
+        "page": 1,
+        CHUNK_INDEX_KEY: 1,
+        "start_index": 1,
+    }
+
+    @staticmethod
+    def _to_document(doc: dict) -> Document:
+        metadata = {
+            "file_id": doc["file_id"],
+            "user_id": doc["user_id"],
+            "digest": doc["digest"],
+            "source": doc["source"],
+            "page": int(doc.get("page", 0)),
+        }
+        for key in (CHUNK_INDEX_KEY, "start_index"):
+            if key in doc:
+                metadata[key] = doc[key]
+        return Document(page_content=doc["text"], metadata=metadata)
+
+    def fetch_documents_by_ids(
+        self, ids: list[str]
+    ) -> Tuple[list[Document], list[str]]:
+        # Chunks of the given file_ids without their vectors, and the ids without any
+        documents, found = [], set()
+        for doc in self._collection.find(
+            {"file_id": {"$in": ids}}, self.DOCUMENT_PROJECTION
+        ):
+            found.add(doc["file_id"])
+            documents.append(self._to_document(doc))
+        return documents, [id for id in dict.fromkeys(ids) if id not in found]
+
+    def get_file_chunks(
+        self,
+        file_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> list[Document]:
+        # Chunks of one file in ordinal order, within the given chunk and page ranges
+        query = {"file_id": file_id}
+        for key, low, high in (
+            (CHUNK_INDEX_KEY, start, end),
+            ("page", page_start, None if page_end is None else page_end + 1),
+        ):
+            bounds = {}
+            if low is not None:
+                bounds["$gte"] = low
+            if high is not None:
+                bounds["$lt"] = high
+            if bounds:
+                query[key] = bounds
+        # _id keeps chunks without an ordinal in the same order between pages
+        cursor = self._collection.find(query, self.DOCUMENT_PROJECTION).sort(
+            [(CHUNK_INDEX_KEY, 1), ("_id", 1)]
+        )
+        if offset:
+            cursor = cursor.skip(offset)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return [self._to_document(doc) for doc in cursor]
+
+    def get_documents_by_ids(self, ids: list[str]) -> list[Document]:
+        # Return documents filtered by file_id
+        return self.fetch_documents_by_ids(ids)[0]
+
+    def get_file_embeddings(self, file_id: str) -> Tuple[list, list[Document]]:
+        # Return stored vectors and documents for one file_id
+        embeddings, documents = [], []
+        for doc in self._collection.find({"file_id": file_id}, {"_id": 0}):
+            embeddings.append(doc.pop(self._embedding_key))
+            text = doc.pop(self._text_key)
+            documents.append(Document(page_content=text, metadata=doc))
+        return embeddings, documents
+
     def delete(self, ids: Optional[list[str]] = None) -> None:
         # Delete documents by file_id
         if ids is not None:
-            self._collection.delete_many({"file_id": {"$in": ids}})
\ No newline at end of file
+            self._collection.delete_many({"file_id": {"$in": ids}})
+            self.file_catalog.delete_many({"_id": {"$in": ids}})
\ No newline at end of file
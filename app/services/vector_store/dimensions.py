@@ -0,0 +1,186 @@
+"""
+Embedding dimensions of pgvector collections.
+
+The size of a collection's embeddings is recorded in its `cmetadata` under
+`embedding_dimensions` at startup. A worker configured for another size (a
+different model or `EMBEDDINGS_DIMENSIONS`) refuses to start, rather than mixing
+vectors of different sizes that cannot be compared.
+
+Measure recall@k and exact search latency of truncated (Matryoshka) embeddings
+against the full ones, on vectors sampled from an existing collection, with:
+
+    python -m app.services.vector_store.dimensions benchmark --dimensions 1024 512 256
+"""
+
+import time
+import json
+import asyncio
+import argparse
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.services.vector_store.quantization import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    _get_collection,
+    _percentile,
+)
+
+DIMENSIONS_KEY = "embedding_dimensions"
+
+
+def check_dimensions(
+    collection_name: str,
+    configured: int,
+    recorded: Optional[int],
+    stored: Optional[int],
+) -> None:
+    """Raise ValueError when the collection holds embeddings of another size."""
+    existing = recorded or stored
+    if existing and existing != configured:
+        raise ValueError(
+            f"Collection {collection_name!r} stores {existing}-dimensional embeddings "
+            f"but the embeddings model is configured for {configured}. Set "
+            f"EMBEDDINGS_DIMENSIONS={existing} or use another COLLECTION_NAME."
+        )
+
+
+async def ensure_collection_dimensions(collection_name: str, dimensions: int) -> None:
+    """Check the collection's embedding size against `dimensions`, then record it."""
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"SELECT uuid, cmetadata FROM {COLLECTION_TABLE} WHERE name = $1",
+            collection_name,
+        )
+        if row is None:
+            return
+        metadata = row["cmetadata"]
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        metadata = metadata or {}
+        stored = await conn.fetchval(
+            f"SELECT vector_dims(embedding) FROM {EMBEDDING_TABLE} "
+            "WHERE collection_id = $1 LIMIT 1",
+            row["uuid"],
+        )
+        check_dimensions(
+            collection_name, dimensions, metadata.get(DIMENSIONS_KEY), stored
+        )
+        if metadata.get(DIMENSIONS_KEY) != dimensions:
+            metadata[DIMENSIONS_KEY] = dimensions
+            await conn.execute(
+                f"UPDATE {COLLECTION_TABLE} SET cmetadata = $2::json WHERE uuid = $1",
+                row["uuid"],
+                json.dumps(metadata),
+            )
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def _top_k(scores: np.ndarray, k: int) -> set:
+    return set(np.argpartition(-scores, min(k, len(scores) - 1))[:k].tolist())
+
+
+def compare_dimensions(
+    vectors: np.ndarray, dimensions: Sequence[int], queries: int = 100, k: int = 10
+) -> dict:
+    """
+    Recall@k of cosine search over `vectors` truncated to each of `dimensions`
+    (renormalized) against the full vectors, with sampled rows as queries, and
+    the latency of the exact in-memory search.
+    """
+    full = vectors.shape[1]
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    exact_matrix = _normalized(vectors)
+    exact = [_top_k(exact_matrix @ exact_matrix[i], k) for i in sample]
+
+    report = {}
+    for size in [full] + sorted({d for d in dimensions if d < full}, reverse=True):
+        matrix = _normalized(vectors[:, :size])
+        latencies, hits = [], 0
+        for i, expected in zip(sample, exact):
+            start = time.perf_counter()
+            found = _top_k(matrix @ matrix[i], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & found)
+        report[size] = {
+            "recall": hits / max(1, sum(len(expected) for expected in exact)),
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+            "bytes_per_vector": size * 4,
+        }
+    return report
+
+
+async def benchmark(
+    collection_name: str,
+    dimensions: Sequence[int],
+    sample: int = 20000,
+    queries: int = 100,
+    k: int = 10,
+) -> dict:
+    """`compare_dimensions` over up to `sample` vectors of the collection."""
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        collection_id, _ = await _get_collection(conn, collection_name)
+        rows = await conn.fetch(
+            f"SELECT embedding::text FROM {EMBEDDING_TABLE} "
+            "WHERE collection_id = $1 ORDER BY random() LIMIT $2",
+            collection_id,
+            sample,
+        )
+    if not rows:
+        raise SystemExit(f"Collection {collection_name!r} is empty")
+    vectors = np.array([json.loads(row[0]) for row in rows], dtype=np.float32)
+    return compare_dimensions(vectors, dimensions, queries, k)
+
+
+def main(argv=None) -> None:
+    from app.config import COLLECTION_NAME
+    from app.services.database import PSQLDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="compare recall and latency of truncated embeddings"
+    )
+    benchmark_parser.add_argument(
+        "--dimensions", type=int, nargs="+", default=[1024, 512, 256]
+    )
+    benchmark_parser.add_argument("--sample", type=int, default=20000)
+    benchmark_parser.add_argument("--queries", type=int, default=100)
+    benchmark_parser.add_argument("--k", type=int, default=10)
+    benchmark_parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            report = await benchmark(
+                args.collection, args.dimensions, args.sample, args.queries, args.k
+            )
+        finally:
+            await PSQLDatabase.close_pool()
+        print(
+            f"{'dimensions':<12}{'recall@' + str(args.k):>12}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'bytes':>8}"
+        )
+        for size, row in report.items():
+            print(
+                f"{size:<12}{row['recall']:>12.3f}{row['p50_ms']:>10.2f}"
+                f"{row['p95_ms']:>10.2f}{row['bytes_per_vector']:>8}"
+            )
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,58 @@
 import os
 import time
+import uuid
 import logging
-from typing import Optional, Any, Dict, List, Union
+from typing import Optional, Any, Dict, Iterable, List, Tuple, Union
+import sqlalchemy
 from sqlalchemy import event
 from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.engine import Engine
 from langchain_core.documents import Document
 from langchain_community.vectorstores.pgvector import PGVector
 
+from .file_catalog import (
+    CATALOG_COMPLETE_KEY,
+    CHUNK_INDEX_KEY,
+    create_catalog_sql,
+    file_catalog,
+    summarize_chunks,
+    utcnow,
+)
+from .pg_schema import TYPED_COLUMNS, filter_values, partition_key_of
+from .quantization import (
+    DISTANCE_KEY,
+    DISTANCE_STRATEGIES,
+    candidate_search_sql,
+    distance_strategy,
+    normalize,
+    quantized_distance,
+    storage_settings,
+    supports_iterative_scan,
+    unit_normalized,
+    vector_literal,
+)
+
 
 class ExtendedPgVector(PGVector):
     _query_logging_setup = False
+    # Candidates fetched per result from a quantized index before rescoring
+    rescore_oversample = int(os.getenv("PGVECTOR_RESCORE_OVERSAMPLE", "4"))
+    # Filter on the file_id/user_id columns added by `pg_schema migrate`
+    typed_columns = os.getenv("PGVECTOR_TYPED_COLUMNS", "False").lower() == "true"
+    # Distance recorded for new collections: cosine, inner, l2, or auto to pick
+    # inner product when the first embeddings ingested are unit-normalized
+    new_collection_distance = os.getenv("PGVECTOR_DISTANCE_STRATEGY", "cosine").lower()
+    _partition_key = None
+    _iterative_scan = None
+    # Rows fetched per round trip when streaming documents
+    fetch_batch_size = 1000
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setup_query_logging()
+        self.create_file_catalog()
 
     @staticmethod
     def _sanitize_parameters_for_logging(
@@ -118,32 +155,464 @@ class ExtendedPgVector(PGVector):
 
         ExtendedPgVector._query_logging_setup = True
 
-    def get_all_ids(self) -> list[str]:
+    def create_file_catalog(self) -> None:
+        """Create the file catalog if missing; `pg_schema catalog` backfills it."""
+        with Session(self._bind) as session:
+            for statement in create_catalog_sql():
+                session.execute(sqlalchemy.text(statement))
+            session.commit()
+
+    def add_embeddings(
+        self,
+        texts: Iterable[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Add embeddings and update the file catalog in the same transaction."""
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        if not metadatas:
+            metadatas = [{} for _ in texts]
+
         with Session(self._bind) as session:
-            results = session.query(self.EmbeddingStore.custom_id).all()
-            return [result[0] for result in results if result[0] is not None]
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            self.record_catalog_state(session, collection)
+            if embeddings:
+                distance = self.collection_distance(session, collection, embeddings)
+                if distance != "cosine":
+                    embeddings = normalize(embeddings)
+            session.bulk_save_objects(
+                [
+                    self.EmbeddingStore(
+                        embedding=embedding,
+                        document=text,
+                        cmetadata=metadata,
+                        custom_id=id,
+                        collection_id=collection.uuid,
+                    )
+                    for text, metadata, embedding, id in zip(
+                        texts, metadatas, embeddings, ids
+                    )
+                ]
+            )
+            now = utcnow()
+            entries = summarize_chunks(texts, metadatas, ids).values()
+            if entries:
+                stmt = insert(file_catalog).values(
+                    [
+                        {
+                            **entry,
+                            "collection_id": collection.uuid,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for entry in entries
+                    ]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[file_catalog.c.collection_id, file_catalog.c.file_id],
+                    set_={
+                        "user_id": sqlalchemy.func.coalesce(
+                            stmt.excluded.user_id, file_catalog.c.user_id
+                        ),
+                        "chunk_count": file_catalog.c.chunk_count
+                        + stmt.excluded.chunk_count,
+                        "byte_size": file_catalog.c.byte_size + stmt.excluded.byte_size,
+                        "content_hash": sqlalchemy.func.md5(
+                            file_catalog.c.content_hash + stmt.excluded.content_hash
+                        ),
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+                session.execute(stmt)
+            session.commit()
+
+        return ids
+
+    def collection_distance(
+        self, session: Session, collection: Any, embeddings: List[List[float]]
+    ) -> str:
+        """
+        The collection's distance strategy, recorded on its first ingest. A
+        collection that already holds embeddings keeps cosine until switched
+        with `quantization distance`, which checks the stored vectors.
+        """
+        metadata = collection.cmetadata or {}
+        if DISTANCE_KEY in metadata:
+            return metadata[DISTANCE_KEY]
+        strategy = self.new_collection_distance
+        if strategy == "auto":
+            strategy = "inner" if unit_normalized(embeddings) else "cosine"
+        elif strategy not in DISTANCE_STRATEGIES:
+            raise ValueError(f"Unsupported distance strategy: {strategy}")
+        if strategy != "cosine" and (
+            session.query(self.EmbeddingStore.uuid)
+            .filter(self.EmbeddingStore.collection_id == collection.uuid)
+            .first()
+        ):
+            strategy = "cosine"
+        collection.cmetadata = {**metadata, DISTANCE_KEY: strategy}
+        return strategy
+
+    def record_catalog_state(self, session: Session, collection: Any) -> None:
+        """
+        Record on a collection's first ingest whether its file catalog is
+        complete, which it is when no chunk predates it. `pg_schema catalog`
+        marks other collections complete once it has backfilled them.
+        """
+        metadata = collection.cmetadata or {}
+        if CATALOG_COMPLETE_KEY in metadata:
+            return
+        empty = (
+            session.query(self.EmbeddingStore.uuid)
+            .filter(self.EmbeddingStore.collection_id == collection.uuid)
+            .first()
+        ) is None
+        collection.cmetadata = {**metadata, CATALOG_COMPLETE_KEY: empty}
+
+    def _chunk_file_ids(self, collection: Any):
+        """Distinct file_ids of the chunks, through the custom_id index."""
+        return (
+            sqlalchemy.select(self.EmbeddingStore.custom_id)
+            .where(
+                self.EmbeddingStore.collection_id == collection.uuid,
+                self.EmbeddingStore.custom_id.isnot(None),
+            )
+            .distinct()
+        )
+
+    def _distance_expressions(self, embedding: List[float], distance: str):
+        """
+        Expression to order by, using the operator of the collection's index,
+        and the cosine distance reported as score. Embeddings are unit-normalized
+        for inner product and L2, where both derive from it: cosine distance is
+        1 - <a, b> = |a - b|^2 / 2.
+        """
+        column = self.EmbeddingStore.embedding
+        if distance == "inner":
+            # <#> is the negative inner product
+            order_by = column.max_inner_product(embedding)
+            return order_by, 1 + order_by
+        if distance == "l2":
+            order_by = column.l2_distance(embedding)
+            return order_by, order_by * order_by / 2
+        order_by = column.cosine_distance(embedding)
+        return order_by, order_by
+
+    def get_all_ids(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[str]:
+        """file_ids of the collection in order, `limit` at a time after `after`."""
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                return []
+            if (collection.cmetadata or {}).get(CATALOG_COMPLETE_KEY):
+                column = file_catalog.c.file_id
+                query = sqlalchemy.select(column).where(
+                    file_catalog.c.collection_id == collection.uuid
+                )
+            else:
+                # Files stored before the catalog are only found among the chunks
+                column = self.EmbeddingStore.custom_id
+                query = self._chunk_file_ids(collection)
+            query = query.order_by(column)
+            if after is not None:
+                query = query.where(column > after)
+            if limit is not None:
+                query = query.limit(limit)
+            return list(session.execute(query).scalars())
+
+    def get_file_catalog(self, ids: list[str]) -> list[dict]:
+        """Catalog entries (chunk count, size, content hash...) of the given files."""
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                return []
+            results = session.execute(
+                sqlalchemy.select(file_catalog).where(
+                    file_catalog.c.collection_id == collection.uuid,
+                    file_catalog.c.file_id.in_(ids),
+                )
+            )
+            return [
+                {
+                    key: value
+                    for key, value in result._mapping.items()
+                    if key != "collection_id"
+                }
+                for result in results
+            ]
+
+    def get_partition_key(self, session: Session) -> str:
+        """Metadata key the embedding table is partitioned by, if any."""
+        if self._partition_key is None:
+            definition = session.execute(
+                sqlalchemy.text("SELECT pg_get_partkeydef(to_regclass(:table))"),
+                {"table": self.EmbeddingStore.__tablename__},
+            ).scalar()
+            self._partition_key = partition_key_of(definition)
+        return self._partition_key
+
+    def _metadata_clauses(self, session: Session, key: str, values: list) -> list:
+        """
+        Match `key` against `values`, on its typed column when migrated. The
+        cmetadata expression is kept for the table's partition key so the
+        planner can prune partitions.
+        """
+        expression = self.EmbeddingStore.cmetadata[key].astext
+        if not self.typed_columns:
+            return [expression.in_(values)]
+        column = sqlalchemy.literal_column(
+            f"{self.EmbeddingStore.__tablename__}.{key}", sqlalchemy.String
+        )
+        clauses = [column.in_(values)]
+        if self.get_partition_key(session) == key:
+            clauses.append(expression.in_(values))
+        return clauses
+
+    def _id_clauses(self, session: Session, ids: list[str]) -> list:
+        """custom_id lookups; ids are file_ids, which allows partition pruning."""
+        clauses = [self.EmbeddingStore.custom_id.in_(ids)]
+        if self.get_partition_key(session) == "file_id":
+            clauses.append(self.EmbeddingStore.cmetadata["file_id"].astext.in_(ids))
+        return clauses
+
+    def _filter_clauses(self, session: Session, filter: Optional[dict]) -> list:
+        filter = dict(filter or {})
+        clauses = []
+        for key in TYPED_COLUMNS:
+            values = filter_values(filter.get(key))
+            if values is not None:
+                del filter[key]
+                clauses.extend(self._metadata_clauses(session, key, values))
+        if filter:
+            if self.use_jsonb:
+                filter_clauses = self._create_filter_clause(filter)
+                if filter_clauses is not None:
+                    clauses.append(filter_clauses)
+            else:
+                clauses.extend(self._create_filter_clause_json_deprecated(filter))
+        return clauses
 
     def get_filtered_ids(self, ids: list[str]) -> list[str]:
         with Session(self._bind) as session:
-            query = session.query(self.EmbeddingStore.custom_id).filter(
-                self.EmbeddingStore.custom_id.in_(ids)
+            collection = self.get_collection(session)
+            if not collection:
+                return []
+            found = set(
+                session.execute(
+                    sqlalchemy.select(file_catalog.c.file_id).where(
+                        file_catalog.c.collection_id == collection.uuid,
+                        file_catalog.c.file_id.in_(ids),
+                    )
+                ).scalars()
+            )
+            missing = [file_id for file_id in dict.fromkeys(ids) if file_id not in found]
+            if missing and not (collection.cmetadata or {}).get(CATALOG_COMPLETE_KEY):
+                found.update(
+                    session.execute(
+                        self._chunk_file_ids(collection).where(
+                            *self._id_clauses(session, missing)
+                        )
+                    ).scalars()
+                )
+            return [file_id for file_id in dict.fromkeys(ids) if file_id in found]
+
+    def fetch_documents_by_ids(
+        self, ids: list[str]
+    ) -> Tuple[list[Document], list[str]]:
+        """
+        Chunks of the given files in insertion order, and the ids without any.
+        Only text and metadata are selected, streamed through a server-side cursor.
+        """
+        requested = set(ids)
+        found = set()
+        documents = []
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                return [], list(dict.fromkeys(ids))
+            query = (
+                sqlalchemy.select(
+                    self.EmbeddingStore.custom_id,
+                    self.EmbeddingStore.document,
+                    self.EmbeddingStore.cmetadata,
+                )
+                .where(
+                    self.EmbeddingStore.collection_id == collection.uuid,
+                    *self._id_clauses(session, ids),
+                )
+                .order_by(
+                    self.EmbeddingStore.custom_id, sqlalchemy.literal_column("ctid")
+                )
+                .execution_options(yield_per=self.fetch_batch_size)
             )
-            results = query.all()
-            return [result[0] for result in results if result[0] is not None]
+            for custom_id, document, metadata in session.execute(query):
+                if custom_id not in requested:
+                    continue
+                found.add(custom_id)
+                documents.append(
+                    Document(page_content=document, metadata=metadata or {})
+                )
+        return documents, [id for id in dict.fromkeys(ids) if id not in found]
 
     def get_documents_by_ids(self, ids: list[str]) -> list[Document]:
+        # Not self.: AsyncPgVector overrides fetch_documents_by_ids as a coroutine
+        return ExtendedPgVector.fetch_documents_by_ids(self, ids)[0]
+
+    def get_file_chunks(
+        self,
+        file_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> list[Document]:
+        """
+        Chunks of a file in ordinal order, restricted to ordinals in [start, end)
+        and pages in [page_start, page_end], at most `limit` of them after
+        skipping the first `offset`.
+        """
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                return []
+            ordinal = sqlalchemy.cast(
+                self.EmbeddingStore.cmetadata[CHUNK_INDEX_KEY].astext, sqlalchemy.Integer
+            )
+            page = sqlalchemy.cast(
+                self.EmbeddingStore.cmetadata["page"].astext, sqlalchemy.Integer
+            )
+            query = (
+                sqlalchemy.select(
+                    self.EmbeddingStore.document, self.EmbeddingStore.cmetadata
+                )
+                .where(
+                    self.EmbeddingStore.collection_id == collection.uuid,
+                    *self._id_clauses(session, [file_id]),
+                )
+                .order_by(ordinal.asc().nulls_last(), sqlalchemy.literal_column("ctid"))
+            )
+            if start is not None:
+                query = query.where(ordinal >= start)
+            if end is not None:
+                query = query.where(ordinal < end)
+            if page_start is not None:
+                query = query.where(page >= page_start)
+            if page_end is not None:
+                query = query.where(page <= page_end)
+            if offset:
+                query = query.offset(offset)
+            if limit is not None:
+                query = query.limit(limit)
+            return [
+                Document(page_content=document, metadata=metadata or {})
+                for document, metadata in session.execute(query)
+            ]
+
+    def get_file_embeddings(self, file_id: str) -> Tuple[list, list[Document]]:
+        """Return the stored vectors of a file's chunks alongside their documents."""
         with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                return [], []
             results = (
-                session.query(self.EmbeddingStore)
-                .filter(self.EmbeddingStore.custom_id.in_(ids))
+                session.query(
+                    self.EmbeddingStore.embedding,
+                    self.EmbeddingStore.document,
+                    self.EmbeddingStore.cmetadata,
+                )
+                .filter(
+                    self.EmbeddingStore.collection_id == collection.uuid,
+                    *self._id_clauses(session, [file_id]),
+                )
                 .all()
             )
-            return [
-                Document(page_content=result.document, metadata=result.cmetadata or {})
+            return [result[0] for result in results], [
+                Document(page_content=result[1], metadata=result[2] or {})
                 for result in results
-                if result.custom_id in ids
             ]
 
+    def iterative_scan(self, session: Session) -> bool:
+        """Whether the installed pgvector can resume filtered HNSW scans."""
+        if self._iterative_scan is None:
+            version = session.execute(
+                sqlalchemy.text(
+                    "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+                )
+            ).scalar()
+            self._iterative_scan = supports_iterative_scan(version)
+        return self._iterative_scan
+
+    def _query_collection(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, str]] = None,
+    ) -> List[Any]:
+        """Query the collection, through its quantized index when it has one."""
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+
+            filter_by = [
+                self.EmbeddingStore.collection_id == collection.uuid,
+                *self._filter_clauses(session, filter),
+            ]
+
+            distance = distance_strategy(collection.cmetadata)
+            if distance != "cosine":
+                embedding = normalize([embedding])[0]
+            settings = storage_settings(collection.cmetadata)
+            statements = None
+            if settings is not None:
+                limit = k * settings.get("oversample", self.rescore_oversample)
+                statements = candidate_search_sql(
+                    limit, bool(filter), self.iterative_scan(session)
+                )
+            if statements is None:
+                candidates = filter_by
+            else:
+                # Rank by the quantized vectors, then rescore in full precision
+                for statement in statements:
+                    session.execute(sqlalchemy.text(statement))
+                order_by = sqlalchemy.text(
+                    quantized_distance(
+                        settings["type"],
+                        settings["dimensions"],
+                        ":query_vector",
+                        distance,
+                    )
+                ).bindparams(query_vector=vector_literal(embedding))
+                candidate_ids = (
+                    session.query(self.EmbeddingStore.uuid)
+                    .filter(*filter_by)
+                    .order_by(order_by)
+                    .limit(limit)
+                    .subquery()
+                )
+                candidates = [
+                    self.EmbeddingStore.uuid.in_(sqlalchemy.select(candidate_ids.c.uuid))
+                ]
+
+            order_by, score = self._distance_expressions(embedding, distance)
+            return (
+                session.query(self.EmbeddingStore, score.label("distance"))
+                .filter(*candidates)
+                .order_by(order_by)
+                .limit(k)
+                .all()
+            )
+
     def _delete_multiple(
         self, ids: Optional[list[str]] = None, collection_only: bool = False
     ) -> None:
@@ -154,6 +623,7 @@ class ExtendedPgVector(PGVector):
                     "using the custom ids field)"
                 )
                 stmt = delete(self.EmbeddingStore)
+                catalog_stmt = delete(file_catalog)
                 if collection_only:
                     collection = self.get_collection(session)
                     if not collection:
@@ -162,6 +632,10 @@ class ExtendedPgVector(PGVector):
                     stmt = stmt.where(
                         self.EmbeddingStore.collection_id == collection.uuid
                     )
-                stmt = stmt.where(self.EmbeddingStore.custom_id.in_(ids))
+                    catalog_stmt = catalog_stmt.where(
+                        file_catalog.c.collection_id == collection.uuid
+                    )
+                stmt = stmt.where(*self._id_clauses(session, ids))
                 session.execute(stmt)
+                session.execute(catalog_stmt.where(file_catalog.c.file_id.in_(ids)))
             session.commit()
@@ -5,8 +5,12 @@ from langchain_core.embeddings import Embeddings
 from .async_pg_vector import AsyncPgVector
 from .atlas_mongo_vector import AtlasMongoVector
 from .extended_pg_vector import ExtendedPgVector
+from .local_vector import LocalVectorStore
 from .qdrant_vector import QdrantVector
 
+# Stores whose data methods are coroutines, taking the route's executor
+ASYNC_VECTOR_STORES = (AsyncPgVector, QdrantVector)
+
 
 def get_vector_store(
     connection_string: str,
@@ -34,13 +38,41 @@ def get_vector_store(
             collection=mong_collection, embedding=embeddings, index_name=search_index
         )
     elif mode == "qdrant":
-        # Import QDRANT_API_KEY from config
-        from app.config import QDRANT_API_KEY
+        # Import Qdrant settings from config
+        from app.config import (
+            QDRANT_API_KEY,
+            QDRANT_HNSW_EF,
+            QDRANT_PREFER_GRPC,
+            QDRANT_QUANTIZATION_OVERSAMPLING,
+            QDRANT_QUANTIZATION_RESCORE,
+            QDRANT_SCAN_SHARDS,
+            QDRANT_SCROLL_PAGE_SIZE,
+            QDRANT_UPSERT_BATCH_SIZE,
+            QDRANT_UPSERT_PARALLELISM,
+        )
         return QdrantVector(
             url=connection_string,
             api_key=QDRANT_API_KEY,
             collection_name=collection_name,
             embeddings=embeddings,
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            upsert_batch_size=QDRANT_UPSERT_BATCH_SIZE,
+            upsert_parallelism=QDRANT_UPSERT_PARALLELISM,
+            scroll_page_size=QDRANT_SCROLL_PAGE_SIZE,
+            scan_shards=QDRANT_SCAN_SHARDS,
+            search_defaults={
+                "hnsw_ef": QDRANT_HNSW_EF or None,
+                "rescore": QDRANT_QUANTIZATION_RESCORE,
+                "oversampling": QDRANT_QUANTIZATION_OVERSAMPLING or None,
+            },
+        )
+    elif mode == "local":
+        from app.config import LOCAL_VECTOR_IVF_MIN_ROWS, LOCAL_VECTOR_IVF_NPROBE
+        return LocalVectorStore(
+            embedding=embeddings,
+            path=connection_string,
+            ivf_min_rows=LOCAL_VECTOR_IVF_MIN_ROWS,
+            ivf_nprobe=LOCAL_VECTOR_IVF_NPROBE,
         )
     else:
-        raise ValueError("Invalid mode specified. Choose 'sync', 'async', 'atlas-mongo', or 'qdrant'.")
\ No newline at end of file
+        raise ValueError("Invalid mode specified. Choose 'sync', 'async', 'atlas-mongo', 'qdrant', or 'local'.")
\ No newline at end of file
@@ -0,0 +1,163 @@
+import uuid
+import hashlib
+import datetime
+import sqlalchemy
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import UUID
+
+FILE_CATALOG_TABLE = "rag_file_catalog"
+# Set in a collection's metadata once its catalog covers every stored file;
+# until then, lookups fall back to the chunks for files the catalog lacks
+CATALOG_COMPLETE_KEY = "file_catalog_complete"
+# Ordinal of a chunk within its file, written in its metadata at ingest
+CHUNK_INDEX_KEY = "chunk_index"
+# Namespace of the Qdrant point ids derived from file_ids
+FILE_ID_NAMESPACE = uuid.UUID("0b4bd0ae-6f0c-4c55-9f0d-6a3d8f0ab2f1")
+
+metadata = sqlalchemy.MetaData()
+
+# One row per file_id and collection, maintained with the chunk rows
+file_catalog = sqlalchemy.Table(
+    FILE_CATALOG_TABLE,
+    metadata,
+    sqlalchemy.Column("collection_id", UUID(as_uuid=True), primary_key=True),
+    sqlalchemy.Column("file_id", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("user_id", sqlalchemy.String, nullable=True),
+    sqlalchemy.Column("chunk_count", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("byte_size", sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column("content_hash", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime(timezone=True), nullable=False),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime(timezone=True), nullable=False),
+    sqlalchemy.Index(f"ix_{FILE_CATALOG_TABLE}_user", "collection_id", "user_id"),
+)
+
+
+def create_catalog_sql() -> List[str]:
+    """
+    Statements creating the catalog table if missing, run in one transaction.
+    The advisory lock serializes workers starting together, whose concurrent
+    `CREATE TABLE IF NOT EXISTS` could otherwise still collide.
+    """
+    dialect = postgresql.dialect()
+    return [
+        f"SELECT pg_advisory_xact_lock(hashtext('{FILE_CATALOG_TABLE}'))",
+        str(CreateTable(file_catalog, if_not_exists=True).compile(dialect=dialect)),
+    ] + [
+        str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+        for index in file_catalog.indexes
+    ]
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def chunk_digest(text: str, metadata: dict) -> str:
+    digest = (metadata or {}).get("digest")
+    if digest:
+        return digest
+    return hashlib.md5(text.encode("utf-8", "ignore")).hexdigest()
+
+
+def chain_hash(previous: Optional[str], batch_hash: str) -> str:
+    """Content hash of a file after ingesting another batch of its chunks."""
+    if not previous:
+        return batch_hash
+    return hashlib.md5((previous + batch_hash).encode("utf-8")).hexdigest()
+
+
+def summarize_chunks(
+    texts: Iterable[str], metadatas: Iterable[dict], ids: Iterable[str]
+) -> Dict[str, dict]:
+    """Catalog deltas per file_id for a batch of chunks being added."""
+    digests: Dict[str, List[str]] = {}
+    entries: Dict[str, dict] = {}
+    for text, chunk_metadata, file_id in zip(texts, metadatas, ids):
+        entry = entries.setdefault(
+            file_id,
+            {
+                "file_id": file_id,
+                "user_id": (chunk_metadata or {}).get("user_id"),
+                "chunk_count": 0,
+                "byte_size": 0,
+            },
+        )
+        entry["chunk_count"] += 1
+        entry["byte_size"] += len(text.encode("utf-8", "ignore"))
+        digests.setdefault(file_id, []).append(chunk_digest(text, chunk_metadata))
+    for file_id, entry in entries.items():
+        entry["content_hash"] = hashlib.md5(
+            "".join(digests[file_id]).encode("utf-8")
+        ).hexdigest()
+    return entries
+
+
+def merge_entry(
+    current: Optional[dict], delta: dict, now: Optional[datetime.datetime] = None
+) -> dict:
+    """The catalog entry of a file once `delta` has been added to it."""
+    now = now or utcnow()
+    if current is None:
+        return {**delta, "created_at": now, "updated_at": now}
+    return {
+        **current,
+        "user_id": (
+            delta["user_id"] if delta["user_id"] is not None else current["user_id"]
+        ),
+        "chunk_count": current["chunk_count"] + delta["chunk_count"],
+        "byte_size": current["byte_size"] + delta["byte_size"],
+        "content_hash": chain_hash(current["content_hash"], delta["content_hash"]),
+        "updated_at": now,
+    }
+
+
+def page_ids(
+    file_ids: Iterable[str], limit: Optional[int] = None, after: Optional[str] = None
+) -> List[str]:
+    """Sorted file_ids following `after`, at most `limit` of them."""
+    ids = sorted(file_id for file_id in file_ids if after is None or file_id > after)
+    return ids[:limit] if limit is not None else ids
+
+
+def catalog_point_id(file_id: str) -> str:
+    return str(uuid.uuid5(FILE_ID_NAMESPACE, file_id))
+
+
+def chunk_in_range(
+    metadata: dict,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    page_start: Optional[int] = None,
+    page_end: Optional[int] = None,
+) -> bool:
+    """
+    Whether a chunk's ordinal is in [start, end) and its page in
+    [page_start, page_end]. Chunks without the bounded key never match.
+    """
+    for key, low, high in (
+        (CHUNK_INDEX_KEY, start, None if end is None else end - 1),
+        ("page", page_start, page_end),
+    ):
+        if low is None and high is None:
+            continue
+        value = metadata.get(key)
+        if value is None:
+            return False
+        value = int(value)
+        if (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+
+def chunk_order(metadata: dict) -> tuple:
+    """Sort key of a file's chunks, placing those without an ordinal last."""
+    value = metadata.get(CHUNK_INDEX_KEY)
+    return (value is None, int(value) if value is not None else 0)
+
+
+def page_of(documents: list, offset: Optional[int], limit: Optional[int]) -> list:
+    """The `limit` documents following the first `offset`, for in-memory reads."""
+    offset = offset or 0
+    return documents[offset : None if limit is None else offset + limit]
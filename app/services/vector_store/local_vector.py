@@ -0,0 +1,588 @@
+import os
+import json
+import uuid
+import logging
+import datetime
+import threading
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .file_catalog import (
+    chunk_in_range,
+    chunk_order,
+    merge_entry,
+    page_ids,
+    page_of,
+    summarize_chunks,
+    utcnow,
+)
+
+logger = logging.getLogger(__name__)
+
+IN_MEMORY_PATH = ":memory:"
+
+
+class _Segment:
+    """
+    An append-only block of float32 vectors and their documents.
+
+    Persisted segments are a raw `.vec` file, memory-mapped read-only, and a
+    `.jsonl` file holding one `{"text", "metadata"}` line per vector row.
+    """
+
+    def __init__(self, dim: int, vec_path: Optional[str] = None, rows: int = 0):
+        self.dim = dim
+        self.vec_path = vec_path
+        self.docs_path = vec_path[: -len(".vec")] + ".jsonl" if vec_path else None
+        self.docs: List[Tuple[str, dict]] = []
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        if vec_path:
+            self._open(rows)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _open(self, rows: int) -> None:
+        # Drop rows written after the last committed log record
+        # (e.g. a crash mid-append)
+        if os.path.exists(self.vec_path):
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(rows * self.dim * 4)
+        else:
+            open(self.vec_path, "wb").close()
+        if os.path.exists(self.docs_path):
+            with open(self.docs_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(self.docs) == rows:
+                        break
+                    doc = json.loads(line)
+                    self.docs.append((doc["text"], doc["metadata"]))
+        with open(self.docs_path, "w", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps({"text": text, "metadata": metadata}) + "\n"
+                for text, metadata in self.docs
+            )
+        self._map()
+        self.norms = np.linalg.norm(self.vectors, axis=1).astype(np.float32)
+        self.live = np.zeros(len(self.docs), dtype=bool)
+
+    def _map(self) -> None:
+        if len(self.docs) == 0:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.vectors = np.memmap(
+                self.vec_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.docs), self.dim),
+            )
+
+    def append(self, vectors: np.ndarray, texts: List[str], metadatas: List[dict]):
+        start = len(self.docs)
+        if self.vec_path:
+            with open(self.vec_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.docs_path, "a", encoding="utf-8") as f:
+                f.writelines(
+                    json.dumps({"text": text, "metadata": metadata}) + "\n"
+                    for text, metadata in zip(texts, metadatas)
+                )
+            self.docs.extend(zip(texts, metadatas))
+            self._map()
+        else:
+            self.vectors = np.concatenate([self.vectors, vectors])
+            self.docs.extend(zip(texts, metadatas))
+        self.norms = np.concatenate(
+            [self.norms, np.linalg.norm(vectors, axis=1).astype(np.float32)]
+        )
+        self.live = np.concatenate([self.live, np.ones(len(texts), dtype=bool)])
+        return start, len(self.docs)
+
+    def similarities(self, query: np.ndarray, rows=slice(None)) -> np.ndarray:
+        norms = self.norms[rows]
+        return (self.vectors[rows] @ query) / np.where(norms == 0.0, 1.0, norms)
+
+    def document(self, row: int) -> Document:
+        text, metadata = self.docs[row]
+        return Document(page_content=text, metadata=dict(metadata))
+
+
+class _IVFIndex:
+    """Inverted file partitioning of all rows into `nlist` spherical k-means cells."""
+
+    def __init__(self, centroids: np.ndarray, built_rows: int):
+        self.centroids = centroids
+        self.built_rows = built_rows
+        self.assignments: List[np.ndarray] = []
+
+    @classmethod
+    def build(cls, segments: List[_Segment], iterations: int = 10, seed: int = 0):
+        live_rows = [(i, np.flatnonzero(s.live)) for i, s in enumerate(segments)]
+        total = sum(len(rows) for _, rows in live_rows)
+        nlist = int(min(max(np.sqrt(total), 16), 4096))
+        rng = np.random.default_rng(seed)
+        sample = []
+        sample_rate = min(1.0, 50000 / max(total, 1))
+        for index, rows in live_rows:
+            if len(rows) == 0:
+                continue
+            picked = rows[rng.random(len(rows)) < sample_rate]
+            sample.append(cls._unit(segments[index].vectors[picked]))
+        sample = np.concatenate(sample) if sample else np.zeros((0, 1), np.float32)
+        nlist = min(nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cell in range(nlist):
+                members = sample[labels == cell]
+                if len(members):
+                    centroids[cell] = members.sum(axis=0)
+            centroids = cls._unit(centroids)
+        index = cls(centroids, total)
+        for segment in segments:
+            index.assignments.append(index.assign(segment.vectors))
+        return index
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0.0, 1.0, norms)).astype(np.float32)
+
+    def assign(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            chunk = np.asarray(vectors[start : start + block])
+            labels[start : start + block] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return labels
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        return np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded vector store for single-node deployments and benchmarks.
+
+    Vectors live in append-only float32 segments, memory-mapped from `path`
+    (or kept purely in memory when `path` is ":memory:"). A log of add/delete
+    records is the commit point and is replayed on startup to rebuild the
+    file_id -> row-range index. Search is exact brute force; collections with
+    at least `ivf_min_rows` live rows switch unfiltered searches to IVF.
+    """
+
+    SEGMENT_ROWS = 65536
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        path: str = IN_MEMORY_PATH,
+        ivf_min_rows: int = 0,
+        ivf_nprobe: int = 8,
+    ):
+        self._embedding = embedding
+        self.path = None if path in (None, "", IN_MEMORY_PATH) else path
+        self.ivf_min_rows = ivf_min_rows
+        self.ivf_nprobe = ivf_nprobe
+        self.dim: Optional[int] = None
+        self._segments: List[_Segment] = []
+        self._index: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._catalog: Dict[str, dict] = {}
+        self._ivf: Optional[_IVFIndex] = None
+        self._lock = threading.RLock()
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def embedding_function(self) -> Embeddings:
+        return self._embedding
+
+    # Persistence
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "log.jsonl")
+
+    def _segment_path(self, number: int) -> Optional[str]:
+        if not self.path:
+            return None
+        return os.path.join(self.path, f"segment-{number:05d}.vec")
+
+    def _write_log(self, records: List[dict]) -> None:
+        if not self.path:
+            return
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+        committed: Dict[int, int] = {}
+        added_at: Dict[str, List[Optional[str]]] = {}
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring truncated local vector store log record")
+                    break
+                if record["op"] == "init":
+                    self.dim = record["dim"]
+                elif record["op"] == "add":
+                    segment = record["segment"]
+                    committed[segment] = max(committed.get(segment, 0), record["stop"])
+                    self._index.setdefault(record["file_id"], []).append(
+                        (segment, record["start"], record["stop"])
+                    )
+                    added_at.setdefault(record["file_id"], []).append(
+                        record.get("time")
+                    )
+                elif record["op"] == "delete":
+                    for file_id in record["file_ids"]:
+                        self._index.pop(file_id, None)
+                        added_at.pop(file_id, None)
+        if self.dim is None:
+            return
+        for number in range(max(committed, default=-1) + 1):
+            self._segments.append(
+                _Segment(self.dim, self._segment_path(number), committed.get(number, 0))
+            )
+        for file_id, ranges in self._index.items():
+            for (segment, start, stop), time in zip(ranges, added_at[file_id]):
+                self._segments[segment].live[start:stop] = True
+                self._add_to_catalog(
+                    file_id,
+                    segment,
+                    start,
+                    stop,
+                    datetime.datetime.fromisoformat(time) if time else utcnow(),
+                )
+        logger.info(
+            f"Loaded local vector store from {self.path}: "
+            f"{len(self._index)} files, {self._live_rows()} vectors"
+        )
+
+    # Writes
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [m.get("file_id") or str(uuid.uuid4()) for m in metadatas]
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            records = []
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                records.append({"op": "init", "dim": self.dim})
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"the store's dimension {self.dim}"
+                )
+            # Consecutive rows sharing an id become one contiguous range
+            now = utcnow()
+            position = 0
+            while position < len(texts):
+                end = position
+                while end < len(texts) and ids[end] == ids[position]:
+                    end += 1
+                while position < end:
+                    segment_number = self._writable_segment()
+                    segment = self._segments[segment_number]
+                    take = min(end - position, self.SEGMENT_ROWS - len(segment))
+                    rows = slice(position, position + take)
+                    start, stop = segment.append(
+                        vectors[rows], list(texts[rows]), list(metadatas[rows])
+                    )
+                    if self._ivf is not None:
+                        self._ivf.assignments[segment_number] = np.concatenate(
+                            [
+                                self._ivf.assignments[segment_number],
+                                self._ivf.assign(vectors[rows]),
+                            ]
+                        )
+                    records.append(
+                        {
+                            "op": "add",
+                            "file_id": ids[position],
+                            "segment": segment_number,
+                            "start": start,
+                            "stop": stop,
+                            "time": now.isoformat(),
+                        }
+                    )
+                    self._index.setdefault(ids[position], []).append(
+                        (segment_number, start, stop)
+                    )
+                    self._add_to_catalog(
+                        ids[position], segment_number, start, stop, now
+                    )
+                    position += take
+            self._write_log(records)
+        return list(ids)
+
+    def _add_to_catalog(
+        self, file_id: str, segment: int, start: int, stop: int, now: datetime.datetime
+    ) -> None:
+        docs = self._segments[segment].docs[start:stop]
+        delta = summarize_chunks(
+            [text for text, _ in docs],
+            [metadata for _, metadata in docs],
+            [file_id] * len(docs),
+        )[file_id]
+        self._catalog[file_id] = merge_entry(self._catalog.get(file_id), delta, now)
+
+    def _writable_segment(self) -> int:
+        if not self._segments or len(self._segments[-1]) >= self.SEGMENT_ROWS:
+            self._segments.append(
+                _Segment(self.dim, self._segment_path(len(self._segments)))
+            )
+            if self._ivf is not None:
+                self._ivf.assignments.append(np.zeros(0, dtype=np.int32))
+        return len(self._segments) - 1
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+
+    def add_documents(self, docs: list[Document], ids: Optional[list[str]] = None):
+        return self.add_texts(
+            [doc.page_content for doc in docs],
+            metadatas=[doc.metadata for doc in docs],
+            ids=ids,
+        )
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> None:
+        # Delete all rows of the given file_ids; space is not reclaimed
+        if ids is None:
+            return
+        with self._lock:
+            deleted = [file_id for file_id in ids if file_id in self._index]
+            if not deleted:
+                return
+            self._write_log([{"op": "delete", "file_ids": deleted}])
+            for file_id in deleted:
+                self._catalog.pop(file_id, None)
+                for segment, start, stop in self._index.pop(file_id):
+                    self._segments[segment].live[start:stop] = False
+
+    # Reads
+
+    def get_all_ids(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[str]:
+        with self._lock:
+            return page_ids(self._catalog, limit, after)
+
+    def get_filtered_ids(self, ids: list[str]) -> list[str]:
+        with self._lock:
+            return [
+                file_id for file_id in dict.fromkeys(ids) if file_id in self._catalog
+            ]
+
+    def get_file_catalog(self, ids: list[str]) -> list[dict]:
+        with self._lock:
+            return [
+                dict(self._catalog[file_id])
+                for file_id in dict.fromkeys(ids)
+                if file_id in self._catalog
+            ]
+
+    def fetch_documents_by_ids(
+        self, ids: list[str]
+    ) -> Tuple[list[Document], list[str]]:
+        """Chunks of the given files in insertion order, and the ids without any."""
+        with self._lock:
+            ids = list(dict.fromkeys(ids))
+            documents = [
+                self._segments[segment].document(row)
+                for file_id in ids
+                for segment, start, stop in self._index.get(file_id, ())
+                for row in range(start, stop)
+            ]
+            return documents, [file_id for file_id in ids if file_id not in self._index]
+
+    def get_file_chunks(
+        self,
+        file_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> list[Document]:
+        """
+        Chunks of a file in ordinal order, restricted to ordinals in [start, end)
+        and pages in [page_start, page_end], at most `limit` of them after
+        skipping the first `offset`.
+        """
+        documents, _ = self.fetch_documents_by_ids([file_id])
+        documents = [
+            document
+            for document in documents
+            if chunk_in_range(document.metadata, start, end, page_start, page_end)
+        ]
+        documents.sort(key=lambda document: chunk_order(document.metadata))
+        return page_of(documents, offset, limit)
+
+    def get_documents_by_ids(self, ids: list[str]) -> list[Document]:
+        return self.fetch_documents_by_ids(ids)[0]
+
+    def get_file_embeddings(self, file_id: str) -> Tuple[list, list[Document]]:
+        with self._lock:
+            ranges = self._index.get(file_id, ())
+            embeddings = [
+                np.array(self._segments[segment].vectors[start:stop])
+                for segment, start, stop in ranges
+            ]
+            documents = [
+                self._segments[segment].document(row)
+                for segment, start, stop in ranges
+                for row in range(start, stop)
+            ]
+        if not embeddings:
+            return [], []
+        return np.concatenate(embeddings), documents
+
+    # Search
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Scores are cosine distances, matching the default pgvector backend."""
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        query = query / norm if norm > 0.0 else query
+        filter = dict(filter or {})
+        file_filter = filter.pop("file_id", None)
+        with self._lock:
+            if self.dim is None or len(query) != self.dim:
+                return []
+            candidates = self._candidates(query, file_filter)
+            scored = []
+            for segment_number, rows in candidates:
+                segment = self._segments[segment_number]
+                similarities = segment.similarities(query, rows)
+                if isinstance(rows, slice):
+                    rows = np.arange(len(segment))[rows]
+                # Keep enough candidates to survive the metadata post-filter
+                limit = len(rows) if filter else min(k, len(rows))
+                if limit < len(rows):
+                    top = np.argpartition(-similarities, limit - 1)[:limit]
+                else:
+                    top = np.arange(len(rows))
+                scored.extend(
+                    (float(similarities[i]), segment_number, int(rows[i])) for i in top
+                )
+            scored.sort(key=lambda item: item[0], reverse=True)
+            results = []
+            for similarity, segment_number, row in scored:
+                document = self._segments[segment_number].document(row)
+                if filter and not self._matches(document.metadata, filter):
+                    continue
+                results.append((document, 1.0 - similarity))
+                if len(results) == k:
+                    break
+            return results
+
+    def _candidates(self, query: np.ndarray, file_filter: Any):
+        """(segment, rows) pairs to score, as slices or arrays of live row numbers."""
+        if file_filter is not None:
+            if isinstance(file_filter, dict):
+                file_ids = file_filter.get("$in") or [file_filter.get("$eq")]
+            else:
+                file_ids = [file_filter]
+            return [
+                (segment, slice(start, stop))
+                for file_id in dict.fromkeys(file_ids)
+                for segment, start, stop in self._index.get(file_id, ())
+            ]
+        live_rows = self._live_rows()
+        if self.ivf_min_rows and live_rows >= self.ivf_min_rows:
+            if self._ivf is None or live_rows > 2 * self._ivf.built_rows:
+                self._ivf = _IVFIndex.build(self._segments)
+            cells = self._ivf.probe(query, self.ivf_nprobe)
+            return [
+                (
+                    number,
+                    np.flatnonzero(
+                        segment.live & np.isin(self._ivf.assignments[number], cells)
+                    ),
+                )
+                for number, segment in enumerate(self._segments)
+            ]
+        return [
+            (number, np.flatnonzero(segment.live))
+            for number, segment in enumerate(self._segments)
+        ]
+
+    @staticmethod
+    def _matches(metadata: dict, filter: dict) -> bool:
+        for key, value in filter.items():
+            if isinstance(value, dict):
+                if "$in" in value and metadata.get(key) not in value["$in"]:
+                    return False
+                if "$eq" in value and metadata.get(key) != value["$eq"]:
+                    return False
+            elif metadata.get(key) != value:
+                return False
+        return True
+
+    def _live_rows(self) -> int:
+        return int(sum(segment.live.sum() for segment in self._segments))
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        embedding = self._embedding.embed_query(query)
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k=k, filter=filter
+            )
+        ]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,424 @@
+"""
+Typed metadata columns and partitioning for the pgvector embedding table.
+
+`migrate` adds `file_id` and `user_id` text columns kept in sync with
+`cmetadata` by a trigger, backfills them in batches and builds composite
+indexes concurrently; set `PGVECTOR_TYPED_COLUMNS=True` once it completes.
+`partition` copies the table into a hash or list partitioned one while a
+trigger mirrors concurrent writes, then swaps the two in a short transaction.
+`catalog` fills the file catalog from the chunks stored before it existed.
+
+    python -m app.services.vector_store.pg_schema migrate
+    python -m app.services.vector_store.pg_schema catalog
+    python -m app.services.vector_store.pg_schema partition \
+        --by file_id --partitions 16
+    python -m app.services.vector_store.pg_schema partition \
+        --by user_id --method list --values alice,bob
+"""
+
+import json
+import uuid
+import asyncio
+import argparse
+from typing import List, Optional
+
+from .file_catalog import CATALOG_COMPLETE_KEY, FILE_CATALOG_TABLE, create_catalog_sql
+from .quantization import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    create_index_sql,
+    distance_strategy,
+    index_name,
+    storage_settings,
+)
+
+TYPED_COLUMNS = ("file_id", "user_id")
+PARTITIONED_TABLE = f"{EMBEDDING_TABLE}_partitioned"
+BACKUP_TABLE = f"{EMBEDDING_TABLE}_unpartitioned"
+FIRST_UUID = uuid.UUID(int=0)
+TYPED_COLUMNS_TRIGGER = "rag_api_typed_columns"
+MIRROR_TRIGGER = "rag_api_partition_mirror"
+
+# Indexes matching the lookups in document_routes: chunks of a file within the
+# collection (search filters, hot file loads) and the files of a user
+TYPED_INDEXES = {
+    f"ix_{EMBEDDING_TABLE}_collection_file": "(collection_id, file_id)",
+    f"ix_{EMBEDDING_TABLE}_user_file": "(user_id, file_id)",
+}
+# Indexes created by ensure_vector_indexes at startup
+BASE_INDEXES = {
+    f"idx_{EMBEDDING_TABLE}_custom_id": "(custom_id)",
+    f"idx_{EMBEDDING_TABLE}_file_id": "((cmetadata->>'file_id'))",
+}
+
+
+def filter_values(value) -> Optional[List[str]]:
+    """Values of an equality or `$in` filter, or None for any other operator."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict) and len(value) == 1:
+        if "$eq" in value:
+            return [value["$eq"]]
+        if "$in" in value:
+            return list(value["$in"])
+    return None
+
+
+def partition_key_of(definition: Optional[str]) -> str:
+    """Metadata key a table is partitioned by, from `pg_get_partkeydef`."""
+    for key in TYPED_COLUMNS:
+        if definition and f"'{key}'" in definition:
+            return key
+    return ""
+
+
+def typed_columns_sql() -> List[str]:
+    columns = ", ".join(f"ADD COLUMN IF NOT EXISTS {c} text" for c in TYPED_COLUMNS)
+    assignments = " ".join(f"NEW.{c} := NEW.cmetadata->>'{c}';" for c in TYPED_COLUMNS)
+    return [
+        f"ALTER TABLE {EMBEDDING_TABLE} {columns}",
+        f"""
+        CREATE OR REPLACE FUNCTION {TYPED_COLUMNS_TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            {assignments}
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        typed_columns_trigger_sql(EMBEDDING_TABLE),
+    ]
+
+
+def typed_columns_trigger_sql(table: str) -> str:
+    return (
+        f"DROP TRIGGER IF EXISTS {TYPED_COLUMNS_TRIGGER} ON {table}; "
+        f"CREATE TRIGGER {TYPED_COLUMNS_TRIGGER} "
+        f"BEFORE INSERT OR UPDATE OF cmetadata ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {TYPED_COLUMNS_TRIGGER}()"
+    )
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def partition_sql(
+    key: str,
+    method: str = "hash",
+    partitions: int = 16,
+    values: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    DDL of the partitioned copy. The key is the `cmetadata` expression rather
+    than the typed column, which BEFORE triggers may not set on routed rows.
+    """
+    statements = [
+        f"CREATE TABLE {PARTITIONED_TABLE} (LIKE {EMBEDDING_TABLE} INCLUDING DEFAULTS) "
+        f"PARTITION BY {method.upper()} ((cmetadata->>'{key}'))",
+        f"ALTER TABLE {PARTITIONED_TABLE} ADD FOREIGN KEY (collection_id) "
+        f"REFERENCES {COLLECTION_TABLE} (uuid) ON DELETE CASCADE",
+    ]
+    if method == "hash":
+        statements += [
+            f"CREATE TABLE {PARTITIONED_TABLE}_{i} PARTITION OF {PARTITIONED_TABLE} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+            for i in range(partitions)
+        ]
+    elif method == "list":
+        statements += [
+            f"CREATE TABLE {PARTITIONED_TABLE}_{i} PARTITION OF {PARTITIONED_TABLE} "
+            f"FOR VALUES IN ({_literal(value)})"
+            for i, value in enumerate(values or [])
+        ]
+        statements.append(
+            f"CREATE TABLE {PARTITIONED_TABLE}_default "
+            f"PARTITION OF {PARTITIONED_TABLE} DEFAULT"
+        )
+    else:
+        raise ValueError(f"Unsupported partitioning method: {method}")
+    # Unique indexes cannot cover an expression partition key, so uuid is a plain index
+    statements.append(
+        f"CREATE INDEX {PARTITIONED_TABLE}_uuid ON {PARTITIONED_TABLE} (uuid)"
+    )
+    return statements
+
+
+def mirror_trigger_sql() -> List[str]:
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {MIRROR_TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {PARTITIONED_TABLE} WHERE uuid = OLD.uuid;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {PARTITIONED_TABLE} SELECT NEW.*;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        f"CREATE TRIGGER {MIRROR_TRIGGER} AFTER INSERT OR UPDATE OR DELETE "
+        f"ON {EMBEDDING_TABLE} FOR EACH ROW EXECUTE FUNCTION {MIRROR_TRIGGER}()",
+    ]
+
+
+def catalog_backfill_sql() -> str:
+    """
+    Catalog rows of the files after `$1` in custom_id order, at most `$2`
+    of them, recomputed from all their chunks and replacing existing rows.
+    """
+    return f"""
+        WITH batch AS (
+            SELECT DISTINCT custom_id FROM {EMBEDDING_TABLE}
+            WHERE custom_id > $1
+            ORDER BY custom_id LIMIT $2
+        )
+        INSERT INTO {FILE_CATALOG_TABLE} AS catalog (
+            collection_id, file_id, user_id, chunk_count, byte_size,
+            content_hash, created_at, updated_at
+        )
+        SELECT e.collection_id, e.custom_id, max(e.cmetadata->>'user_id'), count(*),
+            coalesce(sum(octet_length(e.document)), 0),
+            md5(string_agg(coalesce(
+                e.cmetadata->>'digest', md5(coalesce(e.document, ''))
+            ), '')),
+            now(), now()
+        FROM {EMBEDDING_TABLE} e JOIN batch USING (custom_id)
+        GROUP BY e.collection_id, e.custom_id
+        ON CONFLICT (collection_id, file_id) DO UPDATE SET
+            user_id = coalesce(catalog.user_id, EXCLUDED.user_id),
+            chunk_count = EXCLUDED.chunk_count,
+            byte_size = EXCLUDED.byte_size,
+            content_hash = EXCLUDED.content_hash,
+            updated_at = EXCLUDED.updated_at
+        RETURNING catalog.file_id
+    """
+
+
+async def _has_typed_columns(conn) -> bool:
+    count = await conn.fetchval(
+        "SELECT count(*) FROM information_schema.columns "
+        "WHERE table_name = $1 AND column_name = ANY($2::text[])",
+        EMBEDDING_TABLE,
+        list(TYPED_COLUMNS),
+    )
+    return count == len(TYPED_COLUMNS)
+
+
+async def migrate_typed_columns(batch_size: int = 5000) -> None:
+    from app.config import logger
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        for statement in typed_columns_sql():
+            await conn.execute(statement)
+
+        # Keyset over the primary key keeps each batch short and index driven
+        last, total = FIRST_UUID, 0
+        while True:
+            rows = await conn.fetch(
+                f"""
+                WITH batch AS (
+                    SELECT uuid FROM {EMBEDDING_TABLE}
+                    WHERE uuid > $1
+                    ORDER BY uuid LIMIT $2
+                )
+                UPDATE {EMBEDDING_TABLE} e
+                SET file_id = e.cmetadata->>'file_id', user_id = e.cmetadata->>'user_id'
+                FROM batch WHERE e.uuid = batch.uuid
+                RETURNING e.uuid
+                """,
+                last,
+                batch_size,
+            )
+            if not rows:
+                break
+            last = max(row["uuid"] for row in rows)
+            total += len(rows)
+            logger.info(f"Backfilled typed columns of {total} embeddings")
+
+        for name, columns in TYPED_INDEXES.items():
+            await conn.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {EMBEDDING_TABLE} {columns}"
+            )
+        await conn.execute(f"ANALYZE {EMBEDDING_TABLE}")
+    logger.info("Typed columns are ready, set PGVECTOR_TYPED_COLUMNS=True")
+
+
+async def backfill_file_catalog(batch_size: int = 5000) -> None:
+    from app.config import logger
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            for statement in create_catalog_sql():
+                await conn.execute(statement)
+
+        last, total = "", 0
+        while True:
+            rows = await conn.fetch(catalog_backfill_sql(), last, batch_size)
+            if not rows:
+                break
+            last = max(row["file_id"] for row in rows)
+            total += len(rows)
+            logger.info(f"Backfilled the catalog entries of {total} files")
+        # Lookups stop falling back to the chunks of collections marked complete
+        await conn.execute(
+            f"UPDATE {COLLECTION_TABLE} SET cmetadata = "
+            "(coalesce(cmetadata::jsonb, '{}'::jsonb) "
+            "|| jsonb_build_object($1::text, true))::json",
+            CATALOG_COMPLETE_KEY,
+        )
+    logger.info("File catalog is ready")
+
+
+async def partition(
+    key: str,
+    method: str = "hash",
+    partitions: int = 16,
+    values: Optional[List[str]] = None,
+    batch_size: int = 5000,
+) -> None:
+    from app.config import logger
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        if await conn.fetchval(
+            "SELECT pg_get_partkeydef(to_regclass($1))", EMBEDDING_TABLE
+        ):
+            raise SystemExit(f"{EMBEDDING_TABLE} is already partitioned")
+        typed = await _has_typed_columns(conn)
+
+        async with conn.transaction():
+            for statement in partition_sql(key, method, partitions, values):
+                await conn.execute(statement)
+            for statement in mirror_trigger_sql():
+                await conn.execute(statement)
+
+        # Rows are locked while copied, so a concurrent delete waits for the copy
+        # and its mirrored delete then removes the copied row
+        last, total = FIRST_UUID, 0
+        while True:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    f"""
+                    WITH batch AS (
+                        SELECT * FROM {EMBEDDING_TABLE}
+                        WHERE uuid > $1
+                        ORDER BY uuid LIMIT $2 FOR SHARE
+                    ), copied AS (
+                        INSERT INTO {PARTITIONED_TABLE}
+                        SELECT * FROM batch b WHERE NOT EXISTS (
+                            SELECT 1 FROM {PARTITIONED_TABLE} p WHERE p.uuid = b.uuid
+                        )
+                    )
+                    SELECT uuid FROM batch
+                    """,
+                    last,
+                    batch_size,
+                )
+            if not rows:
+                break
+            last = max(row["uuid"] for row in rows)
+            total += len(rows)
+            logger.info(f"Copied {total} embeddings into {PARTITIONED_TABLE}")
+
+        indexes = dict(BASE_INDEXES)
+        if typed:
+            indexes.update(TYPED_INDEXES)
+            await conn.execute(typed_columns_trigger_sql(PARTITIONED_TABLE))
+        for name, columns in indexes.items():
+            await conn.execute(
+                f"CREATE INDEX {name}_new ON {PARTITIONED_TABLE} {columns}"
+            )
+        renamed = list(indexes)
+        for collection_id, metadata in await conn.fetch(
+            f"SELECT uuid, cmetadata FROM {COLLECTION_TABLE}"
+        ):
+            metadata = json.loads(metadata) if isinstance(metadata, str) else metadata
+            settings = storage_settings(metadata)
+            if settings:
+                name = index_name(settings["type"], collection_id)
+                renamed.append(name)
+                await conn.execute(
+                    create_index_sql(
+                        settings["type"],
+                        settings["dimensions"],
+                        collection_id,
+                        distance_strategy(metadata),
+                        table=PARTITIONED_TABLE,
+                        name=f"{name}_new",
+                        concurrently=False,
+                    )
+                )
+        await conn.execute(f"ANALYZE {PARTITIONED_TABLE}")
+
+        async with conn.transaction():
+            await conn.execute(f"LOCK TABLE {EMBEDDING_TABLE} IN ACCESS EXCLUSIVE MODE")
+            await conn.execute(f"DROP TRIGGER {MIRROR_TRIGGER} ON {EMBEDDING_TABLE}")
+            await conn.execute(f"DROP FUNCTION {MIRROR_TRIGGER}()")
+            await conn.execute(
+                f"ALTER TABLE {EMBEDDING_TABLE} RENAME TO {BACKUP_TABLE}"
+            )
+            await conn.execute(
+                f"ALTER TABLE {PARTITIONED_TABLE} RENAME TO {EMBEDDING_TABLE}"
+            )
+            for name in renamed:
+                await conn.execute(
+                    f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_unpartitioned"
+                )
+                await conn.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+    logger.info(
+        f"{EMBEDDING_TABLE} is now partitioned by {key}; "
+        f"the previous table was kept as {BACKUP_TABLE}"
+    )
+
+
+def main(argv=None) -> None:
+    from app.services.database import PSQLDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser(
+        "migrate", help="add typed file_id/user_id columns"
+    )
+    catalog_parser = commands.add_parser("catalog", help="backfill the file catalog")
+    partition_parser = commands.add_parser(
+        "partition", help="partition the embedding table"
+    )
+    partition_parser.add_argument("--by", choices=TYPED_COLUMNS, default="file_id")
+    partition_parser.add_argument("--method", choices=("hash", "list"), default="hash")
+    partition_parser.add_argument("--partitions", type=int, default=16)
+    partition_parser.add_argument(
+        "--values",
+        type=lambda value: value.split(","),
+        default=[],
+        help="comma separated keys given their own list partition",
+    )
+    for command in (migrate_parser, catalog_parser, partition_parser):
+        command.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            if args.command == "migrate":
+                await migrate_typed_columns(args.batch_size)
+            elif args.command == "catalog":
+                await backfill_file_catalog(args.batch_size)
+            else:
+                await partition(
+                    args.by, args.method, args.partitions, args.values, args.batch_size
+                )
+        finally:
+            await PSQLDatabase.close_pool()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Quantized storage and search parameters of Qdrant collections.
+
+Qdrant can keep a quantized copy of each vector in RAM, `scalar` (int8, 1/4 of
+the size) or `binary` (one bit per dimension, 1/32), while the original vectors
+move to disk. Searches run on the quantized vectors, fetch `oversampling` times
+more candidates, and rescore them with the originals.
+
+Create or update a collection, then compare recall@k and latency of each
+storage mode and search configuration, on vectors sampled from a collection
+or random ones in qdrant_client's embedded mode:
+
+    python -m app.services.vector_store.qdrant_quantization configure \
+        --quantization scalar --on-disk
+    python -m app.services.vector_store.qdrant_quantization benchmark \
+        --hnsw-ef 64 128 --oversampling 1 2 4
+    python -m app.services.vector_store.qdrant_quantization benchmark \
+        --location :memory: --synthetic 20000
+"""
+
+import time
+import argparse
+import itertools
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.services.vector_store.quantization import _percentile
+
+NONE = "none"
+SCALAR = "scalar"
+BINARY = "binary"
+QUANTIZATION_MODES = (NONE, SCALAR, BINARY)
+
+
+def quantization_config(mode: str, always_ram: bool = True):
+    """Qdrant quantization config of a storage mode, Disabled for `none`."""
+    from qdrant_client.http import models
+
+    if mode == SCALAR:
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram
+            )
+        )
+    if mode == BINARY:
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    if mode == NONE:
+        return models.Disabled.DISABLED
+    raise ValueError(f"Unsupported Qdrant quantization: {mode}")
+
+
+def search_params(
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+    rescore: Optional[bool] = None,
+    oversampling: Optional[float] = None,
+):
+    """SearchParams with the given settings, None when all are defaults."""
+    from qdrant_client.http import models
+
+    quantization = None
+    if rescore is not None or oversampling is not None:
+        quantization = models.QuantizationSearchParams(
+            rescore=rescore, oversampling=oversampling
+        )
+    if hnsw_ef is None and not exact and quantization is None:
+        return None
+    return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+def configure_collection(
+    client,
+    collection_name: str,
+    quantization: str,
+    on_disk: bool = False,
+    dimensions: Optional[int] = None,
+    always_ram: bool = True,
+) -> None:
+    """
+    Create a cosine collection of `dimensions` with the given storage, or
+    switch an existing one; Qdrant rebuilds its segments in the background.
+    """
+    from qdrant_client.http import models
+
+    config = quantization_config(quantization, always_ram)
+    if not client.collection_exists(collection_name):
+        if not dimensions:
+            raise SystemExit(
+                f"Collection {collection_name!r} does not exist, "
+                "pass --dimensions to create it"
+            )
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(
+                size=dimensions, distance=models.Distance.COSINE, on_disk=on_disk
+            ),
+            quantization_config=None if quantization == NONE else config,
+        )
+        return
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=on_disk)},
+        quantization_config=config,
+    )
+
+
+def sample_vectors(client, collection_name: str, sample: int) -> np.ndarray:
+    """Up to `sample` vectors of a collection, in point id order."""
+    vectors, offset = [], None
+    while len(vectors) < sample:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=min(1000, sample - len(vectors)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        for point in points:
+            vector = point.vector
+            vectors.append(
+                next(iter(vector.values())) if isinstance(vector, dict) else vector
+            )
+        if offset is None:
+            break
+    if not vectors:
+        raise SystemExit(f"Collection {collection_name!r} is empty")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _wait_for_index(client, collection_name: str, timeout: float = 600) -> None:
+    from qdrant_client.http import models
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (
+            client.get_collection(collection_name).status
+            == models.CollectionStatus.GREEN
+        ):
+            return
+        time.sleep(0.5)
+
+
+def benchmark(
+    client,
+    vectors: np.ndarray,
+    modes: Sequence[str] = QUANTIZATION_MODES,
+    hnsw_efs: Sequence[Optional[int]] = (None,),
+    oversamplings: Sequence[Optional[float]] = (None,),
+    rescore: bool = True,
+    on_disk: bool = False,
+    queries: int = 100,
+    k: int = 10,
+) -> dict:
+    """
+    Recall@k against an exact search and latencies of every storage mode and
+    search configuration. The vectors are copied into a scratch collection per
+    mode, with sampled rows as queries.
+    """
+    from qdrant_client.http import models
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    normalized = vectors / np.clip(
+        np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None
+    )
+    exact = [
+        set(np.argsort(-(normalized @ normalized[i]))[:k].tolist()) for i in sample
+    ]
+
+    report = {}
+    for mode in modes:
+        collection_name = f"quantization_benchmark_{mode}"
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        configure_collection(
+            client, collection_name, mode, on_disk, dimensions=vectors.shape[1]
+        )
+        try:
+            for start in range(0, len(vectors), 1000):
+                client.upsert(
+                    collection_name=collection_name,
+                    points=models.Batch(
+                        ids=list(range(start, min(start + 1000, len(vectors)))),
+                        vectors=vectors[start : start + 1000].tolist(),
+                    ),
+                )
+            _wait_for_index(client, collection_name)
+            for hnsw_ef, oversampling in itertools.product(
+                hnsw_efs, oversamplings if mode != NONE else (None,)
+            ):
+                params = search_params(
+                    hnsw_ef,
+                    rescore=rescore if mode != NONE else None,
+                    oversampling=oversampling,
+                )
+                latencies, hits = [], 0
+                for i, expected in zip(sample, exact):
+                    start = time.perf_counter()
+                    results = client.search(
+                        collection_name=collection_name,
+                        query_vector=vectors[i].tolist(),
+                        limit=k,
+                        search_params=params,
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    hits += len(expected & {result.id for result in results})
+                report[(mode, hnsw_ef, oversampling)] = {
+                    "recall": hits / max(1, sum(len(expected) for expected in exact)),
+                    "p50_ms": _percentile(latencies, 0.5),
+                    "p95_ms": _percentile(latencies, 0.95),
+                }
+        finally:
+            client.delete_collection(collection_name)
+    return report
+
+
+def main(argv=None) -> None:
+    from qdrant_client import QdrantClient
+    from app.config import QDRANT_API_KEY, QDRANT_COLLECTION_NAME, QDRANT_URL
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    configure_parser = commands.add_parser(
+        "configure", help="create or update a collection's vector storage"
+    )
+    configure_parser.add_argument(
+        "--quantization", choices=QUANTIZATION_MODES, required=True
+    )
+    configure_parser.add_argument(
+        "--on-disk", action="store_true", help="keep the original vectors on disk"
+    )
+    configure_parser.add_argument(
+        "--no-always-ram",
+        dest="always_ram",
+        action="store_false",
+        help="let quantized vectors be paged out too",
+    )
+    configure_parser.add_argument("--dimensions", type=int, default=None)
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="compare recall and latency of storage modes"
+    )
+    benchmark_parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=QUANTIZATION_MODES,
+        default=list(QUANTIZATION_MODES),
+    )
+    benchmark_parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[None])
+    benchmark_parser.add_argument(
+        "--oversampling", type=float, nargs="+", default=[None]
+    )
+    benchmark_parser.add_argument("--no-rescore", dest="rescore", action="store_false")
+    benchmark_parser.add_argument("--on-disk", action="store_true")
+    benchmark_parser.add_argument("--sample", type=int, default=20000)
+    benchmark_parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="benchmark this many random vectors instead of sampling the collection",
+    )
+    benchmark_parser.add_argument("--dimensions", type=int, default=1536)
+    benchmark_parser.add_argument("--queries", type=int, default=100)
+    benchmark_parser.add_argument("--k", type=int, default=10)
+    for command in (configure_parser, benchmark_parser):
+        command.add_argument("--collection", default=QDRANT_COLLECTION_NAME)
+        command.add_argument(
+            "--location", default=None, help="e.g. :memory: for the embedded mode"
+        )
+    args = parser.parse_args(argv)
+
+    if args.location:
+        client = QdrantClient(location=args.location)
+    else:
+        client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+    if args.command == "configure":
+        configure_collection(
+            client,
+            args.collection,
+            args.quantization,
+            args.on_disk,
+            args.dimensions,
+            args.always_ram,
+        )
+        return
+
+    if args.synthetic:
+        vectors = (
+            np.random.default_rng(0)
+            .standard_normal((args.synthetic, args.dimensions))
+            .astype(np.float32)
+        )
+    else:
+        vectors = sample_vectors(client, args.collection, args.sample)
+    report = benchmark(
+        client,
+        vectors,
+        args.modes,
+        args.hnsw_ef,
+        args.oversampling,
+        args.rescore,
+        args.on_disk,
+        args.queries,
+        args.k,
+    )
+    print(
+        f"{'mode':<8}{'hnsw_ef':>9}{'oversampling':>14}{'recall@' + str(args.k):>12}"
+        f"{'p50 ms':>10}{'p95 ms':>10}"
+    )
+    for (mode, hnsw_ef, oversampling), row in report.items():
+        print(
+            f"{mode:<8}{str(hnsw_ef or '-'):>9}{str(oversampling or '-'):>14}"
+            f"{row['recall']:>12.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,266 +1,664 @@
-import copy
+import asyncio
+import uuid
 from typing import Any, List, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from langchain_core.runnables.config import run_in_executor
 from langchain_qdrant import Qdrant
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 import logging
 
+from .qdrant_quantization import search_params as build_search_params
+from .file_catalog import (
+    CATALOG_COMPLETE_KEY,
+    CHUNK_INDEX_KEY,
+    catalog_point_id,
+    chunk_order,
+    merge_entry,
+    page_ids,
+    page_of,
+    summarize_chunks,
+)
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Payload fields every filter of the API matches on
+INDEXED_FIELDS = ("file_id", "user_id")
+# Catalog point recording whether the catalog covers every stored file; no
+# file's point id is the nil UUID
+CATALOG_STATE_POINT = str(uuid.UUID(int=0))
+
+
+async def gather_all(*coroutines) -> list:
+    """asyncio.gather that cancels the remaining requests when one fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
 
 class QdrantVector(Qdrant):
+    """
+    Qdrant vector store with the async method surface of AsyncPgVector.
+
+    Requests go through an AsyncQdrantClient (over gRPC with `prefer_grpc`), so
+    they do not block the event loop; the `executor` arguments only run
+    embedding calls. The synchronous client serves langchain's sync methods and
+    the startup setup, which creates the file catalog collection and keyword
+    payload indexes on `file_id` and `user_id`.
+    """
+
     def __init__(self, url: str, api_key: Optional[str], collection_name: str,
-                 embeddings: Embeddings):
+                 embeddings: Embeddings, prefer_grpc: bool = False,
+                 upsert_batch_size: int = 256, upsert_parallelism: int = 4,
+                 scroll_page_size: int = 10000, scan_shards: int = 8,
+                 search_defaults: Optional[dict] = None):
         # Log the initialization parameters
-        logger.debug(f"QdrantVector.__init__ called with url={url}, api_key={api_key}, collection_name={collection_name}")
-        
-        # Create a QdrantClient instance
+        logger.debug(f"QdrantVector.__init__ called with url={url}, collection_name={collection_name}, prefer_grpc={prefer_grpc}")
+
+        # Create the sync and async client instances
         try:
-            client = QdrantClient(url=url, api_key=api_key)
-            logger.debug(f"QdrantClient created successfully with url={url}")
+            client = QdrantClient(url=url, api_key=api_key, prefer_grpc=prefer_grpc)
+            async_client = AsyncQdrantClient(
+                url=url, api_key=api_key, prefer_grpc=prefer_grpc
+            )
+            logger.debug(f"Qdrant clients created successfully with url={url}")
         except Exception as e:
-            logger.error(f"Failed to create QdrantClient: {e}")
+            logger.error(f"Failed to create Qdrant clients: {e}")
             raise
-        
+
         # Initialize Qdrant client and connection
         try:
             super().__init__(
                 client=client,
                 collection_name=collection_name,
-                embeddings=embeddings
+                embeddings=embeddings,
+                async_client=async_client,
             )
             logger.debug("QdrantVector parent class initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Qdrant parent class: {e}")
             raise
-            
+
         # Store attributes
         self.url = url
         self.api_key = api_key
         self.collection_name = collection_name
-        # Store the client explicitly for our custom methods
+        # Store the clients explicitly for our custom methods
         self.client = client
-        
+        self.async_client = async_client
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_parallelism = upsert_parallelism
+        self.scroll_page_size = scroll_page_size
+        self.scan_shards = scan_shards
+        self.page_attempts = 3
+        # hnsw_ef, rescore and oversampling applied unless a query overrides them
+        self.search_defaults = search_defaults or {}
+        # Distinct values requested from a facet before falling back to a scan
+        self.facet_limit = 100000
+        # Payload-only collection holding one catalog point per file_id
+        self.catalog_collection_name = f"{collection_name}_files"
+        self._catalog_complete = False
+        self._catalog_state_recorded = False
+        # Catalog entries are read, merged and written back under this lock
+        self._catalog_lock = asyncio.Lock()
+        try:
+            if not client.collection_exists(self.catalog_collection_name):
+                client.create_collection(self.catalog_collection_name, vectors_config={})
+        except Exception as e:
+            logger.error(f"Failed to create file catalog collection: {e}")
+            raise
+        self.create_payload_indexes()
+
         # Log successful initialization
         logger.debug("QdrantVector initialized successfully")
-        
-    def add_documents(self, docs: list[Document], ids: list[str]):
-        # Add documents with custom IDs
-        # Convert docs to proper format with metadata
-        # Qdrant expects content to be in 'page_content' field
-        documents_with_ids = []
-        for doc, id in zip(docs, ids):
-            # Create a copy of the document with the id in metadata
-            doc_copy = copy.deepcopy(doc)
-            doc_copy.metadata['file_id'] = id
-            documents_with_ids.append(doc_copy)
-        
-        # Use the parent class method to add documents
-        return super().add_documents(documents_with_ids, ids=ids)
-        
+
+    @property
+    def embedding_function(self) -> Embeddings:
+        return self.embeddings
+
+    def create_payload_indexes(self) -> None:
+        # Keyword indexes let filtered searches, scrolls and deletes skip a full scan
+        from qdrant_client.http.models import PayloadSchemaType
+
+        fields = {
+            self.collection_name: [
+                f"{self.metadata_payload_key}.{field}" for field in INDEXED_FIELDS
+            ],
+            self.catalog_collection_name: list(INDEXED_FIELDS),
+        }
+        for collection_name, field_names in fields.items():
+            if not self.client.collection_exists(collection_name):
+                logger.warning(
+                    f"Qdrant collection {collection_name} does not exist, "
+                    "payload indexes are created once it does and the API restarts"
+                )
+                continue
+            for field_name in field_names:
+                # Creating an existing index is a no-op
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.KEYWORD,
+                )
+
+    def _qdrant_filter(self, filter: Optional[dict]):
+        # Translate the API's metadata filters, including {"$in": [...]}, to Qdrant's
+        from qdrant_client.http.models import Filter, FieldCondition, MatchAny, MatchValue
+
+        if filter is None or isinstance(filter, Filter):
+            return filter
+        conditions = []
+        for key, value in filter.items():
+            if isinstance(value, dict) and "$in" in value:
+                match = MatchAny(any=list(value["$in"]))
+            else:
+                match = MatchValue(value=value)
+            conditions.append(
+                FieldCondition(key=f"{self.metadata_payload_key}.{key}", match=match)
+            )
+        return Filter(must=conditions)
+
+    def _file_id_filter(self, ids: list[str]):
+        return self._qdrant_filter({"file_id": {"$in": ids}})
+
+    async def aadd_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        executor=None,
+        **kwargs,
+    ) -> List[str]:
+        """Embed and store chunks; `ids` are their file_ids, one per chunk."""
+        texts = [doc.page_content for doc in documents]
+        # The file_id goes into a shallow copy of the metadata; the documents are unchanged
+        metadatas = [
+            {**doc.metadata, "file_id": id} for doc, id in zip(documents, ids)
+        ]
+        embeddings = await run_in_executor(
+            executor, self.embeddings.embed_documents, texts
+        )
+        await self.aadd_embeddings(texts, embeddings, metadatas, ids)
+        return ids
+
+    async def aadd_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: List[str],
+        executor=None,
+    ) -> List[str]:
+        # Upsert chunks with precomputed vectors, one point per chunk, in
+        # batches of which up to `upsert_parallelism` are in flight
+        from qdrant_client.http.models import PointStruct
+
+        payloads = self._build_payloads(
+            texts, metadatas, self.content_payload_key, self.metadata_payload_key
+        )
+        point_ids = [uuid.uuid4().hex for _ in texts]
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=(
+                    embedding
+                    if self.vector_name is None
+                    else {self.vector_name: embedding}
+                ),
+                payload=payload,
+            )
+            for point_id, embedding, payload in zip(point_ids, embeddings, payloads)
+        ]
+        semaphore = asyncio.Semaphore(self.upsert_parallelism)
+
+        async def upsert(batch):
+            async with semaphore:
+                await self.async_client.upsert(
+                    collection_name=self.collection_name, points=batch
+                )
+
+        await self._record_catalog_state()
+        await gather_all(
+            *(
+                upsert(points[start : start + self.upsert_batch_size])
+                for start in range(0, len(points), self.upsert_batch_size)
+            )
+        )
+        await self._add_to_catalog(summarize_chunks(texts, metadatas, ids))
+        return point_ids
+
+    async def catalog_complete(self) -> bool:
+        """Whether the catalog holds every file; a complete catalog stays so."""
+        if not self._catalog_complete:
+            points = await self.async_client.retrieve(
+                collection_name=self.catalog_collection_name,
+                ids=[CATALOG_STATE_POINT],
+                with_payload=True,
+            )
+            self._catalog_complete = any(
+                (point.payload or {}).get(CATALOG_COMPLETE_KEY) for point in points
+            )
+        return self._catalog_complete
+
+    async def _record_catalog_state(self) -> None:
+        # On the first ingest, the catalog is complete if no chunk predates it
+        from qdrant_client.http.models import PointStruct
+
+        if self._catalog_state_recorded:
+            return
+        state = await self.async_client.retrieve(
+            collection_name=self.catalog_collection_name, ids=[CATALOG_STATE_POINT]
+        )
+        if not state:
+            chunks = await self.async_client.count(
+                collection_name=self.collection_name, exact=False
+            )
+            await self.async_client.upsert(
+                collection_name=self.catalog_collection_name,
+                points=[
+                    PointStruct(
+                        id=CATALOG_STATE_POINT,
+                        vector={},
+                        payload={CATALOG_COMPLETE_KEY: chunks.count == 0},
+                    )
+                ],
+            )
+        self._catalog_state_recorded = True
+
+    async def _add_to_catalog(self, deltas: dict) -> None:
+        # Qdrant has no transactions or conditional writes; the catalog is
+        # updated right after the points, one ingest at a time so concurrent
+        # ingests of a file both count
+        from qdrant_client.http.models import PointStruct
+
+        async with self._catalog_lock:
+            current = {
+                point.payload["file_id"]: point.payload
+                for point in await self.async_client.retrieve(
+                    collection_name=self.catalog_collection_name,
+                    ids=[catalog_point_id(file_id) for file_id in deltas],
+                    with_payload=True,
+                )
+            }
+            points = []
+            for file_id, delta in deltas.items():
+                entry = merge_entry(current.get(file_id), delta)
+                entry["created_at"] = str(entry["created_at"])
+                entry["updated_at"] = str(entry["updated_at"])
+                points.append(
+                    PointStruct(id=catalog_point_id(file_id), vector={}, payload=entry)
+                )
+            await self.async_client.upsert(
+                collection_name=self.catalog_collection_name, points=points
+            )
+
+    @staticmethod
+    def _without_internal_fields(
+        results: List[Tuple[Document, float]]
+    ) -> List[Tuple[Document, float]]:
+        # Drop the _id/_collection_name metadata langchain adds to each result
+        return [
+            (
+                Document(
+                    page_content=document.page_content,
+                    metadata={
+                        key: value
+                        for key, value in document.metadata.items()
+                        if not key.startswith("_")
+                    },
+                ),
+                score,
+            )
+            for document, score in results
+        ]
+
+    def _search_params(self, search_params: Optional[dict]):
+        # Per-query settings over the defaults, as Qdrant SearchParams
+        if search_params is not None and not isinstance(search_params, dict):
+            return search_params
+        return build_search_params(**{**self.search_defaults, **(search_params or {})})
+
     def similarity_search_with_score_by_vector(
         self,
         embedding: List[float],
         k: int = 4,
         filter: Optional[dict] = None,
+        search_params: Optional[dict] = None,
         **kwargs: Any,
     ) -> List[Tuple[Document, float]]:
-        # Search with scoring, similar to existing implementations
-        # Qdrant's similarity_search_with_score returns (doc, score) tuples
-        results = self.similarity_search_with_score(
-            query=embedding,
-            k=k,
-            filter=filter,
-            **kwargs
+        # Search with the given vector, without embedding anything
+        return self._without_internal_fields(
+            super().similarity_search_with_score_by_vector(
+                embedding,
+                k=k,
+                filter=self._qdrant_filter(filter),
+                search_params=self._search_params(search_params),
+                **kwargs,
+            )
         )
-        
-        # Process documents to remove any Qdrant-specific metadata
-        processed_documents: List[Tuple[Document, float]] = []
-        for document, score in results:
-            # Make a deep copy to avoid mutating the original document
-            doc_copy = copy.deepcopy(document.__dict__)
-            # Remove Qdrant-specific fields if they exist
-            if "metadata" in doc_copy:
-                # Remove any Qdrant internal fields
-                qdrant_fields = [key for key in doc_copy["metadata"] if key.startswith("_")]
-                for field in qdrant_fields:
-                    del doc_copy["metadata"][field]
-            new_document = Document(**doc_copy)
-            processed_documents.append((new_document, score))
-        return processed_documents
-        
-    def get_all_ids(self) -> list[str]:
-        # Return all unique file_id fields
-        # In Qdrant, we need to scroll through all points and extract file_id
-        try:
-            # Scroll through all points to get unique file_ids
-            file_ids = set()
-            next_page_offset = None
-            
-            while True:
-                try:
-                    response = self.client.scroll(
-                        collection_name=self.collection_name,
-                        limit=100,
-                        offset=next_page_offset,
-                        with_payload=True
+
+    async def asimilarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        executor=None,
+        search_params: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self._without_internal_fields(
+            await super().asimilarity_search_with_score_by_vector(
+                embedding,
+                k=k,
+                filter=self._qdrant_filter(filter),
+                search_params=self._search_params(search_params),
+                **kwargs,
+            )
+        )
+
+    async def _with_retries(self, request):
+        # A failed page fails the whole listing rather than leaving a silent gap
+        for attempt in range(self.page_attempts):
+            try:
+                return await request()
+            except Exception as e:
+                if attempt + 1 == self.page_attempts:
+                    raise
+                logger.warning(f"Qdrant request failed, retrying: {e}")
+                await asyncio.sleep(0.1 * 2**attempt)
+
+    async def _scan_payloads(self, collection_name: str, field: str) -> list[dict]:
+        """
+        Payloads restricted to `field` of every point of a collection, without
+        vectors. Scroll pages follow each other, so the point id space is split
+        into `scan_shards` ranges scrolled concurrently; point ids are UUIDs
+        (random or derived from file_ids) and spread evenly across them.
+        """
+        bounds = [
+            str(uuid.UUID(int=shard * 2**128 // self.scan_shards))
+            for shard in range(self.scan_shards)
+        ] + [None]
+
+        async def scan(start: str, end: Optional[str]) -> list[dict]:
+            payloads, offset = [], start
+            while offset is not None:
+                points, offset = await self._with_retries(
+                    lambda: self.async_client.scroll(
+                        collection_name=collection_name,
+                        limit=self.scroll_page_size,
+                        offset=offset,
+                        with_payload=[field],
+                        with_vectors=False,
                     )
-                    
-                    # Extract file_id from each point's payload
-                    for point in response[0]:
-                        if hasattr(point.payload, 'file_id'):
-                            file_ids.add(point.payload.file_id)
-                        elif isinstance(point.payload, dict) and 'file_id' in point.payload:
-                            file_ids.add(point.payload['file_id'])
-                    
-                    # Check if there are more points
-                    next_page_offset = response[1]
-                    if next_page_offset is None:
-                        break
-                except Exception as scroll_error:
-                    logger.error(f"Error scrolling through Qdrant collection: {scroll_error}")
+                )
+                for point in points:
+                    if end is not None and str(point.id) >= end:
+                        return payloads
+                    if point.payload:
+                        payloads.append(point.payload)
+                if end is not None and offset is not None and str(offset) >= end:
                     break
-                    
-            logger.debug(f"Retrieved {len(file_ids)} unique file IDs")
-            return list(file_ids)
-        except Exception as e:
-            logger.error(f"Error in get_all_ids: {e}")
-            # Fallback: return empty list if we can't retrieve all IDs
-            return []
-        
-    def get_filtered_ids(self, ids: list[str]) -> list[str]:
-        # Return unique file_id fields filtered by provided ids
-        try:
-            from qdrant_client.http.models import Filter, FieldCondition, MatchAny
-            
-            # Create a filter to find points with file_id in the provided list
-            qdrant_filter = Filter(
-                must=[
-                    FieldCondition(
-                        key="file_id",
-                        match=MatchAny(any=ids)
+            return payloads
+
+        shards = await gather_all(
+            *(scan(start, end) for start, end in zip(bounds, bounds[1:]))
+        )
+        return [payload for shard in shards for payload in shard]
+
+    async def count_chunks(self, ids: list[str]) -> dict[str, int]:
+        """Number of chunks stored for each of the given file_ids, 0 when none."""
+        counts = dict.fromkeys(ids, 0)
+        if not ids:
+            return counts
+        if hasattr(self.async_client, "facet"):
+            # Qdrant 1.12+ counts the distinct values of an indexed field in one request
+            try:
+                response = await self.async_client.facet(
+                    collection_name=self.collection_name,
+                    key=f"{self.metadata_payload_key}.file_id",
+                    facet_filter=self._file_id_filter(ids),
+                    limit=len(ids),
+                    exact=True,
+                )
+                counts.update({hit.value: hit.count for hit in response.hits})
+                return counts
+            except Exception as e:
+                logger.debug(f"Qdrant facet request failed, counting per file: {e}")
+        results = await gather_all(
+            *(
+                self._with_retries(
+                    lambda file_id=file_id: self.async_client.count(
+                        collection_name=self.collection_name,
+                        count_filter=self._qdrant_filter({"file_id": file_id}),
+                        exact=True,
                     )
-                ]
+                )
+                for file_id in ids
             )
-            
-            # Scroll through points with the filter
-            file_ids = set()
-            next_page_offset = None
-            
-            while True:
-                try:
-                    response = self.client.scroll(
-                        collection_name=self.collection_name,
-                        limit=100,
-                        offset=next_page_offset,
-                        with_payload=True,
-                        scroll_filter=qdrant_filter
+        )
+        counts.update({file_id: result.count for file_id, result in zip(ids, results)})
+        return counts
+
+    async def _chunk_file_ids(self) -> list[str]:
+        # Distinct file_ids of the chunks, for collections ingested before the catalog
+        key = f"{self.metadata_payload_key}.file_id"
+        if hasattr(self.async_client, "facet"):
+            try:
+                response = await self.async_client.facet(
+                    collection_name=self.collection_name,
+                    key=key,
+                    limit=self.facet_limit,
+                    exact=True,
+                )
+                # A full page may have left values out
+                if len(response.hits) < self.facet_limit:
+                    return [hit.value for hit in response.hits]
+            except Exception as e:
+                logger.debug(f"Qdrant facet request failed, scrolling file_ids: {e}")
+        payloads = await self._scan_payloads(self.collection_name, key)
+        return list(
+            {
+                (payload.get(self.metadata_payload_key) or {}).get("file_id")
+                for payload in payloads
+            }
+            - {None}
+        )
+
+    async def get_all_ids(
+        self, limit: Optional[int] = None, after: Optional[str] = None, executor=None
+    ) -> list[str]:
+        # Return file_ids from the catalog, which holds one point per file
+        file_ids = [
+            payload["file_id"]
+            for payload in await self._scan_payloads(
+                self.catalog_collection_name, "file_id"
+            )
+        ]
+        if not await self.catalog_complete():
+            # Files stored before the catalog are only found among the chunks
+            file_ids = set(file_ids).union(await self._chunk_file_ids())
+        logger.debug(f"Retrieved {len(file_ids)} unique file IDs")
+        # Keyword payloads cannot be ordered server side
+        return page_ids(file_ids, limit, after)
+
+    async def get_filtered_ids(self, ids: list[str], executor=None) -> list[str]:
+        # Return the provided ids present in the catalog, by point id lookups in
+        # concurrent batches; until the catalog is complete, ids it lacks are
+        # counted among the chunks, which may predate it
+        batches = await gather_all(
+            *(
+                self._with_retries(
+                    lambda batch=ids[start : start + self.scroll_page_size]: (
+                        self.async_client.retrieve(
+                            collection_name=self.catalog_collection_name,
+                            ids=[catalog_point_id(file_id) for file_id in batch],
+                            with_payload=["file_id"],
+                        )
                     )
-                    
-                    # Extract file_id from each point's payload
-                    for point in response[0]:
-                        if hasattr(point.payload, 'file_id'):
-                            file_ids.add(point.payload.file_id)
-                        elif isinstance(point.payload, dict) and 'file_id' in point.payload:
-                            file_ids.add(point.payload['file_id'])
-                    
-                    # Check if there are more points
-                    next_page_offset = response[1]
-                    if next_page_offset is None:
-                        break
-                except Exception as scroll_error:
-                    logger.error(f"Error scrolling through Qdrant collection with filter: {scroll_error}")
-                    break
-                    
-            logger.debug(f"Retrieved {len(file_ids)} filtered file IDs")
-            return list(file_ids)
-        except Exception as e:
-            logger.error(f"Error in get_filtered_ids: {e}")
-            # Fallback: return empty list if we can't retrieve filtered IDs
-            return []
-        
-    def get_documents_by_ids(self, ids: list[str]) -> list[Document]:
+                )
+                for start in range(0, len(ids), self.scroll_page_size)
+            )
+        )
+        found = {
+            point.payload["file_id"]
+            for points in batches
+            for point in points
+            if point.payload
+        }
+        missing = [file_id for file_id in dict.fromkeys(ids) if file_id not in found]
+        if missing and not await self.catalog_complete():
+            counts = await self.count_chunks(missing)
+            found.update(file_id for file_id, count in counts.items() if count)
+        file_ids = [file_id for file_id in dict.fromkeys(ids) if file_id in found]
+        logger.debug(f"Retrieved {len(file_ids)} filtered file IDs")
+        return file_ids
+
+    async def get_file_catalog(self, ids: list[str], executor=None) -> list[dict]:
+        points = await self.async_client.retrieve(
+            collection_name=self.catalog_collection_name,
+            ids=[catalog_point_id(file_id) for file_id in ids],
+            with_payload=True,
+        )
+        return [point.payload for point in points if point.payload]
+
+    async def fetch_documents_by_filter(
+        self, qdrant_filter
+    ) -> Tuple[list[Document], set]:
+        # Scroll the chunks matching a filter without their vectors
+        documents, file_ids = [], set()
+        next_page_offset = None
+        while True:
+            points, next_page_offset = await self.async_client.scroll(
+                collection_name=self.collection_name,
+                limit=256,
+                offset=next_page_offset,
+                with_payload=True,
+                with_vectors=False,
+                scroll_filter=qdrant_filter
+            )
+            for point in points:
+                payload = point.payload
+                if not isinstance(payload, dict):
+                    continue
+                content = payload.get(self.content_payload_key, '')
+                metadata = payload.get(self.metadata_payload_key)
+                if not isinstance(metadata, dict):
+                    # Points written with a flat payload
+                    metadata = {k: v for k, v in payload.items() if k != self.content_payload_key}
+                file_ids.add(metadata.get("file_id"))
+                documents.append(Document(page_content=content, metadata=metadata))
+            if next_page_offset is None:
+                break
+        logger.debug(f"Retrieved {len(documents)} documents")
+        return documents, file_ids
+
+    async def fetch_documents_by_ids(
+        self, ids: list[str], executor=None
+    ) -> Tuple[list[Document], list[str]]:
+        # Chunks of the given file_ids without their vectors, and the ids without any
+        documents, found = await self.fetch_documents_by_filter(
+            self._file_id_filter(ids)
+        )
+        return documents, [id for id in dict.fromkeys(ids) if id not in found]
+
+    async def get_file_chunks(
+        self,
+        file_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        executor=None,
+    ) -> list[Document]:
+        # Chunks of one file in ordinal order, within the given chunk and page ranges
+        from qdrant_client.http.models import FieldCondition, Range
+
+        qdrant_filter = self._qdrant_filter({"file_id": file_id})
+        if start is not None or end is not None:
+            qdrant_filter.must.append(
+                FieldCondition(
+                    key=f"{self.metadata_payload_key}.{CHUNK_INDEX_KEY}",
+                    range=Range(gte=start, lt=end),
+                )
+            )
+        if page_start is not None or page_end is not None:
+            qdrant_filter.must.append(
+                FieldCondition(
+                    key=f"{self.metadata_payload_key}.page",
+                    range=Range(gte=page_start, lte=page_end),
+                )
+            )
+        documents, _ = await self.fetch_documents_by_filter(qdrant_filter)
+        # Scroll order is by point id, so ordinals are sorted client side
+        documents.sort(key=lambda document: chunk_order(document.metadata))
+        return page_of(documents, offset, limit)
+
+    async def get_documents_by_ids(self, ids: list[str], executor=None) -> list[Document]:
         # Return documents filtered by file_id
         try:
-            from qdrant_client.http.models import Filter, FieldCondition, MatchAny
-            
-            # Create a filter to find points with file_id in the provided list
-            qdrant_filter = Filter(
-                must=[
-                    FieldCondition(
-                        key="file_id",
-                        match=MatchAny(any=ids)
-                    )
-                ]
-            )
-            
-            # Scroll through points with the filter
-            documents = []
-            next_page_offset = None
-            
-            while True:
-                try:
-                    response = self.client.scroll(
-                        collection_name=self.collection_name,
-                        limit=100,
-                        offset=next_page_offset,
-                        with_payload=True,
-                        scroll_filter=qdrant_filter
-                    )
-                    
-                    # Convert points to Documents
-                    for point in response[0]:
-                        payload = point.payload
-                        if isinstance(payload, dict):
-                            # Extract content and metadata
-                            content = payload.get('page_content', '')
-                            metadata = {k: v for k, v in payload.items() if k != 'page_content'}
-                            documents.append(Document(page_content=content, metadata=metadata))
-                    
-                    # Check if there are more points
-                    next_page_offset = response[1]
-                    if next_page_offset is None:
-                        break
-                except Exception as scroll_error:
-                    logger.error(f"Error scrolling through Qdrant collection for documents: {scroll_error}")
-                    break
-                    
-            logger.debug(f"Retrieved {len(documents)} documents")
-            return documents
+            return (await self.fetch_documents_by_ids(ids))[0]
         except Exception as e:
             logger.error(f"Error in get_documents_by_ids: {e}")
             # Fallback: return empty list if we can't retrieve documents
             return []
-        
-    def delete(self, ids: Optional[list[str]] = None) -> None:
-        # Delete documents by file_id
+
+    async def get_file_embeddings(
+        self, file_id: str, executor=None
+    ) -> Tuple[list, list[Document]]:
+        # Return stored vectors and documents for one file_id, as the search path sees them
+        qdrant_filter = self._qdrant_filter({"file_id": file_id})
+        embeddings, documents = [], []
+        next_page_offset = None
+        while True:
+            points, next_page_offset = await self.async_client.scroll(
+                collection_name=self.collection_name,
+                limit=256,
+                offset=next_page_offset,
+                with_payload=True,
+                with_vectors=True,
+                scroll_filter=qdrant_filter,
+            )
+            for point in points:
+                payload = point.payload or {}
+                vector = point.vector
+                if isinstance(vector, dict):
+                    vector = vector.get(self.vector_name)
+                embeddings.append(vector)
+                documents.append(
+                    Document(
+                        page_content=payload.get(self.content_payload_key, ""),
+                        metadata=payload.get(self.metadata_payload_key) or {},
+                    )
+                )
+            if next_page_offset is None:
+                break
+        return embeddings, documents
+
+    async def delete(
+        self,
+        ids: Optional[list[str]] = None,
+        collection_only: bool = False,
+        executor=None,
+    ) -> None:
+        # Delete documents by file_id; Qdrant collections are always scoped
         if ids is not None:
             try:
-                from qdrant_client.http.models import Filter, FieldCondition, MatchAny
-                
-                # Create a filter to find points with file_id in the provided list
-                qdrant_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="file_id",
-                            match=MatchAny(any=ids)
-                        )
-                    ]
+                await self.async_client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=self._file_id_filter(ids),
                 )
-                
-                # Delete points matching the filter
-                try:
-                    self.client.delete(
-                        collection_name=self.collection_name,
-                        points_selector=qdrant_filter
-                    )
-                    logger.debug(f"Successfully deleted documents with file_ids: {ids}")
-                except Exception as delete_error:
-                    logger.error(f"Error deleting documents from Qdrant: {delete_error}")
+                await self.async_client.delete(
+                    collection_name=self.catalog_collection_name,
+                    points_selector=[catalog_point_id(file_id) for file_id in ids]
+                )
+                logger.debug(f"Successfully deleted documents with file_ids: {ids}")
             except Exception as e:
-                logger.error(f"Error in delete method: {e}")
+                logger.error(f"Error deleting documents from Qdrant: {e}")
                 # Log the error but don't raise it to maintain consistency with other implementations
-                pass
\ No newline at end of file
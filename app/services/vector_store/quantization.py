@@ -0,0 +1,454 @@
+"""
+Quantized vector indexes for pgvector collections.
+
+Every collection shares the `langchain_pg_embedding` table and its full-precision
+`embedding vector` column, so quantization is applied per collection through a
+partial HNSW expression index over `halfvec` or binary-quantized `bit` vectors.
+Searches walk the (2x or 32x smaller) quantized index for an oversampled set of
+candidates, then rescore them against the full-precision vectors, which stay in
+the table: the index is added next to them and does not reduce the table size.
+
+The storage mode of a collection is recorded in its `cmetadata` under
+`vector_storage` by the migration command, and its distance strategy under
+`distance_strategy` (cosine unless set; inner product and L2 rank unit-normalized
+vectors like cosine at a lower cost per comparison):
+
+    python -m app.services.vector_store.quantization migrate --storage halfvec
+    python -m app.services.vector_store.quantization migrate \
+        --storage binary --oversample 8
+    python -m app.services.vector_store.quantization migrate --storage float
+    python -m app.services.vector_store.quantization benchmark --queries 100 --k 10
+    python -m app.services.vector_store.quantization distance --strategy inner
+"""
+
+import time
+import json
+import asyncio
+import argparse
+from typing import List, Optional
+
+import numpy as np
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+COLLECTION_TABLE = "langchain_pg_collection"
+STORAGE_KEY = "vector_storage"
+
+FLOAT = "float"
+HALFVEC = "halfvec"
+BINARY = "binary"
+STORAGE_TYPES = (FLOAT, HALFVEC, BINARY)
+
+# pgvector operator and halfvec operator class per langchain distance strategy
+DISTANCE_OPERATORS = {
+    "cosine": ("<=>", "halfvec_cosine_ops"),
+    "l2": ("<->", "halfvec_l2_ops"),
+    "inner": ("<#>", "halfvec_ip_ops"),
+}
+
+DISTANCE_KEY = "distance_strategy"
+DISTANCE_STRATEGIES = tuple(DISTANCE_OPERATORS)
+# Largest deviation from 1 of the norm of an embedding considered unit-normalized
+NORM_TOLERANCE = 1e-3
+
+# pgvector's default hnsw.ef_search, which caps the candidates an index scan returns
+DEFAULT_EF_SEARCH = 40
+# Largest hnsw.ef_search pgvector accepts
+MAX_EF_SEARCH = 1000
+# First pgvector release resuming HNSW scans until enough rows pass the filters
+ITERATIVE_SCAN_VERSION = (0, 8, 0)
+
+
+def storage_settings(collection_metadata: Optional[dict]) -> Optional[dict]:
+    """The quantized storage settings of a collection, or None for float storage."""
+    settings = (collection_metadata or {}).get(STORAGE_KEY)
+    if not settings or settings.get("type", FLOAT) == FLOAT:
+        return None
+    return settings
+
+
+def distance_strategy(collection_metadata: Optional[dict]) -> str:
+    """The distance a collection is searched with, cosine unless recorded."""
+    return (collection_metadata or {}).get(DISTANCE_KEY, "cosine")
+
+
+def unit_normalized(embeddings) -> bool:
+    norms = np.linalg.norm(np.asarray(embeddings, dtype=np.float32), axis=1)
+    return bool(np.all(np.abs(norms - 1.0) <= NORM_TOLERANCE))
+
+
+def normalize(embeddings) -> List[List[float]]:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.clip(norms, 1e-12, None)).tolist()
+
+
+def index_name(storage: str, collection_id) -> str:
+    return f"ix_{EMBEDDING_TABLE}_{storage}_{str(collection_id).replace('-', '')[:16]}"
+
+
+def quantized_expression(storage: str, dimensions: int) -> str:
+    """Indexed expression; queries must use it verbatim for the index to apply."""
+    if storage == HALFVEC:
+        return f"(embedding::halfvec({dimensions}))"
+    if storage == BINARY:
+        return f"(binary_quantize(embedding)::bit({dimensions}))"
+    raise ValueError(f"Unsupported vector storage: {storage}")
+
+
+def quantized_distance(
+    storage: str, dimensions: int, parameter: str, distance: str = "cosine"
+) -> str:
+    """ORDER BY clause ranking rows against the query vector bound to `parameter`."""
+    expression = quantized_expression(storage, dimensions)
+    if storage == HALFVEC:
+        operator = DISTANCE_OPERATORS[distance][0]
+        return f"{expression} {operator} CAST({parameter} AS halfvec({dimensions}))"
+    return (
+        f"{expression} <~> "
+        f"binary_quantize(CAST({parameter} AS vector({dimensions})))::bit({dimensions})"
+    )
+
+
+def create_index_sql(
+    storage: str,
+    dimensions: int,
+    collection_id,
+    distance: str = "cosine",
+    table: str = EMBEDDING_TABLE,
+    name: Optional[str] = None,
+    concurrently: bool = True,
+) -> str:
+    opclass = (
+        DISTANCE_OPERATORS[distance][1] if storage == HALFVEC else "bit_hamming_ops"
+    )
+    name = name or index_name(storage, collection_id)
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING hnsw "
+        f"({quantized_expression(storage, dimensions)} {opclass}) "
+        f"WHERE collection_id = '{collection_id}'"
+    )
+
+
+def supports_iterative_scan(version: Optional[str]) -> bool:
+    """Whether a pgvector `extversion` has `hnsw.iterative_scan`."""
+    try:
+        release = tuple(int(part) for part in (version or "").split(".")[:3])
+    except ValueError:
+        return False
+    return release >= ITERATIVE_SCAN_VERSION
+
+
+def candidate_search_sql(
+    limit: int, filtered: bool, iterative_scan: bool
+) -> Optional[List[str]]:
+    """
+    SET LOCAL statements of a quantized candidate search for `limit` rows, or
+    None when the full-precision vectors must be ranked instead: HNSW filters
+    the rows its scan returns, so a selective filter leaves fewer than `limit`
+    candidates unless pgvector keeps scanning. The same holds for a `limit`
+    above MAX_EF_SEARCH, which caps the candidates of a single scan.
+    """
+    if (filtered or limit > MAX_EF_SEARCH) and not iterative_scan:
+        return None
+    statements = []
+    if limit > DEFAULT_EF_SEARCH:
+        ef_search = min(limit, MAX_EF_SEARCH)
+        statements.append(f"SET LOCAL hnsw.ef_search = {ef_search}")
+    if iterative_scan:
+        # Candidates are rescored afterwards, so their order does not matter
+        statements.append("SET LOCAL hnsw.iterative_scan = relaxed_order")
+    return statements
+
+
+def vector_literal(embedding) -> str:
+    return "[" + ",".join(str(float(value)) for value in embedding) + "]"
+
+
+async def _get_collection(conn, collection_name: str):
+    row = await conn.fetchrow(
+        f"SELECT uuid, cmetadata FROM {COLLECTION_TABLE} WHERE name = $1",
+        collection_name,
+    )
+    if row is None:
+        raise SystemExit(f"Collection {collection_name!r} not found")
+    metadata = row["cmetadata"]
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    return row["uuid"], metadata or {}
+
+
+async def migrate(
+    collection_name: str,
+    storage: str,
+    oversample: Optional[int] = None,
+    dimensions: Optional[int] = None,
+) -> None:
+    """
+    Switch a collection's storage without blocking writes: build the new index
+    concurrently, flip the collection setting, then drop the old indexes.
+    """
+    from app.config import logger
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        collection_id, metadata = await _get_collection(conn, collection_name)
+        partitioned = await conn.fetchval(
+            "SELECT pg_get_partkeydef(to_regclass($1))", EMBEDDING_TABLE
+        )
+        if storage != FLOAT:
+            version = await conn.fetchval(
+                "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+            )
+            if tuple(int(part) for part in version.split(".")[:2]) < (0, 7):
+                raise SystemExit(
+                    f"pgvector {version} does not support halfvec/binary_quantize, "
+                    "0.7.0 or newer is required"
+                )
+            dimensions = dimensions or await conn.fetchval(
+                f"SELECT vector_dims(embedding) FROM {EMBEDDING_TABLE} "
+                "WHERE collection_id = $1 LIMIT 1",
+                collection_id,
+            )
+            if not dimensions:
+                raise SystemExit(
+                    "Collection is empty, pass --dimensions to set up its index"
+                )
+            logger.info(f"Building {storage} index for {collection_name}")
+            # Partitioned tables cannot build or drop indexes concurrently
+            await conn.execute(
+                create_index_sql(
+                    storage,
+                    dimensions,
+                    collection_id,
+                    distance_strategy(metadata),
+                    concurrently=not partitioned,
+                )
+            )
+            settings = {"type": storage, "dimensions": dimensions}
+            if oversample:
+                settings["oversample"] = oversample
+            metadata[STORAGE_KEY] = settings
+        else:
+            metadata.pop(STORAGE_KEY, None)
+
+        await conn.execute(
+            f"UPDATE {COLLECTION_TABLE} SET cmetadata = $2::json WHERE uuid = $1",
+            collection_id,
+            json.dumps(metadata),
+        )
+        for other in (HALFVEC, BINARY):
+            if other != storage:
+                await conn.execute(
+                    f"DROP INDEX {'' if partitioned else 'CONCURRENTLY '}"
+                    f"IF EXISTS {index_name(other, collection_id)}"
+                )
+        logger.info(f"Collection {collection_name} now uses {storage} vector storage")
+
+
+async def set_distance(
+    collection_name: str, strategy: str, normalize_stored: bool = False
+) -> None:
+    """
+    Switch the distance a collection is searched with. Inner product and L2
+    need unit-normalized embeddings to rank like cosine; stored ones that are
+    not are normalized with `normalize_stored`, or the switch is refused. A
+    halfvec index is rebuilt with the strategy's operator class.
+    """
+    from app.config import logger
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        collection_id, metadata = await _get_collection(conn, collection_name)
+        if strategy != "cosine":
+            unnormalized = await conn.fetchval(
+                f"SELECT count(*) FROM {EMBEDDING_TABLE} WHERE collection_id = $1 "
+                "AND abs(vector_norm(embedding) - 1) > $2",
+                collection_id,
+                NORM_TOLERANCE,
+            )
+            if unnormalized and not normalize_stored:
+                raise SystemExit(
+                    f"{unnormalized} embeddings are not unit-normalized, "
+                    "pass --normalize to normalize them first"
+                )
+            if unnormalized:
+                logger.info(f"Normalizing {unnormalized} embeddings")
+                await conn.execute(
+                    f"UPDATE {EMBEDDING_TABLE} SET embedding = l2_normalize(embedding) "
+                    "WHERE collection_id = $1 AND abs(vector_norm(embedding) - 1) > $2",
+                    collection_id,
+                    NORM_TOLERANCE,
+                )
+
+        settings = storage_settings(metadata)
+        if settings and settings["type"] == HALFVEC:
+            partitioned = await conn.fetchval(
+                "SELECT pg_get_partkeydef(to_regclass($1))", EMBEDDING_TABLE
+            )
+            concurrently = "" if partitioned else "CONCURRENTLY "
+            logger.info(f"Rebuilding halfvec index of {collection_name} for {strategy}")
+            await conn.execute(
+                f"DROP INDEX {concurrently}IF EXISTS "
+                f"{index_name(HALFVEC, collection_id)}"
+            )
+            await conn.execute(
+                create_index_sql(
+                    HALFVEC,
+                    settings["dimensions"],
+                    collection_id,
+                    strategy,
+                    concurrently=not partitioned,
+                )
+            )
+
+        metadata[DISTANCE_KEY] = strategy
+        await conn.execute(
+            f"UPDATE {COLLECTION_TABLE} SET cmetadata = $2::json WHERE uuid = $1",
+            collection_id,
+            json.dumps(metadata),
+        )
+        logger.info(
+            f"Collection {collection_name} is now searched by {strategy} distance"
+        )
+
+
+def _percentile(values: list, percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+async def benchmark(
+    collection_name: str, queries: int = 100, k: int = 10, oversample: int = 4
+) -> dict:
+    """
+    Recall@k and latency of float, halfvec and binary search over `queries`
+    vectors sampled from the collection. Exact results are computed with index
+    scans disabled; quantized modes without an index fall back to a scan.
+    """
+    from app.services.database import PSQLDatabase
+
+    pool = await PSQLDatabase.get_pool()
+    async with pool.acquire() as conn:
+        collection_id, metadata = await _get_collection(conn, collection_name)
+        distance = distance_strategy(metadata)
+        operator = DISTANCE_OPERATORS[distance][0]
+        samples = await conn.fetch(
+            f"SELECT embedding::text AS embedding FROM {EMBEDDING_TABLE} "
+            "WHERE collection_id = $1 ORDER BY random() LIMIT $2",
+            collection_id,
+            queries,
+        )
+        if not samples:
+            raise SystemExit(f"Collection {collection_name!r} is empty")
+        dimensions = await conn.fetchval(
+            "SELECT vector_dims($1::vector)", samples[0][0]
+        )
+        candidates = k * oversample
+        float_sql = (
+            f"SELECT uuid FROM {EMBEDDING_TABLE} WHERE collection_id = $1 "
+            f"ORDER BY embedding {operator} $2::vector LIMIT $3"
+        )
+        statements = {FLOAT: (float_sql, k)}
+        for storage in (HALFVEC, BINARY):
+            statements[storage] = (
+                f"SELECT uuid FROM {EMBEDDING_TABLE} WHERE uuid IN ("
+                f"SELECT uuid FROM {EMBEDDING_TABLE} WHERE collection_id = $1 "
+                f"ORDER BY {quantized_distance(storage, dimensions, '$2', distance)} "
+                f"LIMIT $4) ORDER BY embedding {operator} $2::vector LIMIT $3",
+                candidates,
+            )
+
+        exact = []
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_indexscan = off")
+            for (query,) in samples:
+                rows = await conn.fetch(float_sql, collection_id, query, k)
+                exact.append({row["uuid"] for row in rows})
+
+        report = {}
+        for storage, (sql, limit) in statements.items():
+            latencies, hits = [], 0
+            async with conn.transaction():
+                ef_search = min(max(DEFAULT_EF_SEARCH, limit), MAX_EF_SEARCH)
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {ef_search}")
+                for (query,), expected in zip(samples, exact):
+                    args = (collection_id, query, k)
+                    if storage != FLOAT:
+                        args += (limit,)
+                    start = time.perf_counter()
+                    rows = await conn.fetch(sql, *args)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    hits += len(expected & {row["uuid"] for row in rows})
+            report[storage] = {
+                "recall": hits / max(1, sum(len(expected) for expected in exact)),
+                "p50_ms": _percentile(latencies, 0.5),
+                "p95_ms": _percentile(latencies, 0.95),
+            }
+        return report
+
+
+def main(argv=None) -> None:
+    from app.config import COLLECTION_NAME
+    from app.services.database import PSQLDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser(
+        "migrate",
+        help="search a collection through a quantized index; "
+        "full-precision vectors stay in the table",
+    )
+    migrate_parser.add_argument("--storage", choices=STORAGE_TYPES, required=True)
+    migrate_parser.add_argument("--oversample", type=int)
+    migrate_parser.add_argument("--dimensions", type=int)
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="compare recall and latency"
+    )
+    benchmark_parser.add_argument("--queries", type=int, default=100)
+    benchmark_parser.add_argument("--k", type=int, default=10)
+    benchmark_parser.add_argument("--oversample", type=int, default=4)
+    distance_parser = commands.add_parser(
+        "distance", help="change a collection's distance strategy"
+    )
+    distance_parser.add_argument(
+        "--strategy", choices=DISTANCE_STRATEGIES, required=True
+    )
+    distance_parser.add_argument(
+        "--normalize", action="store_true", help="normalize stored embeddings first"
+    )
+    for command in (migrate_parser, benchmark_parser, distance_parser):
+        command.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            if args.command == "migrate":
+                await migrate(
+                    args.collection, args.storage, args.oversample, args.dimensions
+                )
+            elif args.command == "distance":
+                await set_distance(args.collection, args.strategy, args.normalize)
+            else:
+                report = await benchmark(
+                    args.collection, args.queries, args.k, args.oversample
+                )
+                print(
+                    f"{'storage':<10}{'recall@' + str(args.k):>12}"
+                    f"{'p50 ms':>10}{'p95 ms':>10}"
+                )
+                for storage, row in report.items():
+                    print(
+                        f"{storage:<10}{row['recall']:>12.3f}"
+                        f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                    )
+        finally:
+            await PSQLDatabase.close_pool()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
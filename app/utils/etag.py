@@ -0,0 +1,33 @@
+# app/utils/etag.py
+import hashlib
+from typing import Iterable, Optional
+
+
+def catalog_etag(entries: Iterable[dict], variant: str = "") -> str:
+    """
+    Strong ETag of a response built from the given files, from their catalog
+    entries: it changes whenever a file is re-embedded, deleted or extended.
+    `variant` distinguishes representations of the same files.
+    """
+    digest = hashlib.sha256(variant.encode("utf-8"))
+    for entry in sorted(entries, key=lambda entry: entry["file_id"]):
+        digest.update(
+            "\0".join(
+                str(entry.get(key))
+                for key in ("file_id", "content_hash", "chunk_count", "updated_at")
+            ).encode("utf-8")
+        )
+        digest.update(b"\n")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
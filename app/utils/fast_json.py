@@ -0,0 +1,136 @@
+"""
+Direct JSON serialization of bulk document responses.
+
+By default FastAPI runs every returned `Document` through `jsonable_encoder`
+and, on routes with a `response_model`, through pydantic validation. With
+`FAST_JSON_RESPONSES=True` the query and document routes instead build plain
+rows with the same shape and render them with orjson in a single call.
+
+Compare both paths on synthetic responses with:
+
+    python -m app.utils.fast_json --chunks 1000 50000
+"""
+
+import json
+import time
+import argparse
+from typing import Iterable, List, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from langchain_core.documents import Document
+from pydantic import TypeAdapter
+
+from app.models import DocumentResponse
+
+
+def document_row(document: Document) -> dict:
+    """A Document as `jsonable_encoder` renders it."""
+    return {
+        "id": document.id,
+        "metadata": document.metadata,
+        "page_content": document.page_content,
+        "type": "Document",
+    }
+
+
+def scored_rows(results: Iterable[Tuple[Document, float]]) -> List[list]:
+    """Rows of a similarity search response: `[document, score]` pairs."""
+    return [[document_row(document), score] for document, score in results]
+
+
+def document_response_rows(documents: Iterable[Document]) -> List[dict]:
+    """Rows matching `DocumentResponse`, without validating each one."""
+    return [
+        {"page_content": document.page_content, "metadata": document.metadata}
+        for document in documents
+    ]
+
+
+def _default_body(content) -> bytes:
+    # What starlette's JSONResponse renders from the encoded content
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark(chunks: int, repeat: int = 3, chunk_size: int = 1500) -> dict:
+    """Best-of-`repeat` milliseconds to serialize `chunks` documents per path."""
+    documents = [
+        Document(
+            page_content="x" * chunk_size,
+            metadata={
+                "file_id": "file",
+                "user_id": "user",
+                "digest": f"{i:032x}",
+                "source": "/uploads/file.pdf",
+                "page": i // 4,
+                "chunk_index": i,
+            },
+        )
+        for i in range(chunks)
+    ]
+    results = [(document, 1.0 / (i + 1)) for i, document in enumerate(documents)]
+    adapter = TypeAdapter(List[DocumentResponse])
+
+    def validated_documents():
+        validated = adapter.validate_python(
+            [
+                {"page_content": d.page_content, "metadata": d.metadata}
+                for d in documents
+            ]
+        )
+        return _default_body(adapter.dump_python(validated, mode="json"))
+
+    return {
+        "query": {
+            "default_ms": _timed(lambda: _default_body(results), repeat),
+            "fast_ms": _timed(
+                lambda: ORJSONResponse(scored_rows(results)).body, repeat
+            ),
+        },
+        "documents": {
+            "default_ms": _timed(validated_documents, repeat),
+            "fast_ms": _timed(
+                lambda: ORJSONResponse(document_response_rows(documents)).body,
+                repeat,
+            ),
+        },
+    }
+
+
+def main(argv: Sequence[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'chunks':>8}  {'response':<10}"
+        f"{'default ms':>12}{'fast ms':>10}{'speedup':>9}"
+    )
+    for chunks in args.chunks:
+        report = benchmark(chunks, args.repeat, args.chunk_size)
+        for response, row in report.items():
+            print(
+                f"{chunks:>8}  {response:<10}{row['default_ms']:>12.1f}"
+                f"{row['fast_ms']:>10.1f}{row['default_ms'] / row['fast_ms']:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# app/utils/precomputed.py
+import io
+import json
+from typing import List, Tuple
+
+import numpy as np
+
+
+def load_precomputed_chunks(
+    chunks: bytes, vectors: bytes, dimensions: int
+) -> Tuple[List[str], List[dict], np.ndarray]:
+    """
+    Parse chunks with precomputed embeddings: a JSONL body with one
+    `{"page_content": ..., "metadata": {...}}` object per chunk, and a `.npy`
+    float array with one row of `dimensions` values per chunk, in the same order.
+
+    Raises ValueError when the two do not describe the same valid chunks.
+    """
+    texts, metadatas = [], []
+    for line_number, line in enumerate(chunks.decode("utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on chunk line {line_number}: {e}")
+        if not isinstance(chunk, dict) or not isinstance(
+            chunk.get("page_content"), str
+        ):
+            raise ValueError(f"Chunk line {line_number} has no page_content string")
+        metadata = chunk.get("metadata") or {}
+        if not isinstance(metadata, dict):
+            raise ValueError(f"Chunk line {line_number} metadata is not an object")
+        texts.append(chunk["page_content"])
+        metadatas.append(metadata)
+
+    try:
+        array = np.load(io.BytesIO(vectors), allow_pickle=False)
+    except Exception as e:
+        raise ValueError(f"Vectors are not a valid .npy array: {e}")
+    if array.ndim != 2 or not np.issubdtype(array.dtype, np.floating):
+        raise ValueError(
+            f"Vectors must be a 2-d float array, got {array.ndim}-d {array.dtype}"
+        )
+    if array.shape[0] != len(texts):
+        raise ValueError(f"Got {array.shape[0]} vectors for {len(texts)} chunks")
+    if array.shape[1] != dimensions:
+        raise ValueError(
+            f"Vectors have {array.shape[1]} dimensions, "
+            f"the configured model has {dimensions}"
+        )
+    if not np.isfinite(array).all():
+        raise ValueError("Vectors contain NaN or infinite values")
+    return texts, metadatas, array.astype(np.float32, copy=False)
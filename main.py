@@ -1,5 +1,6 @@
 # main.py
 import os
+import asyncio
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
@@ -18,12 +19,18 @@ from app.config import (
     CHUNK_OVERLAP,
     PDF_EXTRACT_IMAGES,
     VECTOR_DB_TYPE,
+    RESPONSE_COMPRESSION_ENABLED,
+    RESPONSE_COMPRESSION_MIN_SIZE,
+    COLLECTION_NAME,
+    EMBEDDINGS_DIMENSIONS,
     LogMiddleware,
     logger,
 )
-from app.middleware import security_middleware
+from app.middleware import CompressionMiddleware, security_middleware
 from app.routes import document_routes, pgvector_routes
 from app.services.database import PSQLDatabase, ensure_vector_indexes
+from app.services.invalidation import invalidation_bus
+from app.services.vector_store.dimensions import ensure_collection_dimensions
 
 
 @asynccontextmanager
@@ -43,10 +50,24 @@ async def lifespan(app: FastAPI):
     if VECTOR_DB_TYPE == VectorDBType.PGVECTOR:
         await PSQLDatabase.get_pool()  # Initialize the pool
         await ensure_vector_indexes()
+        try:
+            dimensions = EMBEDDINGS_DIMENSIONS
+            if not dimensions:
+                dimensions = await asyncio.get_running_loop().run_in_executor(
+                    app.state.thread_pool, document_routes.get_embedding_dimensions
+                )
+        except Exception as e:
+            logger.warning(f"Skipping the collection dimensions check: {e}")
+        else:
+            # Raises, failing startup, if the collection holds another size
+            await ensure_collection_dimensions(COLLECTION_NAME, dimensions)
+
+    await invalidation_bus.start()
 
     yield
 
     # Cleanup logic
+    await invalidation_bus.stop()
     logger.info("Shutting down thread pool")
     app.state.thread_pool.shutdown(wait=True)
     logger.info("Thread pool shutdown complete")
@@ -66,6 +87,11 @@ app.add_middleware(LogMiddleware)
 
 app.middleware("http")(security_middleware)
 
+if RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_SIZE
+    )
+
 # Set state variables for use in routes
 app.state.CHUNK_SIZE = CHUNK_SIZE
 app.state.CHUNK_OVERLAP = CHUNK_OVERLAP
@@ -0,0 +1,62 @@
+import io
+import json
+import threading
+import time
+
+from app.services.bedrock_embeddings import BedrockParallelEmbeddings
+
+
+class FakeBedrockClient:
+    def __init__(self):
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, body, modelId, accept, contentType):
+        body = json.loads(body)
+        with self.lock:
+            self.bodies.append(body)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        if "texts" in body:
+            result = {"embeddings": [[float(len(text))] for text in body["texts"]]}
+        else:
+            result = {"embedding": [float(len(body["inputText"]))]}
+        return {"body": io.BytesIO(json.dumps(result).encode())}
+
+
+def test_titan_texts_are_invoked_concurrently_in_order():
+    client = FakeBedrockClient()
+    embeddings = BedrockParallelEmbeddings(
+        client, "amazon.titan-embed-text-v2:0", max_workers=4
+    )
+    texts = ["a" * n for n in range(1, 21)]
+
+    assert embeddings.embed_documents(texts) == [[float(n)] for n in range(1, 21)]
+    assert len(client.bodies) == 20
+    assert 1 < client.max_in_flight <= 4
+
+
+def test_titan_replaces_newlines_like_langchain():
+    client = FakeBedrockClient()
+    embeddings = BedrockParallelEmbeddings(client, "amazon.titan-embed-text-v1")
+
+    embeddings.embed_query("line one\nline two")
+
+    assert client.bodies == [{"inputText": "line one line two"}]
+
+
+def test_cohere_uses_native_batches():
+    client = FakeBedrockClient()
+    embeddings = BedrockParallelEmbeddings(client, "cohere.embed-english-v3")
+
+    assert len(embeddings.embed_documents(["text"] * 200)) == 200
+    assert [len(body["texts"]) for body in client.bodies] == [96, 96, 8]
+    assert client.bodies[0]["input_type"] == "search_document"
+
+    embeddings.embed_query("question")
+    assert client.bodies[-1] == {"texts": ["question"], "input_type": "search_query"}
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from app.services.embedding_dispatch import truncate_embeddings
+from app.services.vector_store.dimensions import check_dimensions, compare_dimensions
+
+
+def test_truncate_embeddings_renormalizes():
+    truncated = truncate_embeddings([[3.0, 4.0, 12.0], [1.0, 0.0, 0.0]], 2)
+
+    assert np.allclose(truncated, [[0.6, 0.8], [1.0, 0.0]])
+    assert truncate_embeddings([[1.0, 2.0]], 2) == [[1.0, 2.0]]
+    assert truncate_embeddings([[1.0, 2.0]], 0) == [[1.0, 2.0]]
+    with pytest.raises(ValueError):
+        truncate_embeddings([[1.0, 2.0]], 3)
+
+
+def test_check_dimensions_rejects_other_sizes():
+    check_dimensions("docs", 512, None, None)
+    check_dimensions("docs", 512, 512, 512)
+
+    with pytest.raises(ValueError, match="EMBEDDINGS_DIMENSIONS=1536"):
+        check_dimensions("docs", 512, 1536, None)
+    with pytest.raises(ValueError, match="1536-dimensional"):
+        check_dimensions("docs", 512, None, 1536)
+
+
+def test_compare_dimensions_reports_recall_per_size():
+    vectors = np.random.default_rng(1).normal(size=(500, 64)).astype(np.float32)
+
+    report = compare_dimensions(vectors, [32, 8, 128], queries=20, k=5)
+
+    assert list(report) == [64, 32, 8]
+    assert report[64]["recall"] == 1.0
+    assert report[8]["recall"] < report[64]["recall"]
+    assert report[32]["bytes_per_vector"] == 128
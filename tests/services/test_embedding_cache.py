@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.services.embedding_cache import DOCUMENT, QUERY, EmbeddingCache
+
+
+def test_lru_eviction_and_stats():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many(DOCUMENT, {"a": [1.0], "b": [2.0]})
+    cache.get(DOCUMENT, "a")
+    cache.put(DOCUMENT, "c", [3.0])
+
+    assert set(cache.get_many(DOCUMENT, ["a", "b", "c"])) == {"a", "c"}
+    assert cache.get(DOCUMENT, "a").dtype == np.float32
+    assert cache.stats()["misses"] == 1
+
+
+def test_query_and_document_entries_shared_only_when_identical():
+    separate = EmbeddingCache(max_entries=4)
+    separate.put(DOCUMENT, "a", [1.0])
+    assert separate.get(QUERY, "a") is None
+
+    shared = EmbeddingCache(max_entries=4, shared=True)
+    shared.put(DOCUMENT, "a", [1.0])
+    assert shared.get(QUERY, "a") is not None
@@ -0,0 +1,181 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_dispatch import (
+    AdaptiveConcurrencyLimiter,
+    DispatchingEmbeddings,
+    TokenCounter,
+    is_rate_limited,
+    plan_batches,
+    retry_after,
+)
+
+
+class RateLimitError(Exception):
+    def __init__(self, headers):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(status_code=429, headers=headers)
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.model = "fake-model"
+        self.calls = 0
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+            self.batches.append(list(texts))
+            failure = self.failures.pop(0) if self.failures else None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            if failure is not None:
+                raise failure
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_batches_run_concurrently_in_order():
+    provider = FakeEmbeddings()
+    limiter = AdaptiveConcurrencyLimiter(max_limit=4)
+    embeddings = DispatchingEmbeddings(provider, limiter, batch_size=2)
+    texts = ["a" * n for n in range(1, 41)]
+
+    assert embeddings.embed_documents(texts) == [[float(n)] for n in range(1, 41)]
+    assert provider.calls == 20
+    assert 1 < provider.max_in_flight <= 4
+    stats = embeddings.stats()
+    assert stats["requests"] == 20
+    assert stats["in_flight"] == 0
+    assert stats["estimated_tokens_per_second"] > 0
+    assert embeddings.model == "fake-model"
+
+
+def test_rate_limit_halves_limit_and_honours_retry_after():
+    provider = FakeEmbeddings(failures=[RateLimitError({"retry-after-ms": "50"})])
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+    limiter.limit = 4.0
+    embeddings = DispatchingEmbeddings(provider, limiter, batch_size=10)
+
+    start = time.monotonic()
+    assert embeddings.embed_documents(["x", "yy"]) == [[1.0], [2.0]]
+
+    assert time.monotonic() - start >= 0.05
+    assert provider.calls == 2
+    stats = limiter.stats()
+    assert stats["throttles"] == 1
+    assert stats["limit"] == 2
+    assert stats["last_throttle"] is not None
+
+
+def test_gives_up_after_max_retries_and_keeps_other_errors():
+    provider = FakeEmbeddings(
+        failures=[RateLimitError({"retry-after": "0"})] * 2 + [ValueError("bad input")]
+    )
+    limiter = AdaptiveConcurrencyLimiter(max_limit=2, max_retries=1)
+    embeddings = DispatchingEmbeddings(provider, limiter, batch_size=10)
+
+    with pytest.raises(RateLimitError):
+        embeddings.embed_documents(["x"])
+    with pytest.raises(ValueError):
+        embeddings.embed_query("x")
+    assert provider.calls == 3
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_recognizes_botocore_throttling():
+    error = Exception("throttled")
+    error.response = {
+        "Error": {"Code": "ThrottlingException"},
+        "ResponseMetadata": {
+            "HTTPStatusCode": 400,
+            "HTTPHeaders": {"retry-after": "3"},
+        },
+    }
+
+    assert is_rate_limited(error)
+    assert retry_after(error) == 3.0
+    assert not is_rate_limited(ValueError("bad input"))
+    assert retry_after(ValueError("bad input")) is None
+
+
+def test_plan_batches_packs_by_tokens():
+    tokens = [10, 10, 10, 50, 10, 200, 10]
+
+    assert plan_batches(tokens, max_items=3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert plan_batches(tokens, max_items=100, max_tokens=60) == [
+        [0, 1, 2],
+        [3, 4],
+        [5],
+        [6],
+    ]
+    assert plan_batches(tokens, max_items=3, sort_by_length=True) == [
+        [0, 1, 2],
+        [4, 6, 3],
+        [5],
+    ]
+
+
+def test_token_counter_falls_back_to_chars_per_token():
+    assert TokenCounter(chars_per_token=2.0).count("abcdefgh") == 5
+    # Without a downloadable encoding, counting still works
+    assert TokenCounter(tiktoken_model="no-such-model").count("abcdefgh") > 0
+
+
+def test_sorted_batches_are_returned_in_input_order():
+    provider = FakeEmbeddings()
+    limiter = AdaptiveConcurrencyLimiter(max_limit=2)
+    embeddings = DispatchingEmbeddings(
+        provider,
+        limiter,
+        batch_size=100,
+        max_tokens=12,
+        token_counter=TokenCounter(chars_per_token=1.0),
+        sort_by_length=True,
+    )
+    texts = ["a" * 9, "b", "c" * 5, "d" * 2, "e" * 20]
+
+    assert embeddings.embed_documents(texts) == [[9.0], [1.0], [5.0], [2.0], [20.0]]
+    assert sorted(provider.batches) == [["a" * 9], ["b", "d" * 2, "c" * 5], ["e" * 20]]
+
+
+def test_queries_and_batch_sizes_do_not_shrink_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+    limiter.limit = 4.0
+
+    # A fast query and then large batches, each taking longer than the last
+    limiter.call(lambda: None, 1, queue=False)
+    for tokens, latency in [(4000, 0.4), (8000, 0.8), (16000, 1.6)]:
+        limiter._acquire(True)
+        limiter._succeeded(tokens, latency, True)
+    for _ in range(3):
+        limiter._acquire(True)
+        limiter._succeeded(100, 0.01, True)
+
+    stats = limiter.stats()
+    assert stats["slowdowns"] == 0
+    assert stats["limit"] > 4
+    assert stats["requests"] == 6
+    assert stats["queries_in_flight"] == 0
+
+    # Only a batch slower than its size's usual latency counts as a slowdown
+    limiter._acquire(True)
+    limiter._succeeded(100, 0.1, True)
+    assert limiter.stats()["slowdowns"] == 1
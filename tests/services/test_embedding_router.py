@@ -0,0 +1,88 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_router import EmbeddingRouter
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = SimpleNamespace(status_code=status_code)
+
+
+class Replica(Embeddings):
+    def __init__(self, value, error=None, block=None):
+        self.value = value
+        self.error = error
+        self.block = block
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.block is not None:
+            self.block.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [[self.value] for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_routes_to_least_outstanding_endpoint():
+    release = threading.Event()
+    busy, idle = Replica(1.0, block=release), Replica(2.0)
+    router = EmbeddingRouter([("busy", busy), ("idle", idle)])
+    thread = threading.Thread(target=router.embed_query, args=("first",))
+
+    # Both endpoints are idle, so the first request goes to the first one
+    thread.start()
+    while router.endpoints[0].in_flight == 0:
+        pass
+    assert [router.embed_query("second") for _ in range(3)] == [[2.0]] * 3
+    release.set()
+    thread.join()
+
+    assert busy.calls == 1
+    assert idle.calls == 3
+
+
+def test_failed_endpoint_is_ejected_and_request_retried():
+    broken, healthy = Replica(1.0, error=ConnectionError("down")), Replica(2.0)
+    router = EmbeddingRouter([("broken", broken), ("healthy", healthy)])
+
+    assert router.embed_documents(["a", "b"]) == [[2.0], [2.0]]
+    assert router.embed_documents(["c"]) == [[2.0]]
+    assert router.embed_documents(["d"]) == [[2.0]]
+
+    stats = {row["endpoint"]: row for row in router.stats()}
+    assert broken.calls == 1
+    assert stats["broken"]["failures"] == 1
+    assert stats["broken"]["ejected_for"] > 0
+    assert stats["healthy"]["in_flight"] == 0
+
+
+def test_raises_when_every_endpoint_fails():
+    router = EmbeddingRouter(
+        [
+            ("a", Replica(1.0, error=ConnectionError("down"))),
+            ("b", Replica(2.0, error=HTTPError(503))),
+        ]
+    )
+
+    with pytest.raises((ConnectionError, HTTPError)):
+        router.embed_query("x")
+    assert all(row["failures"] == 1 for row in router.stats())
+
+
+def test_request_errors_are_not_retried():
+    bad_input, other = Replica(1.0, error=HTTPError(413)), Replica(2.0)
+    router = EmbeddingRouter([("a", bad_input), ("b", other)])
+
+    with pytest.raises(HTTPError):
+        router.embed_query("x" * 100000)
+    assert other.calls == 0
+    assert router.stats()[0]["ejected_for"] == 0
@@ -0,0 +1,54 @@
+from app.services.vector_store.file_catalog import (
+    chain_hash,
+    chunk_in_range,
+    create_catalog_sql,
+    merge_entry,
+    summarize_chunks,
+)
+
+
+def test_summarize_chunks_groups_by_file():
+    entries = summarize_chunks(
+        ["ab", "cd", "é"],
+        [{"user_id": "u", "digest": "1"}, {"user_id": "u", "digest": "2"}, {}],
+        ["a", "a", "b"],
+    )
+
+    assert entries["a"]["chunk_count"] == 2
+    assert entries["a"]["byte_size"] == 4
+    assert entries["a"]["user_id"] == "u"
+    assert entries["b"]["byte_size"] == 2
+
+
+def test_merge_entry_accumulates_and_chains_hash():
+    first = summarize_chunks(["ab"], [{"user_id": "u"}], ["a"])["a"]
+    second = summarize_chunks(["cd"], [{"user_id": "u"}], ["a"])["a"]
+
+    entry = merge_entry(None, first)
+    assert entry["created_at"] == entry["updated_at"]
+    merged = merge_entry(entry, second)
+
+    assert merged["chunk_count"] == 2
+    assert merged["created_at"] == entry["created_at"]
+    assert merged["content_hash"] == chain_hash(
+        first["content_hash"], second["content_hash"]
+    )
+
+
+def test_chunk_in_range():
+    metadata = {"chunk_index": 3, "page": 1}
+
+    assert chunk_in_range(metadata)
+    assert chunk_in_range(metadata, start=3, end=4)
+    assert not chunk_in_range(metadata, end=3)
+    assert chunk_in_range(metadata, page_start=1, page_end=1)
+    assert not chunk_in_range(metadata, page_start=2)
+    # Chunks ingested before ordinals were stored only match unbounded reads
+    assert not chunk_in_range({}, start=0)
+
+
+def test_create_catalog_sql_is_idempotent_and_locked():
+    lock, table, *indexes = create_catalog_sql()
+    assert lock.startswith("SELECT pg_advisory_xact_lock(")
+    assert "CREATE TABLE IF NOT EXISTS rag_file_catalog" in table
+    assert all("CREATE INDEX IF NOT EXISTS" in index for index in indexes)
@@ -0,0 +1,159 @@
+import asyncio
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.services import hot_file_cache as hot_file_cache_module
+from app.services.hot_file_cache import HotFileCache, FileVectors
+
+
+def make_file(file_id, count, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, dim)).tolist()
+    documents = [
+        Document(page_content=f"chunk {i} of {file_id}", metadata={"file_id": file_id})
+        for i in range(count)
+    ]
+    return embeddings, documents
+
+
+def make_cache(max_bytes=1024 * 1024):
+    return HotFileCache(max_bytes, max_bytes, lambda similarity: 1.0 - similarity)
+
+
+def test_exact_top_k_matches_brute_force():
+    cache = make_cache()
+    embeddings, documents = make_file("a", 50)
+    cache.put("a", embeddings, documents)
+    query = np.random.default_rng(1).normal(size=8)
+
+    results = cache.search({"file_id": "a"}, query, k=5)
+
+    matrix = np.asarray(embeddings)
+    similarities = (matrix @ query) / (
+        np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    )
+    expected = np.argsort(-similarities)[:5]
+    assert [doc.page_content for doc, _ in results] == [
+        documents[i].page_content for i in expected
+    ]
+    # Scores use the backend's semantics (cosine distance here)
+    assert results[0][1] == pytest.approx(1.0 - similarities[expected[0]], abs=1e-5)
+
+
+def test_multiple_files_require_all_hot():
+    cache = make_cache()
+    cache.put("a", *make_file("a", 10, seed=1))
+    filter = {"file_id": {"$in": ["a", "b"]}}
+    assert cache.search(filter, np.ones(8), k=4) is None
+
+    cache.put("b", *make_file("b", 10, seed=2))
+    results = cache.search(filter, np.ones(8), k=4)
+    assert len(results) == 4
+    assert cache.search({"file_id": "a", "user_id": "x"}, np.ones(8), k=4) is None
+
+
+def test_byte_budget_evicts_least_recently_used_file():
+    entry_bytes = FileVectors(*make_file("a", 10)).nbytes
+    cache = make_cache(max_bytes=2 * entry_bytes + 10)
+    cache.put("a", *make_file("a", 10))
+    cache.put("b", *make_file("b", 10))
+    cache.search({"file_id": "a"}, np.ones(8), k=1)
+    cache.put("c", *make_file("c", 10))
+
+    assert cache.search({"file_id": "b"}, np.ones(8), k=1) is None
+    assert cache.search({"file_id": "a"}, np.ones(8), k=1) is not None
+    assert cache.stats()["bytes"] <= 2 * entry_bytes + 10
+
+
+def test_invalidation_removes_file_and_rejects_stale_load():
+    cache = make_cache()
+    cache.put("a", *make_file("a", 10))
+    generation = cache.generation()
+    cache.invalidate_files(["a"])
+
+    assert cache.search({"file_id": "a"}, np.ones(8), k=1) is None
+    assert not cache.put("a", *make_file("a", 10), generation=generation)
+
+
+def test_stale_oversized_load_does_not_reject_the_changed_file():
+    cache = HotFileCache(1024 * 1024, 512, lambda similarity: 1.0 - similarity)
+    generation = cache.generation()
+    cache.invalidate_files(["a"])
+
+    assert not cache.put("a", *make_file("a", 10), generation=generation)
+    assert cache.stats()["rejected"] == 0
+    assert "a" not in cache._rejected
+
+
+@pytest.mark.asyncio
+async def test_schedule_load_populates_from_backend(monkeypatch):
+    cache = make_cache()
+    monkeypatch.setattr(
+        hot_file_cache_module.vector_store,
+        "get_file_embeddings",
+        lambda file_id: make_file(file_id, 10),
+        raising=False,
+    )
+
+    cache.schedule_load(["a"])
+    await asyncio.gather(*cache._tasks)
+
+    assert cache.search({"file_id": "a"}, np.ones(8), k=3) is not None
+
+
+@pytest.mark.asyncio
+async def test_oversized_file_is_not_fetched_again(monkeypatch):
+    cache = HotFileCache(1024 * 1024, 512, lambda similarity: 1.0 - similarity)
+    fetches = []
+
+    def get_file_embeddings(file_id):
+        fetches.append(file_id)
+        return make_file(file_id, 10)
+
+    monkeypatch.setattr(
+        hot_file_cache_module.vector_store,
+        "get_file_embeddings",
+        get_file_embeddings,
+        raising=False,
+    )
+    monkeypatch.setattr(
+        hot_file_cache_module.vector_store,
+        "get_file_catalog",
+        lambda ids: [],
+        raising=False,
+    )
+
+    for _ in range(3):
+        cache.schedule_load(["a"])
+        await asyncio.gather(*cache._tasks)
+    assert fetches == ["a"]
+    assert cache.stats()["rejected"] == 1
+
+    # A change to the file makes it a candidate again
+    cache.invalidate_files(["a"])
+    cache.schedule_load(["a"])
+    await asyncio.gather(*cache._tasks)
+    assert fetches == ["a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_catalog_size_rejects_file_before_fetching(monkeypatch):
+    cache = HotFileCache(1024 * 1024, 512, lambda similarity: 1.0 - similarity)
+    monkeypatch.setattr(
+        hot_file_cache_module.vector_store,
+        "get_file_catalog",
+        lambda ids: [{"file_id": "a", "byte_size": 4096, "chunk_count": 10}],
+        raising=False,
+    )
+    monkeypatch.setattr(
+        hot_file_cache_module.vector_store,
+        "get_file_embeddings",
+        lambda file_id: pytest.fail("vectors of an oversized file were fetched"),
+        raising=False,
+    )
+
+    cache.schedule_load(["a"])
+    await asyncio.gather(*cache._tasks)
+
+    assert cache.stats()["rejected"] == 1
@@ -0,0 +1,202 @@
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.vector_store.local_vector import LocalVectorStore
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic pseudo-random embeddings keyed by text."""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+
+    def embed_query(self, text):
+        seed = sum(ord(c) * (i + 1) for i, c in enumerate(text))
+        return np.random.default_rng(seed).normal(size=self.dim).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def make_docs(file_id, count):
+    return [
+        Document(page_content=f"chunk {i} of {file_id}", metadata={"file_id": file_id})
+        for i in range(count)
+    ]
+
+
+def add_file(store, file_id, count):
+    store.add_documents(make_docs(file_id, count), ids=[file_id] * count)
+
+
+def test_filtered_search_matches_brute_force():
+    embeddings = HashEmbeddings()
+    store = LocalVectorStore(embeddings)
+    add_file(store, "a", 30)
+    add_file(store, "b", 30)
+    query = embeddings.embed_query("question")
+
+    results = store.similarity_search_with_score_by_vector(
+        query, k=5, filter={"file_id": "a"}
+    )
+
+    docs = make_docs("a", 30)
+    matrix = np.asarray(embeddings.embed_documents([d.page_content for d in docs]))
+    similarities = (matrix @ query) / (
+        np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    )
+    expected = np.argsort(-similarities)[:5]
+    assert [doc.page_content for doc, _ in results] == [
+        docs[i].page_content for i in expected
+    ]
+    assert abs(results[0][1] - (1.0 - similarities[expected[0]])) < 1e-5
+
+
+def test_ids_documents_and_delete():
+    store = LocalVectorStore(HashEmbeddings())
+    add_file(store, "a", 3)
+    add_file(store, "b", 2)
+
+    assert store.get_all_ids() == ["a", "b"]
+    assert store.get_filtered_ids(["b", "c"]) == ["b"]
+    assert len(store.get_documents_by_ids(["a"])) == 3
+
+    store.delete(ids=["a"])
+
+    assert store.get_all_ids() == ["b"]
+    assert store.get_documents_by_ids(["a"]) == []
+    results = store.similarity_search_with_score_by_vector(
+        HashEmbeddings().embed_query("q"), k=10
+    )
+    assert {doc.metadata["file_id"] for doc, _ in results} == {"b"}
+
+
+def test_metadata_post_filter():
+    store = LocalVectorStore(HashEmbeddings())
+    docs = make_docs("a", 4)
+    for i, doc in enumerate(docs):
+        doc.metadata["user_id"] = "u1" if i % 2 else "u2"
+    store.add_documents(docs, ids=["a"] * 4)
+
+    results = store.similarity_search_with_score_by_vector(
+        HashEmbeddings().embed_query("q"),
+        k=4,
+        filter={"file_id": {"$in": ["a"]}, "user_id": "u1"},
+    )
+    assert len(results) == 2
+    assert all(doc.metadata["user_id"] == "u1" for doc, _ in results)
+
+
+def test_persists_across_reopen_and_spans_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(LocalVectorStore, "SEGMENT_ROWS", 4)
+    path = str(tmp_path / "store")
+    store = LocalVectorStore(HashEmbeddings(), path=path)
+    add_file(store, "a", 6)
+    add_file(store, "b", 3)
+    store.delete(ids=["b"])
+    add_file(store, "b", 2)
+    embeddings, _ = store.get_file_embeddings("a")
+
+    reopened = LocalVectorStore(HashEmbeddings(), path=path)
+
+    assert reopened.get_all_ids() == ["a", "b"]
+    assert len(reopened.get_documents_by_ids(["b"])) == 2
+    reloaded, documents = reopened.get_file_embeddings("a")
+    assert np.array_equal(reloaded, embeddings)
+    assert [d.page_content for d in documents] == [
+        d.page_content for d in make_docs("a", 6)
+    ]
+
+
+def test_uncommitted_rows_are_dropped_on_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = LocalVectorStore(HashEmbeddings(), path=path)
+    add_file(store, "a", 2)
+    # Simulate a crash after the vectors were written but before the log record
+    segment = store._segments[0]
+    segment.append(np.ones((1, 16), dtype=np.float32), ["orphan"], [{}])
+
+    reopened = LocalVectorStore(HashEmbeddings(), path=path)
+
+    assert len(reopened._segments[0]) == 2
+    add_file(reopened, "b", 1)
+    assert [d.page_content for d in reopened.get_documents_by_ids(["b"])] == [
+        "chunk 0 of b"
+    ]
+
+
+def test_ivf_finds_nearest_neighbours():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(8, 16))
+    vectors = np.repeat(centers, 50, axis=0) + 0.01 * rng.normal(size=(400, 16))
+    store = LocalVectorStore(HashEmbeddings(), ivf_min_rows=100, ivf_nprobe=2)
+    store.add_embeddings(
+        [f"row {i}" for i in range(400)],
+        vectors.tolist(),
+        [{"file_id": f"f{i // 50}"} for i in range(400)],
+        [f"f{i // 50}" for i in range(400)],
+    )
+
+    results = store.similarity_search_with_score_by_vector(centers[3], k=5)
+
+    assert store._ivf is not None
+    assert {doc.metadata["file_id"] for doc, _ in results} == {"f3"}
+
+
+def test_file_catalog_tracks_chunks_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = LocalVectorStore(HashEmbeddings(), path=path)
+    add_file(store, "b", 3)
+    add_file(store, "a", 2)
+    add_file(store, "a", 1)
+    store.delete(ids=["b"])
+
+    [entry] = store.get_file_catalog(["a", "b"])
+    assert entry["chunk_count"] == 3
+    assert entry["byte_size"] == sum(
+        len(d.page_content) for d in make_docs("a", 2)
+    ) + len("chunk 0 of a")
+
+    reopened = LocalVectorStore(HashEmbeddings(), path=path)
+    assert reopened.get_file_catalog(["a"]) == [entry]
+    assert reopened.get_filtered_ids(["a", "b"]) == ["a"]
+
+
+def test_get_all_ids_pages_in_order():
+    store = LocalVectorStore(HashEmbeddings())
+    for file_id in ("c", "a", "b"):
+        add_file(store, file_id, 1)
+
+    assert store.get_all_ids() == ["a", "b", "c"]
+    assert store.get_all_ids(limit=2) == ["a", "b"]
+    assert store.get_all_ids(limit=2, after="b") == ["c"]
+
+
+def test_fetch_documents_reports_missing_ids():
+    store = LocalVectorStore(HashEmbeddings())
+    add_file(store, "a", 2)
+
+    documents, missing = store.fetch_documents_by_ids(["a", "x", "a"])
+
+    assert [d.page_content for d in documents] == ["chunk 0 of a", "chunk 1 of a"]
+    assert missing == ["x"]
+
+
+def test_file_chunks_by_ordinal_and_page_ranges():
+    store = LocalVectorStore(HashEmbeddings())
+    docs = make_docs("a", 6)
+    for i, doc in enumerate(docs):
+        doc.metadata.update(chunk_index=i, page=i // 2)
+    # Stored out of order; reads follow the ordinal
+    store.add_documents(docs[3:] + docs[:3], ids=["a"] * 6)
+
+    def ordinals(**kwargs):
+        return [d.metadata["chunk_index"] for d in store.get_file_chunks("a", **kwargs)]
+
+    assert ordinals() == [0, 1, 2, 3, 4, 5]
+    assert ordinals(start=2, limit=3) == [2, 3, 4]
+    assert ordinals(start=1, end=3) == [1, 2]
+    assert ordinals(page_start=1, page_end=1) == [2, 3]
+    assert ordinals(offset=4) == [4, 5]
+    assert ordinals(page_start=1, offset=1, limit=2) == [3, 4]
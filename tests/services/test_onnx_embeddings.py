@@ -0,0 +1,117 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.onnx_embeddings import (
+    CONFIG_FILE,
+    OnnxEmbeddings,
+    export_dir,
+    export_model,
+    make_test_model,
+    pool,
+)
+
+
+class FakeTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation, max_length):
+        return {
+            "input_ids": [
+                [len(word) for word in text.split()][:max_length] for text in texts
+            ]
+        }
+
+
+class FakeSession:
+    """Hidden state of every token is its id, repeated over 2 dimensions."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def get_inputs(self):
+        return [
+            SimpleNamespace(name="input_ids"),
+            SimpleNamespace(name="attention_mask"),
+        ]
+
+    def run(self, outputs, feeds):
+        input_ids = feeds["input_ids"]
+        self.shapes.append(input_ids.shape)
+        return [np.repeat(input_ids[..., None], 2, axis=2).astype(np.float32)]
+
+
+def test_pooling_modes_ignore_padding():
+    hidden = np.array([[[1.0], [3.0], [100.0]], [[2.0], [4.0], [6.0]]])
+    mask = np.array([[1, 1, 0], [1, 1, 1]])
+
+    assert pool(hidden, mask, "mean")[:, 0].tolist() == [2.0, 4.0]
+    assert pool(hidden, mask, "max")[:, 0].tolist() == [3.0, 6.0]
+    assert pool(hidden, mask, "cls")[:, 0].tolist() == [1.0, 2.0]
+    assert pool(hidden, mask, "lasttoken")[:, 0].tolist() == [3.0, 6.0]
+    with pytest.raises(ValueError):
+        pool(hidden, mask, "weightedmean")
+
+
+def test_batches_are_length_bucketed_and_returned_in_order():
+    session = FakeSession()
+    embeddings = OnnxEmbeddings(
+        session, FakeTokenizer(), max_length=8, batch_size=2, normalize=False
+    )
+    texts = ["aaaa " * 8, "a", "aa aa", "aaa " * 7]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert [vector[0] for vector in vectors] == [4.0, 1.0, 2.0, 3.0]
+    # Short texts are batched together, so only long ones pay for padding
+    assert session.shapes == [(2, 2), (2, 8)]
+
+
+def test_vectors_are_normalized():
+    embeddings = OnnxEmbeddings(FakeSession(), FakeTokenizer())
+
+    vector = embeddings.embed_query("aaa")
+
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_export_dir_is_flat_per_model():
+    assert export_dir("/models", "sentence-transformers/all-MiniLM-L6-v2") == (
+        "/models/sentence-transformers--all-MiniLM-L6-v2"
+    )
+
+
+@pytest.fixture(scope="module")
+def exported_model(tmp_path_factory):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    directory = tmp_path_factory.mktemp("onnx")
+    model_dir = make_test_model(str(directory / "model"), hidden_size=64, layers=1)
+    return model_dir, str(directory / "export")
+
+
+@pytest.mark.parametrize("int8, min_cosine", [(False, 0.9999), (True, 0.95)])
+def test_export_and_load_round_trip(exported_model, int8, min_cosine):
+    from sentence_transformers import SentenceTransformer
+
+    model_dir, output_dir = exported_model
+    path = export_model(model_dir, output_dir, int8=int8)
+    # A second export reuses the files already written
+    assert export_model(model_dir, output_dir, int8=int8) == path
+    assert os.path.exists(os.path.join(output_dir, CONFIG_FILE))
+
+    texts = ["w1 w2 w3", "w4 " * 40, "w5"]
+    embeddings = OnnxEmbeddings.load(path, batch_size=2, intra_op_threads=1)
+    vectors = np.asarray(embeddings.embed_documents(texts))
+    expected = SentenceTransformer(model_dir, device="cpu").encode(
+        texts, normalize_embeddings=True
+    )
+
+    assert vectors.shape == expected.shape
+    assert (vectors * expected).sum(axis=1).min() > min_cosine
+    # Padding within a batch does not change a text's vector
+    query = np.asarray(embeddings.embed_query(texts[0]))
+    assert float(query @ vectors[0]) > min_cosine
@@ -0,0 +1,52 @@
+from app.services.vector_store.pg_schema import (
+    PARTITIONED_TABLE,
+    catalog_backfill_sql,
+    filter_values,
+    partition_key_of,
+    partition_sql,
+    typed_columns_sql,
+)
+
+
+def test_filter_values():
+    assert filter_values("a") == ["a"]
+    assert filter_values({"$eq": "a"}) == ["a"]
+    assert filter_values({"$in": ["a", "b"]}) == ["a", "b"]
+    # Other operators are left to the generic metadata filter
+    assert filter_values({"$ne": "a"}) is None
+    assert filter_values(None) is None
+
+
+def test_partition_key_of():
+    assert partition_key_of(None) == ""
+    assert partition_key_of("HASH (((cmetadata ->> 'file_id'::text)))") == "file_id"
+    assert partition_key_of("LIST (((cmetadata ->> 'user_id'::text)))") == "user_id"
+
+
+def test_hash_partitions():
+    statements = partition_sql("file_id", "hash", 4)
+    assert "PARTITION BY HASH ((cmetadata->>'file_id'))" in statements[0]
+    assert sum("MODULUS 4" in statement for statement in statements) == 4
+
+
+def test_list_partitions_quote_values_and_add_default():
+    statements = partition_sql("user_id", "list", values=["alice", "o'neil"])
+    assert any("FOR VALUES IN ('o''neil')" in statement for statement in statements)
+    assert any(
+        statement.endswith(f"PARTITION OF {PARTITIONED_TABLE} DEFAULT")
+        for statement in statements
+    )
+
+
+def test_typed_columns_trigger_populates_both_columns():
+    statements = typed_columns_sql()
+    assert "ADD COLUMN IF NOT EXISTS file_id text" in statements[0]
+    assert "NEW.user_id := NEW.cmetadata->>'user_id';" in statements[1]
+
+
+def test_catalog_backfill_recomputes_existing_entries():
+    sql = catalog_backfill_sql()
+    assert "WHERE custom_id > $1" in sql and "LIMIT $2" in sql
+    # Files ingested before the catalog existed may have partial rows since
+    assert "DO UPDATE SET" in sql
+    assert "chunk_count = EXCLUDED.chunk_count" in sql
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.services.vector_store.qdrant_quantization import (
+    benchmark,
+    configure_collection,
+    quantization_config,
+    search_params,
+)
+
+
+def test_quantization_config():
+    scalar = quantization_config("scalar")
+    assert scalar.scalar.type == models.ScalarType.INT8
+    assert scalar.scalar.always_ram
+    assert not quantization_config("binary", always_ram=False).binary.always_ram
+    assert quantization_config("none") == models.Disabled.DISABLED
+    with pytest.raises(ValueError):
+        quantization_config("product")
+
+
+def test_search_params():
+    assert search_params() is None
+    params = search_params(hnsw_ef=128, rescore=True, oversampling=2.0)
+    assert params.hnsw_ef == 128
+    assert params.quantization.rescore
+    assert params.quantization.oversampling == 2.0
+    assert search_params(hnsw_ef=64).quantization is None
+
+
+def test_configure_collection_creates_quantized_collection():
+    client = QdrantClient(location=":memory:")
+    configure_collection(client, "chunks", "scalar", on_disk=True, dimensions=8)
+
+    config = client.get_collection("chunks").config
+    assert config.params.vectors.size == 8
+    assert config.params.vectors.on_disk
+    with pytest.raises(SystemExit):
+        configure_collection(client, "missing", "binary")
+
+
+def test_benchmark_reports_every_configuration():
+    vectors = np.random.default_rng(1).standard_normal((200, 8)).astype(np.float32)
+    client = QdrantClient(location=":memory:")
+
+    report = benchmark(
+        client, vectors, ["none", "binary"], [64], [1.0, 2.0], queries=5, k=3
+    )
+
+    assert set(report) == {("none", 64, None), ("binary", 64, 1.0), ("binary", 64, 2.0)}
+    # The embedded mode searches exhaustively
+    assert all(row["recall"] == 1.0 for row in report.values())
+    assert not client.get_collections().collections
@@ -1,11 +1,22 @@
+import asyncio
 import unittest
-from unittest.mock import patch, MagicMock
-from app.services.vector_store.qdrant_vector import QdrantVector
+import uuid
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.services.vector_store.file_catalog import catalog_point_id
+from app.services.vector_store.qdrant_vector import CATALOG_STATE_POINT, QdrantVector
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
 
-class TestQdrantVector(unittest.TestCase):
+def fake_qdrant_init(self, client, collection_name, embeddings, async_client):
+    """Sets the attributes of langchain's Qdrant without validating the clients."""
+    self._embeddings = embeddings
+    self.content_payload_key = "page_content"
+    self.metadata_payload_key = "metadata"
+    self.vector_name = None
+
+
+class TestQdrantVector(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         """Set up test fixtures before each test method."""
         # Create a mock embeddings object
@@ -13,116 +24,307 @@ class TestQdrantVector(unittest.TestCase):
         self.mock_embeddings.embed_query.return_value = [0.1, 0.2, 0.3, 0.4]
         
         # Create a QdrantVector instance with mock parameters
-        with patch('app.services.vector_store.qdrant_vector.Qdrant.__init__', return_value=None):
-            # We also need to patch QdrantClient here because __init__ calls it
-            with patch('app.services.vector_store.qdrant_vector.QdrantClient') as mock_qdrant_client:
+        with patch('app.services.vector_store.qdrant_vector.Qdrant.__init__', fake_qdrant_init):
+            # We also need to patch both clients here because __init__ creates them
+            with patch('app.services.vector_store.qdrant_vector.QdrantClient') as mock_qdrant_client, \
+                    patch('app.services.vector_store.qdrant_vector.AsyncQdrantClient') as mock_async_client:
                 self.mock_client_instance = MagicMock()
                 mock_qdrant_client.return_value = self.mock_client_instance
+                self.mock_async_client = AsyncMock()
+                mock_async_client.return_value = self.mock_async_client
                 
                 self.qdrant_vector = QdrantVector(
                     url="http://localhost:6333",
                     api_key=None,
                     collection_name="test_collection",
-                    embeddings=self.mock_embeddings
+                    embeddings=self.mock_embeddings,
+                    upsert_batch_size=2,
                 )
-            
-    @patch('app.services.vector_store.qdrant_vector.Qdrant.add_documents')
-    def test_add_documents(self, mock_add_documents):
-        """Test add_documents method."""
-        # Create test documents
+
+    def test_payload_indexes_are_created(self):
+        """Test keyword payload indexes on file_id and user_id."""
+        fields = {
+            (call.kwargs["collection_name"], call.kwargs["field_name"])
+            for call in self.mock_client_instance.create_payload_index.call_args_list
+        }
+        self.assertIn(("test_collection", "metadata.file_id"), fields)
+        self.assertIn(("test_collection", "metadata.user_id"), fields)
+        self.assertIn(("test_collection_files", "file_id"), fields)
+
+    async def test_add_documents(self):
+        """Test aadd_documents upserts one point per chunk in batches."""
         docs = [
-            Document(page_content="Test document 1", metadata={"source": "test1"}),
-            Document(page_content="Test document 2", metadata={"source": "test2"})
+            Document(page_content=f"Test document {i}", metadata={"source": "test"})
+            for i in range(3)
         ]
-        ids = ["id1", "id2"]
+        self.mock_embeddings.embed_documents.return_value = [[0.1, 0.2]] * 3
+        self.mock_async_client.retrieve.return_value = []
         
-        # Mock the parent class method
-        mock_add_documents.return_value = ["id1", "id2"]
+        result = await self.qdrant_vector.aadd_documents(docs, ids=["file1"] * 3)
         
-        # Call the method
-        result = self.qdrant_vector.add_documents(docs, ids)
-        
-        # Assertions
-        self.assertEqual(result, ["id1", "id2"])
-        mock_add_documents.assert_called_once()
+        self.assertEqual(result, ["file1"] * 3)
+        upserts = [
+            call.kwargs["points"]
+            for call in self.mock_async_client.upsert.call_args_list
+            if call.kwargs["collection_name"] == "test_collection"
+        ]
+        self.assertEqual([len(points) for points in upserts], [2, 1])
+        points = [point for batch in upserts for point in batch]
+        # Every chunk gets its own point id, tagged with the file_id
+        self.assertEqual(len({point.id for point in points}), 3)
+        self.assertEqual(
+            [point.payload["metadata"]["file_id"] for point in points], ["file1"] * 3
+        )
+        # The documents passed in are not modified
+        self.assertNotIn("file_id", docs[0].metadata)
         
-    @patch('app.services.vector_store.qdrant_vector.Qdrant.similarity_search_with_score')
+    @patch('app.services.vector_store.qdrant_vector.Qdrant.similarity_search_with_score_by_vector')
     def test_similarity_search_with_score_by_vector(self, mock_similarity_search):
         """Test similarity_search_with_score_by_vector method."""
         # Mock the parent class method
-        mock_doc = Document(page_content="Test document", metadata={"source": "test"})
+        mock_doc = Document(
+            page_content="Test document", metadata={"source": "test", "_id": "point"}
+        )
         mock_similarity_search.return_value = [(mock_doc, 0.8)]
         
         # Call the method
         result = self.qdrant_vector.similarity_search_with_score_by_vector(
             embedding=[0.1, 0.2, 0.3, 0.4],
-            k=4
+            k=4,
+            filter={"file_id": {"$in": ["a", "b"]}},
         )
         
-        # Assertions
+        # Assertions: the vector is searched as is, not embedded again
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0][1], 0.8)  # score
-        mock_similarity_search.assert_called_once()
+        self.assertEqual(result[0][0].metadata, {"source": "test"})
+        self.assertEqual(mock_similarity_search.call_args.args[0], [0.1, 0.2, 0.3, 0.4])
+        condition = mock_similarity_search.call_args.kwargs["filter"].must[0]
+        self.assertEqual(condition.key, "metadata.file_id")
+        self.assertEqual(condition.match.any, ["a", "b"])
+        self.mock_embeddings.embed_query.assert_not_called()
         
-    def test_get_all_ids(self):
-        """Test get_all_ids method."""
-        # Mock the Qdrant client response on the instance
-        self.mock_client_instance.scroll.return_value = (
-            [MagicMock(payload={"file_id": "test_id_1"}), MagicMock(payload={"file_id": "test_id_2"})],
-            None  # No next page
+    def fake_scroll(self, points):
+        """A scroll over `points` in point id order, two per page."""
+        points = sorted(points, key=lambda point: str(point.id))
+
+        async def scroll(collection_name, limit, offset, with_payload, with_vectors):
+            remaining = [point for point in points if str(point.id) >= str(offset)]
+            next_offset = remaining[2].id if len(remaining) > 2 else None
+            return remaining[:2], next_offset
+
+        return scroll
+
+    @patch('app.services.vector_store.qdrant_vector.Qdrant.asimilarity_search_with_score_by_vector')
+    async def test_search_params_override_defaults(self, mock_similarity_search):
+        """Test per-query search options are merged over the configured defaults."""
+        mock_similarity_search.return_value = []
+        self.qdrant_vector.search_defaults = {"hnsw_ef": 64, "rescore": True}
+
+        await self.qdrant_vector.asimilarity_search_with_score_by_vector(
+            [0.1, 0.2], k=4, search_params={"oversampling": 2.0}
         )
+
+        params = mock_similarity_search.call_args.kwargs["search_params"]
+        self.assertEqual(params.hnsw_ef, 64)
+        self.assertTrue(params.quantization.rescore)
+        self.assertEqual(params.quantization.oversampling, 2.0)
+
+    async def test_get_all_ids(self):
+        """Test get_all_ids scans the catalog in concurrent id ranges."""
+        file_ids = [f"file_{i}" for i in range(20)]
+        self.mock_async_client.scroll.side_effect = self.fake_scroll(
+            [
+                MagicMock(id=uuid.UUID(catalog_point_id(file_id)), payload={"file_id": file_id})
+                for file_id in file_ids
+            ]
+        )
+
+        result = await self.qdrant_vector.get_all_ids()
         
-        # Call the method
-        result = self.qdrant_vector.get_all_ids()
-        
-        # Assertions
-        self.assertEqual(len(result), 2)
-        self.assertIn("test_id_1", result)
-        self.assertIn("test_id_2", result)
-        self.mock_client_instance.scroll.assert_called()
+        # Every file once, whichever shard its point id falls in
+        self.assertEqual(result, sorted(file_ids))
+        self.assertEqual(
+            await self.qdrant_vector.get_all_ids(limit=2, after="file_10"),
+            ["file_11", "file_12"],
+        )
+        self.assertEqual(
+            self.mock_async_client.scroll.call_args.kwargs["with_payload"], ["file_id"]
+        )
+
+    async def test_get_all_ids_fails_on_page_errors(self):
+        """Test a failing page is retried, then fails instead of a partial list."""
+        self.mock_async_client.scroll.side_effect = ConnectionError("reset")
+        self.qdrant_vector.scan_shards = 1
+
+        with self.assertRaises(ConnectionError):
+            await self.qdrant_vector.get_all_ids()
+        self.assertEqual(
+            self.mock_async_client.scroll.call_count, self.qdrant_vector.page_attempts
+        )
         
-    def test_get_filtered_ids(self):
+    async def test_get_filtered_ids(self):
         """Test get_filtered_ids method."""
-        # Mock the Qdrant client response on the instance
-        self.mock_client_instance.scroll.return_value = (
-            [MagicMock(payload={"file_id": "filtered_id_1"})],
-            None  # No next page
+        # Mock the file catalog lookup on the instance; the catalog predates
+        # no complete marker, so chunks are checked for the ids it lacks
+        self.mock_async_client.retrieve.side_effect = lambda **kwargs: (
+            []
+            if kwargs["ids"] == [CATALOG_STATE_POINT]
+            else [MagicMock(payload={"file_id": "filtered_id_1"})]
         )
+        # Chunks stored before the catalog existed are counted, one request per
+        # file on clients without facets
+        del self.mock_async_client.facet
+        self.mock_async_client.count.return_value = MagicMock(count=0)
         
         # Call the method
-        result = self.qdrant_vector.get_filtered_ids(["filtered_id_1", "filtered_id_2"])
+        result = await self.qdrant_vector.get_filtered_ids(["filtered_id_1", "filtered_id_2"])
         
         # Assertions
-        self.assertEqual(len(result), 1)
-        self.assertIn("filtered_id_1", result)
-        self.mock_client_instance.scroll.assert_called()
+        self.assertEqual(result, ["filtered_id_1"])
+        self.assertEqual(
+            self.mock_async_client.retrieve.call_args_list[0].kwargs["collection_name"],
+            "test_collection_files",
+        )
+        condition = self.mock_async_client.count.call_args.kwargs["count_filter"].must[0]
+        self.assertEqual(condition.match.value, "filtered_id_2")
+
+    async def test_legacy_files_are_listed_until_the_catalog_is_complete(self):
+        """Test files missing from an incomplete catalog are found among the chunks."""
+        self.qdrant_vector.scan_shards = 1
+        self.mock_async_client.scroll.side_effect = self.fake_scroll(
+            [
+                MagicMock(
+                    id=uuid.UUID(catalog_point_id("new")), payload={"file_id": "new"}
+                )
+            ]
+        )
+        self.mock_async_client.facet.return_value = MagicMock(
+            hits=[MagicMock(value="legacy", count=2)]
+        )
+        self.mock_async_client.retrieve.return_value = []
+
+        self.assertEqual(await self.qdrant_vector.get_all_ids(), ["legacy", "new"])
+        self.assertEqual(
+            await self.qdrant_vector.get_filtered_ids(["legacy", "gone"]), ["legacy"]
+        )
+
+        # Once complete, the catalog alone answers
+        self.mock_async_client.retrieve.return_value = [
+            MagicMock(payload={"file_catalog_complete": True})
+        ]
+        self.mock_async_client.facet.reset_mock()
+        self.assertEqual(await self.qdrant_vector.get_all_ids(), ["new"])
+        self.mock_async_client.facet.assert_not_called()
+
+    async def test_first_ingest_records_catalog_state(self):
+        """Test a catalog started on an empty collection is marked complete."""
+        self.mock_embeddings.embed_documents.return_value = [[0.1, 0.2]]
+        self.mock_async_client.retrieve.return_value = []
+        self.mock_async_client.count.return_value = MagicMock(count=0)
+
+        await self.qdrant_vector.aadd_documents([Document(page_content="a")], ids=["f"])
+
+        [state] = [
+            point
+            for call in self.mock_async_client.upsert.call_args_list
+            for point in call.kwargs["points"]
+            if point.id == CATALOG_STATE_POINT
+        ]
+        self.assertEqual(state.payload, {"file_catalog_complete": True})
+
+    async def test_concurrent_catalog_updates_both_count(self):
+        """Test concurrent ingests of one file do not overwrite each other's counts."""
+        catalog = {}
+
+        async def retrieve(collection_name, ids, with_payload):
+            await asyncio.sleep(0)
+            return [MagicMock(payload=catalog[id]) for id in ids if id in catalog]
+
+        async def upsert(collection_name, points):
+            await asyncio.sleep(0)
+            catalog.update({point.id: point.payload for point in points})
+
+        self.mock_async_client.retrieve.side_effect = retrieve
+        self.mock_async_client.upsert.side_effect = upsert
+        delta = {
+            "file_id": "f",
+            "user_id": None,
+            "chunk_count": 2,
+            "byte_size": 10,
+            "content_hash": "hash",
+        }
+
+        await asyncio.gather(
+            self.qdrant_vector._add_to_catalog({"f": dict(delta)}),
+            self.qdrant_vector._add_to_catalog({"f": dict(delta)}),
+        )
+
+        self.assertEqual(catalog[catalog_point_id("f")]["chunk_count"], 4)
+
+    async def test_count_chunks_uses_facets_when_available(self):
+        """Test per-file counts come from one facet request on newer clients."""
+        self.mock_async_client.facet.return_value = MagicMock(
+            hits=[MagicMock(value="a", count=3)]
+        )
+
+        counts = await self.qdrant_vector.count_chunks(["a", "b"])
+
+        self.assertEqual(counts, {"a": 3, "b": 0})
+        self.mock_async_client.count.assert_not_called()
         
-    def test_get_documents_by_ids(self):
+    async def test_get_documents_by_ids(self):
         """Test get_documents_by_ids method."""
         # Mock the Qdrant client response on the instance
         mock_point = MagicMock()
         mock_point.payload = {"page_content": "Test content", "source": "test", "file_id": "doc_id_1"}
-        self.mock_client_instance.scroll.return_value = (
+        self.mock_async_client.scroll.return_value = (
             [mock_point],
             None  # No next page
         )
         
         # Call the method
-        result = self.qdrant_vector.get_documents_by_ids(["doc_id_1"])
+        result = await self.qdrant_vector.get_documents_by_ids(["doc_id_1"])
         
         # Assertions
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].page_content, "Test content")
         self.assertEqual(result[0].metadata["source"], "test")
-        self.mock_client_instance.scroll.assert_called()
+        self.mock_async_client.scroll.assert_called()
+        self.assertFalse(
+            self.mock_async_client.scroll.call_args.kwargs["with_vectors"]
+        )
+
+    async def test_fetch_documents_by_ids_reports_missing_ids(self):
+        """Test fetch_documents_by_ids method."""
+        mock_point = MagicMock()
+        mock_point.payload = {
+            "page_content": "Test content",
+            "metadata": {"file_id": "doc_id_1"},
+        }
+        self.mock_async_client.scroll.return_value = ([mock_point], None)
+
+        documents, missing = await self.qdrant_vector.fetch_documents_by_ids(
+            ["doc_id_1", "doc_id_2"]
+        )
+
+        self.assertEqual(documents[0].metadata, {"file_id": "doc_id_1"})
+        self.assertEqual(missing, ["doc_id_2"])
         
-    def test_delete(self):
+    async def test_delete(self):
         """Test delete method."""
         # Call the method
-        self.qdrant_vector.delete(["delete_id_1", "delete_id_2"])
+        await self.qdrant_vector.delete(["delete_id_1", "delete_id_2"])
         
-        # Assertions
-        self.mock_client_instance.delete.assert_called_once()
+        # Assertions: chunk points and their catalog points are deleted
+        calls = self.mock_async_client.delete.call_args_list
+        self.assertEqual(len(calls), 2)
+        condition = calls[0].kwargs["points_selector"].must[0]
+        self.assertEqual(condition.key, "metadata.file_id")
+        self.assertEqual(
+            calls[1].kwargs["collection_name"],
+            "test_collection_files",
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,153 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services.vector_store.quantization import (
+    HALFVEC,
+    STORAGE_KEY,
+    candidate_search_sql,
+    create_index_sql,
+    distance_strategy,
+    index_name,
+    normalize,
+    quantized_distance,
+    quantized_expression,
+    storage_settings,
+    supports_iterative_scan,
+    unit_normalized,
+)
+
+COLLECTION_ID = "0f8b7c2e-1234-4abc-9def-00112233aabb"
+
+
+def test_storage_settings_default_to_float():
+    assert storage_settings(None) is None
+    assert storage_settings({}) is None
+    assert storage_settings({"vector_storage": {"type": "float"}}) is None
+    settings = {"type": "binary", "dimensions": 3}
+    assert storage_settings({"vector_storage": settings}) == settings
+
+
+def test_query_uses_the_indexed_expression():
+    for storage in ("halfvec", "binary"):
+        index = create_index_sql(storage, 1536, COLLECTION_ID)
+        order_by = quantized_distance(storage, 1536, ":query_vector")
+        expression = quantized_expression(storage, 1536)
+        assert f"USING hnsw ({expression} " in index
+        assert order_by.startswith(expression)
+        assert f"WHERE collection_id = '{COLLECTION_ID}'" in index
+        assert index_name(storage, COLLECTION_ID) in index
+
+
+def test_distance_operators():
+    assert "<=>" in quantized_distance("halfvec", 3, "$2")
+    assert "<->" in quantized_distance("halfvec", 3, "$2", "l2")
+    assert "<~>" in quantized_distance("binary", 3, "$2")
+    assert "halfvec_ip_ops" in create_index_sql("halfvec", 3, COLLECTION_ID, "inner")
+
+
+def test_distance_strategy_defaults_to_cosine():
+    assert distance_strategy(None) == "cosine"
+    assert distance_strategy({"vector_storage": {"type": "halfvec"}}) == "cosine"
+    assert distance_strategy({"distance_strategy": "inner"}) == "inner"
+
+
+def test_normalized_embeddings_are_detected():
+    assert unit_normalized([[0.6, 0.8], [1.0, 0.0]])
+    assert not unit_normalized([[0.6, 0.8], [3.0, 4.0]])
+
+    normalized = normalize([[3.0, 4.0], [0.0, 2.0]])
+    assert unit_normalized(normalized)
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 1.0]], rtol=1e-6)
+
+
+def test_filtered_candidates_need_iterative_scan():
+    assert supports_iterative_scan("0.8.0")
+    assert supports_iterative_scan("0.10.1")
+    assert not supports_iterative_scan("0.7.4")
+    assert not supports_iterative_scan(None)
+
+    # Without iterative scans, a filter would cut the candidates HNSW returns
+    assert candidate_search_sql(40, filtered=True, iterative_scan=False) is None
+    assert candidate_search_sql(40, filtered=False, iterative_scan=False) == []
+    assert candidate_search_sql(80, filtered=True, iterative_scan=True) == [
+        "SET LOCAL hnsw.ef_search = 80",
+        "SET LOCAL hnsw.iterative_scan = relaxed_order",
+    ]
+
+
+def test_large_candidate_searches_stay_within_ef_search_bound():
+    # pgvector rejects an hnsw.ef_search above 1000
+    assert candidate_search_sql(5000, filtered=False, iterative_scan=True) == [
+        "SET LOCAL hnsw.ef_search = 1000",
+        "SET LOCAL hnsw.iterative_scan = relaxed_order",
+    ]
+    assert candidate_search_sql(1000, filtered=False, iterative_scan=False) == [
+        "SET LOCAL hnsw.ef_search = 1000",
+    ]
+    # A single scan cannot return more candidates than that
+    assert candidate_search_sql(1001, filtered=False, iterative_scan=False) is None
+
+
+@pytest.mark.skipif(
+    not os.getenv("PGVECTOR_TEST_DSN"),
+    reason="PGVECTOR_TEST_DSN is not set to a pgvector database",
+)
+def test_quantized_search_recall_with_selective_filter():
+    import sqlalchemy
+    from sqlalchemy.orm import Session
+    from langchain_core.embeddings import FakeEmbeddings
+    from app.services.vector_store.extended_pg_vector import ExtendedPgVector
+
+    dimensions, rare = 32, 20
+    vectors = normalize(np.random.default_rng(0).standard_normal((2000, dimensions)))
+    file_ids = [
+        "rare" if i % 100 == 0 else f"file-{i % 7}" for i in range(len(vectors))
+    ]
+    store = ExtendedPgVector(
+        connection_string=os.environ["PGVECTOR_TEST_DSN"],
+        embedding_function=FakeEmbeddings(size=dimensions),
+        collection_name=f"recall_{uuid.uuid4().hex}",
+        use_jsonb=True,
+    )
+    try:
+        store.add_embeddings(
+            [str(i) for i in range(len(vectors))],
+            vectors,
+            [{"file_id": file_id} for file_id in file_ids],
+            file_ids,
+        )
+        with Session(store._bind) as session:
+            collection = store.get_collection(session)
+            collection.cmetadata = {
+                **(collection.cmetadata or {}),
+                STORAGE_KEY: {"type": HALFVEC, "dimensions": dimensions},
+            }
+            session.execute(
+                sqlalchemy.text(
+                    create_index_sql(
+                        HALFVEC, dimensions, collection.uuid, concurrently=False
+                    )
+                )
+            )
+            session.commit()
+
+        query = vectors[1]
+        candidates = [i for i, file_id in enumerate(file_ids) if file_id == "rare"]
+        assert len(candidates) == rare
+        expected = sorted(candidates, key=lambda i: -np.dot(vectors[i], query))[:10]
+        results = store._query_collection(query, k=10, filter={"file_id": "rare"})
+        assert [int(row.EmbeddingStore.document) for row in results] == expected
+    finally:
+        with Session(store._bind) as session:
+            collection = store.get_collection(session)
+            if collection:
+                session.execute(
+                    sqlalchemy.text(
+                        f"DROP INDEX IF EXISTS {index_name(HALFVEC, collection.uuid)}"
+                    )
+                )
+                session.commit()
+        store.delete_collection()
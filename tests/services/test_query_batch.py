@@ -0,0 +1,65 @@
+import asyncio
+
+
+from app.services.query_batch import QueryEmbeddingBatch
+
+
+def embed(query):
+    return [float(len(query))]
+
+
+async def search(batch, query, cached=False):
+    if cached:
+        return "cached"
+    return await batch.embed(query)
+
+
+def test_concurrent_queries_share_one_provider_call():
+    calls = []
+
+    def embed_many(queries):
+        calls.append(queries)
+        return [embed(query) for query in queries]
+
+    async def run():
+        batch = QueryEmbeddingBatch(embed, embed_many)
+        results = await asyncio.gather(
+            search(batch, "a"),
+            search(batch, "bb"),
+            search(batch, "a"),
+            search(batch, "ccc", cached=True),
+        )
+        return batch, results
+
+    batch, results = asyncio.run(run())
+
+    assert results == [[1.0], [2.0], [1.0], "cached"]
+    assert calls == [["a", "bb"]]
+    assert batch.provider_calls == 1
+
+
+def test_falls_back_to_single_embeddings():
+    async def run():
+        batch = QueryEmbeddingBatch(embed)
+        results = await asyncio.gather(search(batch, "a"), search(batch, "bb"))
+        return batch, results
+
+    batch, results = asyncio.run(run())
+
+    assert results == [[1.0], [2.0]]
+    assert batch.provider_calls == 2
+
+
+def test_provider_errors_reach_every_query():
+    def embed_many(queries):
+        raise RuntimeError("provider down")
+
+    async def run():
+        batch = QueryEmbeddingBatch(embed, embed_many)
+        return await asyncio.gather(
+            search(batch, "a"), search(batch, "b"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
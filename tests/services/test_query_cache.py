@@ -0,0 +1,199 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.services import invalidation
+from app.services.invalidation import FileInvalidationBus, PgNotifyInvalidationBus
+from app.services.query_cache import (
+    QueryResultCache,
+    estimate_result_size,
+    filter_file_ids,
+)
+
+
+def make_results(file_id, text="Queried content"):
+    return [(Document(page_content=text, metadata={"file_id": file_id}), 0.9)]
+
+
+def test_filter_file_ids():
+    assert filter_file_ids({"file_id": "a"}) == ["a"]
+    assert filter_file_ids({"file_id": {"$in": ["a", "b"]}}) == ["a", "b"]
+    assert filter_file_ids(None) == []
+
+
+def test_get_put_and_key_includes_search_params():
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    key = cache.make_key("query", {"file_id": "a"}, 4)
+    assert cache.get(key) is None
+
+    results = make_results("a")
+    assert cache.put(key, ["a"], results)
+    assert cache.get(key) is results
+    assert cache.get(cache.make_key("query", {"file_id": "a"}, 5)) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_only_affected_files():
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    key_a = cache.make_key("query", {"file_id": "a"}, 4)
+    key_ab = cache.make_key("query", {"file_id": {"$in": ["a", "b"]}}, 4)
+    key_c = cache.make_key("query", {"file_id": "c"}, 4)
+    cache.put(key_a, ["a"], make_results("a"))
+    cache.put(key_ab, ["a", "b"], make_results("b"))
+    cache.put(key_c, ["c"], make_results("c"))
+
+    cache.invalidate_files(["b"])
+
+    assert cache.get(key_a) is not None
+    assert cache.get(key_ab) is None
+    assert cache.get(key_c) is not None
+
+
+def test_put_rejected_after_concurrent_invalidation():
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    key = cache.make_key("query", {"file_id": "a"}, 4)
+    generation = cache.generation()
+    cache.invalidate_files(["a"])
+    assert not cache.put(key, ["a"], make_results("a"), generation)
+    assert cache.get(key) is None
+
+    # Invalidations of other files do not affect the search
+    generation = cache.generation()
+    cache.invalidate_files(["b"])
+    assert cache.put(key, ["a"], make_results("a"), generation)
+
+
+def test_evicts_least_recently_used_when_over_budget():
+    results = make_results("a", text="x" * 1000)
+    max_bytes = 2 * estimate_result_size(results) + 10
+    cache = QueryResultCache(max_bytes=max_bytes)
+    keys = [cache.make_key(f"query {i}", {"file_id": "a"}, 4) for i in range(3)]
+    cache.put(keys[0], ["a"], results)
+    cache.put(keys[1], ["a"], results)
+    cache.get(keys[0])
+    cache.put(keys[2], ["a"], results)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["bytes"] <= max_bytes
+
+
+@pytest.mark.asyncio
+async def test_invalidation_bus_reaches_subscribers():
+    bus = FileInvalidationBus()
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    bus.subscribe(cache)
+    key = cache.make_key("query", {"file_id": "a"}, 4)
+    cache.put(key, ["a"], make_results("a"))
+
+    await bus.publish(["a", "a", ""])
+
+    assert cache.get(key) is None
+
+
+class FakePool:
+    def __init__(self):
+        self.notified = []
+
+    def acquire(self):
+        pool = self
+
+        class Connection:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, channel, payload):
+                pool.notified.append(payload)
+
+        return Connection()
+
+
+@pytest.mark.asyncio
+async def test_peers_are_notified_while_not_listening(monkeypatch):
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(invalidation.PSQLDatabase, "get_pool", get_pool)
+    bus = PgNotifyInvalidationBus("test_channel")
+    assert bus._conn is None
+
+    await bus.publish(["a"])
+
+    assert len(pool.notified) == 1
+    assert '"a"' in pool.notified[0]
+
+
+@pytest.mark.asyncio
+async def test_publish_survives_pool_errors(monkeypatch):
+    async def get_pool():
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(invalidation.PSQLDatabase, "get_pool", get_pool)
+    bus = PgNotifyInvalidationBus("test_channel")
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    bus.subscribe(cache)
+    key = cache.make_key("query", {"file_id": "a"}, 4)
+    cache.put(key, ["a"], make_results("a"))
+
+    await bus.publish(["a"])
+
+    assert cache.get(key) is None
+
+
+class FakeListenerConnection:
+    def __init__(self):
+        self.on_termination = None
+
+    def add_termination_listener(self, callback):
+        self.on_termination = callback
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    async def remove_listener(self, channel, callback):
+        pass
+
+    def is_closed(self):
+        return False
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_caches_are_bypassed_until_the_listener_reconnects(monkeypatch):
+    connections, failures = [], []
+
+    async def connect(dsn):
+        if failures:
+            raise failures.pop(0)
+        connections.append(FakeListenerConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(invalidation.asyncpg, "connect", connect)
+    monkeypatch.setattr(invalidation, "MAX_RECONNECT_DELAY", 0.01)
+    bus = PgNotifyInvalidationBus("test_channel")
+    cache = QueryResultCache(max_bytes=1024 * 1024)
+    bus.subscribe(cache)
+    key = cache.make_key("query", {"file_id": "a"}, 4)
+    await bus.start()
+    failures.extend([ConnectionError("database is down")] * 2)
+    cache.put(key, ["a"], make_results("a"))
+    generation = cache.generation()
+
+    connections[0].on_termination(connections[0])
+
+    assert cache.get(key) is None
+    assert not cache.put(key, ["a"], make_results("a"))
+    await bus._reconnecting
+
+    # Retried past both failures, then resumed without trusting older values
+    assert len(connections) == 2 and bus._conn is connections[1]
+    assert not cache.put(key, ["a"], make_results("a"), generation)
+    assert cache.put(key, ["a"], make_results("a"))
+    assert cache.get(key) is not None
+    await bus.stop()
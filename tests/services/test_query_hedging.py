@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from app.services.query_hedging import QueryHedger
+
+
+class SlowFirstCall:
+    """Answers slowly on its first call only, like a provider latency spike."""
+
+    def __init__(self, slow=0.5):
+        self.slow = slow
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(self.slow)
+            return "primary"
+        return "hedge"
+
+
+def test_fast_request_is_not_hedged():
+    hedger = QueryHedger(initial_delay=0.5)
+
+    assert hedger.call(lambda: "fast") == "fast"
+    assert hedger.stats()["hedges"] == 0
+
+
+def test_slow_request_is_hedged_and_hedge_wins():
+    hedger = QueryHedger(initial_delay=0.02, budget=1.0)
+    provider = SlowFirstCall()
+
+    start = time.monotonic()
+    assert hedger.call(provider) == "hedge"
+
+    assert time.monotonic() - start < 0.4
+    stats = hedger.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_hedges_are_capped_by_budget():
+    hedger = QueryHedger(initial_delay=0.01, budget=0.0)
+    hedger._credits = 0.0
+
+    assert hedger.call(SlowFirstCall(slow=0.05)) == "primary"
+    stats = hedger.stats()
+    assert stats["hedges"] == 0
+    assert stats["over_budget"] == 1
+
+
+def test_delay_follows_latency_percentile():
+    hedger = QueryHedger(percentile=50, initial_delay=1.0, min_samples=3)
+    assert hedger.delay() == 1.0
+
+    hedger._latencies.extend([0.01, 0.02, 0.03])
+    assert hedger.delay() == pytest.approx(0.02)
+
+
+def test_failed_primary_falls_back_to_hedge():
+    hedger = QueryHedger(initial_delay=0.01, budget=1.0)
+    calls = []
+
+    def provider():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.05)
+            raise ConnectionError("reset")
+        time.sleep(0.1)
+        return "hedge"
+
+    assert hedger.call(provider) == "hedge"
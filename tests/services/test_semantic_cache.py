@@ -0,0 +1,60 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from app.services.semantic_cache import SemanticQueryCache
+
+
+def make_results(file_id):
+    return [(Document(page_content="content", metadata={"file_id": file_id}), 0.9)]
+
+
+def test_paraphrase_hits_and_distinct_query_misses():
+    cache = SemanticQueryCache(threshold=0.95, max_entries=4, max_filters=4)
+    key = cache.make_key({"file_id": "a"}, 4)
+    results = make_results("a")
+    cache.put(key, ["a"], [1.0, 0.0, 0.0], results)
+
+    assert cache.get(key, [0.99, 0.05, 0.0]) is results
+    assert cache.get(key, [0.0, 1.0, 0.0]) is None
+    # Same embedding under another filter is a miss
+    assert cache.get(cache.make_key({"file_id": "b"}, 4), [1.0, 0.0, 0.0]) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert sum(stats["similarity_histogram"].values()) == 1
+
+
+def test_least_recently_used_entry_is_replaced():
+    cache = SemanticQueryCache(threshold=0.99, max_entries=2, max_filters=4)
+    key = cache.make_key({"file_id": "a"}, 4)
+    cache.put(key, ["a"], [1.0, 0.0, 0.0], make_results("a"))
+    cache.put(key, ["a"], [0.0, 1.0, 0.0], make_results("a"))
+    cache.get(key, [1.0, 0.0, 0.0])
+    cache.put(key, ["a"], [0.0, 0.0, 1.0], make_results("a"))
+
+    assert cache.get(key, [1.0, 0.0, 0.0]) is not None
+    assert cache.get(key, [0.0, 1.0, 0.0]) is None
+    assert cache.get(key, [0.0, 0.0, 1.0]) is not None
+
+
+def test_bucket_grows_up_to_max_entries():
+    cache = SemanticQueryCache(threshold=0.99, max_entries=20, max_filters=4)
+    key = cache.make_key({"file_id": "a"}, 4)
+    for i in range(20):
+        cache.put(key, ["a"], np.eye(20)[i], make_results("a"))
+
+    assert cache.stats()["entries"] == 20
+    assert all(cache.get(key, np.eye(20)[i]) is not None for i in range(20))
+
+
+def test_invalidation_drops_filter_and_rejects_stale_put():
+    cache = SemanticQueryCache(threshold=0.95, max_entries=4, max_filters=4)
+    key = cache.make_key({"file_id": {"$in": ["a", "b"]}}, 4)
+    cache.put(key, ["a", "b"], [1.0, 0.0], make_results("a"))
+
+    generation = cache.generation()
+    cache.invalidate_files(["b"])
+
+    assert cache.get(key, [1.0, 0.0]) is None
+    assert not cache.put(key, ["a", "b"], [1.0, 0.0], make_results("a"), generation)
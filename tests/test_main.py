@@ -58,11 +58,38 @@ def override_vector_store(monkeypatch):
         vector_store, "get_documents_by_ids", dummy_get_documents_by_ids
     )
 
+    # Override get_file_catalog as an async function.
+    async def dummy_get_file_catalog(ids, executor=None):
+        return [
+            {
+                "file_id": id,
+                "content_hash": "hash",
+                "chunk_count": 1,
+                "updated_at": "2024-01-01T00:00:00+00:00",
+            }
+            for id in await dummy_get_filtered_ids(ids)
+        ]
+
+    monkeypatch.setattr(vector_store, "get_file_catalog", dummy_get_file_catalog)
+
+    # Override fetch_documents_by_ids as an async function.
+    async def dummy_fetch_documents_by_ids(ids, executor=None):
+        documents = await dummy_get_documents_by_ids(ids)
+        existing_ids = await dummy_get_filtered_ids(ids)
+        return documents, [id for id in ids if id not in existing_ids]
+
+    monkeypatch.setattr(
+        vector_store, "fetch_documents_by_ids", dummy_fetch_documents_by_ids
+    )
+
     # Override embedding_function.
     class DummyEmbedding:
         def embed_query(self, query):
             return [0.1, 0.2, 0.3]
 
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
     vector_store.embedding_function = DummyEmbedding()
 
     # Override similarity search to return a tuple (Document, score).
@@ -160,6 +187,73 @@ def test_query_embeddings_by_file_id(auth_headers):
         assert doc["page_content"] == "Queried content"
 
 
+def test_query_embedding_runs_off_the_event_loop(auth_headers, monkeypatch):
+    import asyncio
+    from app.routes import document_routes
+
+    on_event_loop = []
+
+    def embed(query):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return [0.1, 0.2, 0.3]
+
+    monkeypatch.setattr(document_routes, "get_cached_query_embedding", embed)
+    data = {"query": "Off the loop", "file_id": "testid1", "k": 4}
+    response = client.post("/query", json=data, headers=auth_headers)
+    assert response.status_code == 200
+    assert on_event_loop == [False]
+
+
+def test_document_chunks_page_by_offset_without_ordinals(auth_headers, monkeypatch):
+    from app.config import vector_store
+
+    # Legacy chunks stored before chunk_index was recorded
+    chunks = [
+        Document(page_content=f"chunk {i}", metadata={"file_id": "testid1"})
+        for i in range(5)
+    ]
+
+    def get_file_chunks(file_id, start=None, limit=None, offset=None, **kwargs):
+        assert start is None
+        return chunks[offset or 0 :][:limit]
+
+    def get_file_catalog(ids):
+        return [{"file_id": "testid1", "content_hash": "hash", "chunk_count": 5}]
+
+    # The mocked vector store is read through the synchronous path
+    monkeypatch.setattr(vector_store, "get_file_chunks", get_file_chunks)
+    monkeypatch.setattr(vector_store, "get_file_catalog", get_file_catalog)
+
+    pages, params = [], {"limit": 2}
+    while True:
+        response = client.get(
+            "/documents/testid1/chunks", headers=auth_headers, params=params
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["next_cursor"] is None
+        pages.append([doc["page_content"] for doc in body["documents"]])
+        if body["next_offset"] is None:
+            break
+        params = {"limit": 2, "offset": body["next_offset"]}
+
+    assert pages == [["chunk 0", "chunk 1"], ["chunk 2", "chunk 3"], ["chunk 4"]]
+
+
+def test_query_search_options_require_qdrant(auth_headers):
+    data = {
+        "query": "Test query",
+        "file_id": "testid1",
+        "search": {"hnsw_ef": 128, "oversampling": 2.0},
+    }
+    response = client.post("/query", json=data, headers=auth_headers)
+    assert response.status_code == 422
+
+
 def test_embed_local_file(tmp_path, auth_headers, monkeypatch):
     # Create a temporary file.
     test_file = tmp_path / "test.txt"
@@ -235,6 +329,120 @@ def test_query_multiple(auth_headers):
         assert doc["page_content"] == "Queried content"
 
 
+def test_query_batch(auth_headers):
+    data = {
+        "queries": [
+            {"query": "first", "file_ids": ["testid1"]},
+            {"query": "second", "file_ids": ["testid1", "testid2"], "k": 2},
+        ]
+    }
+    response = client.post("/query_batch", json=data, headers=auth_headers)
+    assert response.status_code == 200, f"Response: {response.text}"
+    json_data = response.json()
+    assert len(json_data) == 2
+    assert json_data[1][0][0]["page_content"] == "Queried content"
+
+
+def test_query_batch_rejects_too_many_queries(auth_headers):
+    from app.config import QUERY_BATCH_MAX_QUERIES
+
+    query = {"query": "same", "file_ids": ["testid1"]}
+    data = {"queries": [query] * (QUERY_BATCH_MAX_QUERIES + 1)}
+    response = client.post("/query_batch", json=data, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_embed_precomputed(auth_headers):
+    import io
+    import numpy as np
+    from app.config import EMBEDDINGS_MODEL
+
+    vectors = io.BytesIO()
+    np.save(vectors, np.ones((2, 3), dtype=np.float32))
+    files = {
+        "chunks": ("chunks.jsonl", b'{"page_content": "a"}\n{"page_content": "b"}'),
+        "vectors": ("vectors.npy", vectors.getvalue()),
+    }
+    data = {"file_id": "precomputed_id", "model": EMBEDDINGS_MODEL}
+    response = client.post(
+        "/embed-precomputed", data=data, files=files, headers=auth_headers
+    )
+    assert response.status_code == 200, f"Response: {response.text}"
+    assert response.json()["chunks"] == 2
+
+    data["model"] = "another-model"
+    response = client.post(
+        "/embed-precomputed", data=data, files=files, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_embed_precomputed_keeps_server_set_metadata(auth_headers, monkeypatch):
+    import io
+    import numpy as np
+    from app.config import EMBEDDINGS_MODEL, vector_store
+
+    stored = []
+    monkeypatch.setattr(
+        vector_store,
+        "add_embeddings",
+        lambda texts, embeddings, metadatas, ids: stored.extend(metadatas),
+    )
+    vectors = io.BytesIO()
+    np.save(vectors, np.ones((1, 3), dtype=np.float32))
+    files = {
+        "chunks": (
+            "chunks.jsonl",
+            b'{"page_content": "a", "metadata": '
+            b'{"user_id": null, "file_id": "other_id", "chunk_index": 7, "page": 2}}',
+        ),
+        "vectors": ("vectors.npy", vectors.getvalue()),
+    }
+    data = {"file_id": "precomputed_id", "model": EMBEDDINGS_MODEL}
+    response = client.post(
+        "/embed-precomputed", data=data, files=files, headers=auth_headers
+    )
+    assert response.status_code == 200, f"Response: {response.text}"
+    assert stored[0]["file_id"] == "precomputed_id"
+    assert stored[0]["user_id"] is not None
+    assert stored[0]["chunk_index"] == 0
+    assert stored[0]["page"] == 2
+
+
+def test_embeddings_encodings(auth_headers):
+    import base64
+    import numpy as np
+
+    data = {"texts": ["embed me", "and me", "embed me"]}
+    response = client.post("/embeddings", json=data, headers=auth_headers)
+    assert response.status_code == 200, f"Response: {response.text}"
+    json_data = response.json()
+    assert json_data["dimensions"] == 3
+    assert len(json_data["embeddings"]) == 3
+    assert json_data["embeddings"][0] == json_data["embeddings"][2]
+
+    response = client.post(
+        "/embeddings", json={**data, "encoding": "base64"}, headers=auth_headers
+    )
+    vector = np.frombuffer(base64.b64decode(response.json()["embeddings"][0]), "<f4")
+    assert np.allclose(vector, [0.1, 0.2, 0.3])
+    assert response.json()["cached"] == 2
+
+    response = client.post(
+        "/embeddings", json={**data, "encoding": "binary"}, headers=auth_headers
+    )
+    assert response.headers["X-Embedding-Count"] == "3"
+    assert np.frombuffer(response.content, "<f4").reshape(3, 3).shape == (3, 3)
+
+
+def test_embeddings_rejects_too_many_texts(auth_headers):
+    from app.config import EMBEDDINGS_MAX_TEXTS
+
+    data = {"texts": ["embed me"] * (EMBEDDINGS_MAX_TEXTS + 1)}
+    response = client.post("/embeddings", json=data, headers=auth_headers)
+    assert response.status_code == 422
+
+
 def test_extract_text_from_file(tmp_path, auth_headers):
     """Test the /text endpoint for text extraction without embeddings."""
     file_content = "This is a test file for text extraction.\nIt has multiple lines.\nAnd should be extracted properly."
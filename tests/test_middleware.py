@@ -1,7 +1,12 @@
 import os
 import jwt
 import pytest
-from app.middleware import security_middleware
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+from app.middleware import CompressionMiddleware, accepted_encodings, security_middleware
+from app.utils.etag import etag_matches
+
 
 # Dummy Request class for testing.
 class DummyRequest:
@@ -10,9 +15,11 @@ class DummyRequest:
         self.headers = headers
         self.state = type("State", (), {})()
 
+
 async def dummy_call_next(request):
     return type("DummyResponse", (), {"status_code": 200})()
 
+
 @pytest.fixture
 def valid_jwt_header():
     jwt_secret = "testsecret"
@@ -21,10 +28,12 @@ def valid_jwt_header():
     token = jwt.encode(payload, jwt_secret, algorithm="HS256")
     return {"Authorization": f"Bearer {token}"}
 
+
 @pytest.fixture
 def invalid_jwt_header():
     return {"Authorization": "Bearer invalidtoken"}
 
+
 @pytest.mark.asyncio
 async def test_security_middleware_valid(valid_jwt_header):
     request = DummyRequest("/protected", valid_jwt_header)
@@ -33,8 +42,89 @@ async def test_security_middleware_valid(valid_jwt_header):
     assert hasattr(request.state, "user")
     assert request.state.user["id"] == "testuser"
 
+
 @pytest.mark.asyncio
 async def test_security_middleware_invalid(invalid_jwt_header):
     request = DummyRequest("/protected", invalid_jwt_header)
     response = await security_middleware(request, dummy_call_next)
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+
+def compressed_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("chunk " * 1000)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("chunk")
+
+    @app.get("/tagged")
+    def tagged(request: Request):
+        headers = {"ETag": '"v1"'}
+        if etag_matches(request.headers.get("If-None-Match"), '"v1"'):
+            return Response(status_code=304, headers=headers)
+        return PlainTextResponse("chunk " * 1000, headers=headers)
+
+    return TestClient(app)
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, zstd;q=0.5, br;q=x") == {
+        "gzip": 1.0,
+        "zstd": 0.5,
+        "br": 0.0,
+    }
+
+
+def test_compression_negotiates_zstd_and_gzip():
+    client = compressed_client()
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, zstd"})
+    assert response.headers["Content-Encoding"] == "zstd"
+    assert response.text == "chunk " * 1000
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, zstd;q=0.1"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.text == "chunk " * 1000
+
+    response = client.get("/small", headers={"Accept-Encoding": "zstd"})
+    assert "Content-Encoding" not in response.headers
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_etag_revalidates_across_codings():
+    client = compressed_client()
+
+    zstd = client.get("/tagged", headers={"Accept-Encoding": "zstd"})
+    identity = client.get("/tagged", headers={"Accept-Encoding": "identity"})
+    # The compressed body is not byte-identical, so its tag must not be strong
+    assert zstd.headers["ETag"] == 'W/"v1"'
+    assert identity.headers["ETag"] == '"v1"'
+    for response in (zstd, identity):
+        assert "accept-encoding" in response.headers["Vary"].lower()
+
+    for encoding, etag in (("gzip", zstd.headers["ETag"]), ("zstd", '"v1"')):
+        response = client.get(
+            "/tagged", headers={"Accept-Encoding": encoding, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == 'W/"v1"'
+
+    response = client.get(
+        "/tagged", headers={"Accept-Encoding": "identity", "If-None-Match": 'W/"v1"'}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"v1"'
+
+    response = client.get(
+        "/tagged", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v0"'}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"].lower().count("accept-encoding") == 1
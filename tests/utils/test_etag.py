@@ -0,0 +1,27 @@
+from app.utils.etag import catalog_etag, etag_matches
+
+
+def entry(file_id, content_hash="h", updated_at="t1"):
+    return {
+        "file_id": file_id,
+        "content_hash": content_hash,
+        "chunk_count": 2,
+        "updated_at": updated_at,
+    }
+
+
+def test_catalog_etag_tracks_file_versions():
+    etag = catalog_etag([entry("a"), entry("b")], "documents")
+
+    assert etag == catalog_etag([entry("b"), entry("a")], "documents")
+    assert etag != catalog_etag([entry("a"), entry("b", updated_at="t2")], "documents")
+    assert etag != catalog_etag([entry("a"), entry("b")], "context")
+
+
+def test_etag_matches():
+    etag = catalog_etag([entry("a")])
+
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
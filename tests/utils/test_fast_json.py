@@ -0,0 +1,23 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from langchain_core.documents import Document
+
+from app.utils.fast_json import document_response_rows, scored_rows
+
+
+def test_rows_match_default_encoding():
+    documents = [
+        Document(page_content="é chunk", metadata={"file_id": "a", "page": 1}),
+        Document(page_content="other", metadata={}, id="id-2"),
+    ]
+    results = [(documents[0], 0.25), (documents[1], 0.5)]
+
+    assert json.loads(ORJSONResponse(scored_rows(results)).body) == jsonable_encoder(
+        results
+    )
+    assert json.loads(ORJSONResponse(document_response_rows(documents)).body) == [
+        {"page_content": "é chunk", "metadata": {"file_id": "a", "page": 1}},
+        {"page_content": "other", "metadata": {}},
+    ]
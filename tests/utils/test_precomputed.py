@@ -0,0 +1,45 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from app.utils.precomputed import load_precomputed_chunks
+
+
+def npy(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def jsonl(*chunks):
+    return "\n".join(json.dumps(chunk) for chunk in chunks).encode()
+
+
+def test_loads_chunks_and_vectors():
+    texts, metadatas, vectors = load_precomputed_chunks(
+        jsonl({"page_content": "a", "metadata": {"page": 1}}, {"page_content": "b"}),
+        npy(np.ones((2, 3), dtype=np.float64)),
+        3,
+    )
+
+    assert texts == ["a", "b"]
+    assert metadatas == [{"page": 1}, {}]
+    assert vectors.dtype == np.float32 and vectors.shape == (2, 3)
+
+
+@pytest.mark.parametrize(
+    "vectors, message",
+    [
+        (np.ones((1, 3)), "1 vectors for 2 chunks"),
+        (np.ones((2, 4)), "4 dimensions"),
+        (np.array([[1.0, np.nan, 0.0], [0.0, 0.0, 0.0]]), "NaN"),
+        (np.ones((2, 3), dtype=np.int64), "float array"),
+    ],
+)
+def test_rejects_mismatched_vectors(vectors, message):
+    with pytest.raises(ValueError, match=message):
+        load_precomputed_chunks(
+            jsonl({"page_content": "a"}, {"page_content": "b"}), npy(vectors), 3
+        )